@@ -5,7 +5,9 @@ from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
 engine = create_engine(settings.database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Keep attributes loaded after commit so handlers can serialize what they
+# just wrote without another SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 Base = declarative_base()
 
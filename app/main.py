@@ -2,6 +2,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
+from app.utils.log_queue import setup_queue_logging
 from app.database import engine, Base
 
 from app.models.user import User
@@ -17,6 +18,8 @@ from app.models.resume_preset import ResumePreset
 
 from app.routers import auth, sections, applications, generate, ai, outreach, section_configs, jd_matcher, todos, contacts, resume_presets
 
+setup_queue_logging()
+
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, Date, DateTime, Text, ForeignKey
+from sqlalchemy import DDL, Column, String, Date, DateTime, Text, ForeignKey, Index, event
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -35,3 +35,18 @@ class Application(Base):
 
     # Relationships
     user = relationship("User", backref="applications")
+
+    __table_args__ = (
+        # List endpoints filter by user (and optionally status), newest first
+        Index("ix_applications_user_applied", "user_id", applied_at.desc()),
+        Index("ix_applications_user_status_applied", "user_id", "status", applied_at.desc()),
+        # Outreach looks applications up by company substring (ILIKE '%...%')
+        Index(
+            "ix_applications_company_trgm", "company",
+            postgresql_using="gin", postgresql_ops={"company": "gin_trgm_ops"}
+        ),
+    )
+
+
+# gin_trgm_ops comes from pg_trgm (a trusted extension since Postgres 13)
+event.listen(Application.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
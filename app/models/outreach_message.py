@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Text, Boolean
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -23,3 +23,9 @@ class OutreachMessage(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     thread = relationship("OutreachThread", back_populates="messages")
+
+    __table_args__ = (
+        # Messages are read per thread in created_at order (either direction)
+        # and aggregated per thread for counts / last message time
+        Index("ix_outreach_messages_thread_created", "thread_id", created_at.desc()),
+    )
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -26,3 +26,8 @@ class OutreachTemplate(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", backref="outreach_templates")
+
+    __table_args__ = (
+        # Template list is filtered by user and sorted by style, length, name
+        Index("ix_outreach_templates_user_style_length_name", "user_id", "style", "length", "name"),
+    )
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index, Table
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -43,3 +43,8 @@ class OutreachThread(Base):
     user = relationship("User", backref="outreach_threads")
     applications = relationship("Application", secondary=thread_applications, backref="outreach_threads")
     messages = relationship("OutreachMessage", back_populates="thread", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # Thread list filters by user, most recently updated first
+        Index("ix_outreach_threads_user_updated", "user_id", updated_at.desc()),
+    )
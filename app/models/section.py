@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -30,4 +30,9 @@ class Section(Base):
 
     __table_args__ = (
         UniqueConstraint("user_id", "type", "key", "flavor", "version", name="uq_section_version"),
-    )
\ No newline at end of file
+        Index("ix_sections_user_type_key_flavor_current", "user_id", "type", "key", "flavor", "is_current"),
+        # Only current rows, for the hot "current version of this section" lookup
+        Index("ix_sections_current", "user_id", "type", "key", "flavor", postgresql_where=text("is_current")),
+    )
+    # Fetch server-side timestamps via RETURNING so callers needn't refresh
+    __mapper_args__ = {"eager_defaults": True}
\ No newline at end of file
@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 
@@ -16,4 +16,11 @@ class User(Base):
     avatar_url = Column(String(500))
     provider = Column(String(50))  # github, google, linkedin
     provider_id = Column(String(255))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Login upserts on the OAuth identity
+        UniqueConstraint("provider", "provider_id", name="uq_users_provider_identity"),
+    )
+    # Fetch created_at via RETURNING so callers needn't refresh
+    __mapper_args__ = {"eager_defaults": True}
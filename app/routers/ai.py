@@ -4,14 +4,17 @@ Can be removed in production or kept for debugging.
 """
 
 from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
 from app.services.gemini_service import (
+    cache_stats,
     get_gemini_service,
     handle_gemini_error,
     GeminiServiceError
 )
+from app.utils.sse import SSE_MEDIA_TYPE, sse_event
 
 
 router = APIRouter()
@@ -30,7 +33,7 @@ class TestGenerateResponse(BaseModel):
 
 
 @router.post("/test", response_model=TestGenerateResponse)
-def test_gemini_connection(
+async def test_gemini_connection(
     data: TestGenerateRequest,
     x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key")
 ):
@@ -45,10 +48,11 @@ def test_gemini_connection(
     try:
         gemini = get_gemini_service(x_gemini_api_key)
         
-        response = gemini.generate_text(
+        response = await gemini.generate_text_async(
             prompt=data.prompt,
             max_tokens=data.max_tokens,
-            temperature=data.temperature
+            temperature=data.temperature,
+            cache=False
         )
         
         return TestGenerateResponse(
@@ -61,6 +65,38 @@ def test_gemini_connection(
         raise handle_gemini_error(e)
 
 
+@router.post("/test/stream")
+def test_gemini_stream(
+    data: TestGenerateRequest,
+    x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key")
+):
+    """
+    Stream a test generation as Server-Sent Events.
+    
+    Emits one "chunk" event per piece of generated text, then "done"
+    (or "error" if Gemini fails mid-stream).
+    """
+    try:
+        gemini = get_gemini_service(x_gemini_api_key)
+    except GeminiServiceError as e:
+        raise handle_gemini_error(e)
+    
+    async def events():
+        try:
+            async for text in gemini.generate_text_stream(
+                prompt=data.prompt,
+                max_tokens=data.max_tokens,
+                temperature=data.temperature
+            ):
+                yield sse_event({"text": text}, event="chunk")
+        except GeminiServiceError as e:
+            yield sse_event({"message": str(e)}, event="error")
+            return
+        yield sse_event({}, event="done")
+    
+    return StreamingResponse(events(), media_type=SSE_MEDIA_TYPE)
+
+
 @router.get("/health")
 def ai_health_check():
     """Check if AI router is loaded (doesn't test API key)."""
@@ -69,3 +105,9 @@ def ai_health_check():
         "service": "gemini",
         "model": "gemini-1.5-flash"
     }
+
+
+@router.get("/metrics")
+def gemini_metrics():
+    """Response cache size and hit/miss counters for this worker."""
+    return {"response_cache": cache_stats()}
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
-from typing import Optional
+from pydantic import TypeAdapter
+from typing import Optional, List
 from uuid import UUID
 
 from app.database import get_db
@@ -9,6 +10,8 @@ from app.services import application_service
 
 router = APIRouter()
 
+_application_list = TypeAdapter(List[ApplicationResponse])
+
 def get_current_user_id(x_user_id: Optional[str] = Header(None, alias="X-User-Id")) -> UUID:
     """Extract user ID from header."""
     if not x_user_id:
@@ -25,7 +28,7 @@ def list_applications(
         applications = application_service.get_applications_by_status(db, user_id, status)
     else:
         applications = application_service.get_all_applications(db, user_id)
-    return [ApplicationResponse.model_validate(a) for a in applications]
+    return _application_list.validate_python(applications)
 
 @router.get("/{application_id}")
 def get_application(
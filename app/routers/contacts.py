@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
 from typing import List
 from uuid import UUID
 
@@ -9,6 +10,8 @@ from app.schemas.contact import ContactCreate, ContactUpdate, ContactResponse
 
 router = APIRouter()
 
+_contact_list = TypeAdapter(List[ContactResponse])
+
 
 def get_current_user_id(x_user_id: str = Header(...)) -> UUID:
     return UUID(x_user_id)
@@ -25,7 +28,7 @@ def list_contacts(
         .order_by(Contact.updated_at.desc())
         .all()
     )
-    return [ContactResponse.model_validate(c) for c in contacts]
+    return _contact_list.validate_python(contacts)
 
 
 @router.post("", response_model=ContactResponse, status_code=201)
@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header
 from fastapi.responses import Response
 from sqlalchemy.orm import Session
 from uuid import UUID
 from typing import Optional
 from datetime import date
+import asyncio
 import base64
 
 from app.database import get_db
 from app.services import generator_service, application_service
 from app.schemas.application import ApplicationCreate
+from app.utils.latex import latex_cache_stats
 from pydantic import BaseModel
 
 
@@ -35,8 +37,9 @@ def get_current_user_id(x_user_id: Optional[str] = Header(None)) -> UUID:
 
 
 @router.post("")
-def generate_resume(
+async def generate_resume(
     request: GenerateRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user_id: UUID = Depends(get_current_user_id),
 ):
@@ -45,7 +48,7 @@ def generate_resume(
     Returns PDF as file download.
     """
     try:
-        pdf_bytes = generator_service.generate_resume(db, user_id, request.resume_config)
+        pdf_bytes = await generator_service.generate_resume(db, user_id, request.resume_config, background_tasks)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
     
@@ -61,7 +64,7 @@ def generate_resume(
             resume_config=request.resume_config,
             applied_at=date.today(),
         )
-        new_app = application_service.create_application(db, user_id, app_data)
+        new_app = await asyncio.to_thread(application_service.create_application, db, user_id, app_data)
         application_id = str(new_app.id)
     
     # Return PDF as file download
@@ -79,8 +82,9 @@ def generate_resume(
 
 
 @router.post("/preview")
-def generate_preview(
+async def generate_preview(
     request: GenerateRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user_id: UUID = Depends(get_current_user_id),
 ):
@@ -89,10 +93,16 @@ def generate_preview(
     Does NOT create application record.
     """
     try:
-        pdf_bytes = generator_service.generate_resume(db, user_id, request.resume_config)
+        pdf_bytes = await generator_service.generate_resume(db, user_id, request.resume_config, background_tasks)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF generation failed: {str(e)}")
     
     pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
     
-    return GenerateResponse(pdf_base64=pdf_base64)
\ No newline at end of file
+    return GenerateResponse(pdf_base64=pdf_base64)
+
+
+@router.get("/metrics")
+def generate_metrics():
+    """Compiled PDF and LaTeX escaping cache sizes and hit/miss counters for this worker."""
+    return {"pdf_cache": generator_service.pdf_cache_stats(), "latex_cache": latex_cache_stats()}
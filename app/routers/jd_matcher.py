@@ -4,19 +4,31 @@ Uses pre-computed tags for fast matching (2 AI calls).
 """
 
 from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import uuid
 
 from app.database import get_db
 from app.models.section import Section
 from app.models.section_config import SectionConfig
-from app.services.jd_extractor import extract_jd_terms
-from app.services.jd_matcher_service import match_sections_to_jd
+from app.services.jd_extractor import batch_extract_jd_terms, extract_jd_terms_coalesced
+from app.services.jd_matcher_service import (
+    get_suggested_missing,
+    match_many,
+    match_sections_to_jd,
+    match_sections_to_jd_stream,
+    remember_suggested_missing,
+)
 from app.services.keyword_service import find_missing_keywords_with_ai, sections_to_text
+from app.services.section_service import get_current_sections_bulk
 from app.schemas.jd_matcher import (
     JDAnalyzeRequest,
     JDAnalyzeResponse,
+    JDBatchAnalyzeRequest,
+    JDBatchExtractRequest,
+    JDBatchExtractResponse,
     KeywordRecalcRequest,
     KeywordRecalcResponse,
     Suggestions,
@@ -26,6 +38,7 @@ from app.schemas.jd_matcher import (
     FlavorInfo,
     SkillsInfo
 )
+from app.utils.sse import SSE_MEDIA_TYPE, sse_event
 
 router = APIRouter()
 
@@ -128,16 +141,13 @@ def get_version_for_section(sections: Dict[str, List], section_type: str, key: s
     return '1.0'
 
 
-@router.post("/analyze")
-async def analyze_jd(
-    request: JDAnalyzeRequest,
-    x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key"),
-    user_id: uuid.UUID = Depends(get_user_id),
-    db: Session = Depends(get_db)
-):
-    """Analyze JD using pre-computed tags. 2 AI calls, ~500-700 tokens."""
-    
-    if not x_gemini_api_key or len(x_gemini_api_key) < 20:
+def _load_analysis_sections(
+    api_key: str,
+    user_id: uuid.UUID,
+    db: Session
+) -> Tuple[Dict[str, List], Dict[str, Dict], Dict[str, List], List[Dict]]:
+    """Validate the key and load sections, configs, matchable sections and pins."""
+    if not api_key or len(api_key) < 20:
         raise HTTPException(status_code=400, detail="Invalid Gemini API key")
     
     sections = get_sections_with_tags(db, user_id)
@@ -148,13 +158,95 @@ async def analyze_jd(
     configs = get_section_configs_map(db, user_id)
     filtered_sections = filter_by_priority(sections, configs)
     pinned_sections = get_pinned_sections(sections, configs)
+    return sections, configs, filtered_sections, pinned_sections
+
+
+def _jd_terms(jd_extracted: Dict, additional_instructions: Optional[str]) -> List[str]:
+    jd_terms = jd_extracted.get('terms', [])
+    if additional_instructions:
+        jd_terms.append(f"Note: {additional_instructions}")
+    return jd_terms
+
+
+async def _prepare_analysis(
+    request: JDAnalyzeRequest,
+    api_key: str,
+    user_id: uuid.UUID,
+    db: Session
+) -> Tuple[Dict[str, List], Dict[str, Dict], Dict[str, List], List[Dict], Dict, List[str]]:
+    """Load sections and configs and run AI Call 1 (JD term extraction)."""
+    sections, configs, filtered_sections, pinned_sections = _load_analysis_sections(api_key, user_id, db)
     
     # AI Call 1: Extract JD terms
-    jd_extracted = await extract_jd_terms(x_gemini_api_key, request.job_description)
-    jd_terms = jd_extracted.get('terms', [])
+    jd_extracted = await extract_jd_terms_coalesced(api_key, request.job_description)
+    jd_terms = _jd_terms(jd_extracted, request.additional_instructions)
     
-    if request.additional_instructions:
-        jd_terms.append(f"Note: {request.additional_instructions}")
+    return sections, configs, filtered_sections, pinned_sections, jd_extracted, jd_terms
+
+
+def _match_error(e: Exception) -> HTTPException:
+    error_msg = str(e)
+    if "429" in error_msg or "Resource exhausted" in error_msg:
+        return HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a moment and try again.")
+    return HTTPException(status_code=500, detail=f"AI matching failed: {error_msg}")
+
+
+def _build_suggestion(
+    sections: Dict[str, List],
+    pinned_sections: List[Dict],
+    section_type: str,
+    pick: Dict
+) -> SectionSuggestion:
+    return SectionSuggestion(
+        key=pick['key'],
+        flavor=pick['flavor'],
+        version=get_version_for_section(sections, section_type, pick['key'], pick['flavor']),
+        pinned=any(p['key'] == pick['key'] for p in pinned_sections),
+        reason=pick.get('reason', '')
+    )
+
+
+def _build_match_response(
+    match_result: Dict,
+    sections: Dict[str, List],
+    pinned_sections: List[Dict],
+    jd_extracted: Dict
+) -> Dict:
+    return {
+        "suggestions": {
+            "skills_flavor": match_result.get('skills_flavor', 'default'),
+            "experiences": [_build_suggestion(sections, pinned_sections, 'experience', e) for e in match_result.get('experiences', [])],
+            "projects": [_build_suggestion(sections, pinned_sections, 'project', p) for p in match_result.get('projects', [])]
+        },
+        "missing_keywords": match_result.get('missing_keywords', []),
+        "jd_info": jd_extracted
+    }
+
+
+def _build_analysis_response(
+    match_result: Dict,
+    sections: Dict[str, List],
+    configs: Dict[str, Dict],
+    pinned_sections: List[Dict],
+    jd_extracted: Dict
+) -> Dict:
+    response = _build_match_response(match_result, sections, pinned_sections, jd_extracted)
+    response["all_sections"] = build_all_sections_response(sections, configs)
+    return response
+
+
+@router.post("/analyze")
+async def analyze_jd(
+    request: JDAnalyzeRequest,
+    x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key"),
+    user_id: uuid.UUID = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """Analyze JD using pre-computed tags. 2 AI calls, ~500-700 tokens."""
+    
+    sections, configs, filtered_sections, pinned_sections, jd_extracted, jd_terms = await _prepare_analysis(
+        request, x_gemini_api_key, user_id, db
+    )
     
     # AI Call 2: Match sections
     try:
@@ -166,38 +258,98 @@ async def analyze_jd(
             pinned_sections=pinned_sections
         )
     except Exception as e:
-        error_msg = str(e)
-        if "429" in error_msg or "Resource exhausted" in error_msg:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded. Please wait a moment and try again.")
-        raise HTTPException(status_code=500, detail=f"AI matching failed: {error_msg}")
-    
-    # Build response
-    exp_suggestions = [SectionSuggestion(
-        key=e['key'],
-        flavor=e['flavor'],
-        version=get_version_for_section(sections, 'experience', e['key'], e['flavor']),
-        pinned=any(p['key'] == e['key'] for p in pinned_sections),
-        reason=e.get('reason', '')
-    ) for e in match_result.get('experiences', [])]
-    
-    proj_suggestions = [SectionSuggestion(
-        key=p['key'],
-        flavor=p['flavor'],
-        version=get_version_for_section(sections, 'project', p['key'], p['flavor']),
-        pinned=any(pin['key'] == p['key'] for pin in pinned_sections),
-        reason=p.get('reason', '')
-    ) for p in match_result.get('projects', [])]
+        raise _match_error(e)
     
-    return {
-        "suggestions": {
-            "skills_flavor": match_result.get('skills_flavor', 'default'),
-            "experiences": exp_suggestions,
-            "projects": proj_suggestions
-        },
-        "missing_keywords": match_result.get('missing_keywords', []),
-        "all_sections": build_all_sections_response(sections, configs),
-        "jd_info": jd_extracted
-    }
+    remember_suggested_missing(user_id, request.job_description, match_result)
+    
+    return _build_analysis_response(match_result, sections, configs, pinned_sections, jd_extracted)
+
+
+@router.post("/analyze/stream")
+async def analyze_jd_stream(
+    request: JDAnalyzeRequest,
+    x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key"),
+    user_id: uuid.UUID = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyze JD and stream the section match as Server-Sent Events.
+    
+    Emits an "experience" or "project" event per suggestion as soon as the
+    model settles on it, then "result" with the same body /analyze returns
+    (or "error" if matching fails mid-stream).
+    """
+    sections, configs, filtered_sections, pinned_sections, jd_extracted, jd_terms = await _prepare_analysis(
+        request, x_gemini_api_key, user_id, db
+    )
+    
+    async def events():
+        try:
+            async for event in match_sections_to_jd_stream(
+                api_key=x_gemini_api_key,
+                jd_terms=jd_terms,
+                jd_info=jd_extracted,
+                sections_with_tags=filtered_sections,
+                pinned_sections=pinned_sections
+            ):
+                if event["type"] == "item":
+                    section_type = 'experience' if event["key"] == 'experiences' else 'project'
+                    suggestion = _build_suggestion(sections, pinned_sections, section_type, event["value"])
+                    yield sse_event(suggestion.model_dump(), event=section_type)
+                else:
+                    match_result = event["value"]
+        except Exception as e:
+            yield sse_event({"message": _match_error(e).detail}, event="error")
+            return
+        
+        remember_suggested_missing(user_id, request.job_description, match_result)
+        response = _build_analysis_response(match_result, sections, configs, pinned_sections, jd_extracted)
+        yield sse_event(jsonable_encoder(response), event="result")
+    
+    return StreamingResponse(events(), media_type=SSE_MEDIA_TYPE)
+
+
+@router.post("/analyze/batch")
+async def analyze_jd_batch(
+    request: JDBatchAnalyzeRequest,
+    x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key"),
+    user_id: uuid.UUID = Depends(get_user_id),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyze several JDs against the same resume: one extraction call and one
+    matching call for the whole batch. Results follow request order and
+    carry what /analyze returns per JD; all_sections is returned once.
+    """
+    sections, configs, filtered_sections, pinned_sections = _load_analysis_sections(x_gemini_api_key, user_id, db)
+    
+    extracted = await batch_extract_jd_terms(x_gemini_api_key, request.job_descriptions)
+    jobs = [(_jd_terms(jd_extracted, request.additional_instructions), jd_extracted) for jd_extracted in extracted]
+    
+    try:
+        match_results = await match_many(x_gemini_api_key, jobs, filtered_sections, pinned_sections)
+    except Exception as e:
+        raise _match_error(e)
+    
+    results = []
+    for job_description, jd_extracted, match_result in zip(request.job_descriptions, extracted, match_results):
+        remember_suggested_missing(user_id, job_description, match_result)
+        results.append(_build_match_response(match_result, sections, pinned_sections, jd_extracted))
+    
+    return {"results": results, "all_sections": build_all_sections_response(sections, configs)}
+
+
+@router.post("/extract/batch", response_model=JDBatchExtractResponse)
+async def batch_extract(
+    request: JDBatchExtractRequest,
+    x_gemini_api_key: str = Header(..., alias="X-Gemini-API-Key"),
+):
+    """Extract terms from several JDs with a single AI call. Results follow request order."""
+    if not x_gemini_api_key or len(x_gemini_api_key) < 20:
+        raise HTTPException(status_code=400, detail="Invalid Gemini API key")
+    
+    results = await batch_extract_jd_terms(x_gemini_api_key, request.job_descriptions)
+    return JDBatchExtractResponse(results=results)
 
 
 @router.post("/recalculate-keywords", response_model=KeywordRecalcResponse)
@@ -209,18 +361,20 @@ async def recalculate_keywords(
 ):
     """Recalculate missing keywords based on current selection. No full Gemini call."""
     
+    # Unchanged suggestions: the matcher already answered this
+    if not request.temp_edits:
+        missing = get_suggested_missing(
+            user_id,
+            request.job_description,
+            [(s.type, s.key, s.flavor) for s in request.selected_sections]
+        )
+        if missing is not None:
+            return KeywordRecalcResponse(missing_keywords=missing)
+    
     # Get selected sections content
-    selected_content = []
-    for selection in request.selected_sections:
-        section = db.query(Section).filter(
-            Section.user_id == user_id,
-            Section.type == selection.type,
-            Section.key == selection.key,
-            Section.flavor == selection.flavor,
-            Section.is_current == True
-        ).first()
-        if section:
-            selected_content.append(section.content)
+    selection_keys = [(s.type, s.key, s.flavor) for s in request.selected_sections]
+    current = get_current_sections_bulk(db, user_id, selection_keys)
+    selected_content = [current[k].content for k in selection_keys if k in current]
     
     # Apply temp edits if any
     if request.temp_edits:
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from uuid import UUID
@@ -9,12 +10,14 @@ from app.schemas.outreach import (
     ThreadCreate, ThreadUpdate, ThreadResponse,
     MessageCreate, MessageResponse,
     GenerateMessageRequest, GenerateMessageResponse,
+    GenerateBatchRequest, GenerateBatchResponse,
     RefineMessageRequest, RefineMessageResponse,
     ParseConversationRequest, ParseConversationResponse,
     GenerateReplyRequest, GenerateReplyResponse
 )
 from app.services.outreach_service import OutreachService
 from app.services.ai_outreach_service import AIOutreachService
+from app.services.gemini_service import GeminiServiceError, handle_gemini_error
 
 router = APIRouter()
 
@@ -149,6 +152,17 @@ def add_message(
     return OutreachService.add_message(db, user_id, thread_id, data)
 
 
+@router.post("/threads/{thread_id}/messages/bulk", response_model=List[MessageResponse])
+def bulk_add_messages(
+    thread_id: UUID,
+    data: List[MessageCreate],
+    user_id: UUID = Header(..., alias="X-User-ID"),
+    db: Session = Depends(get_db)
+):
+    """Add several messages to a thread at once (e.g. from /parse-conversation)."""
+    return OutreachService.bulk_add_messages(db, user_id, thread_id, data)
+
+
 @router.delete("/threads/{thread_id}/messages/{message_id}")
 def delete_message(
     thread_id: UUID,
@@ -164,14 +178,14 @@ def delete_message(
 # ============ AI GENERATION ============
 
 @router.post("/generate", response_model=GenerateMessageResponse)
-def generate_message(
+async def generate_message(
     data: GenerateMessageRequest,
     user_id: UUID = Header(..., alias="X-User-ID"),
     api_key: str = Header(..., alias="X-Gemini-API-Key"),
     db: Session = Depends(get_db)
 ):
     """Generate a new outreach message using AI."""
-    return AIOutreachService.generate_message(
+    return await AIOutreachService.generate_message(
         db=db,
         user_id=user_id,
         template_id=data.template_id,
@@ -185,13 +199,61 @@ def generate_message(
     )
 
 
+@router.post("/generate/stream")
+def stream_message(
+    data: GenerateMessageRequest,
+    user_id: UUID = Header(..., alias="X-User-ID"),
+    api_key: str = Header(..., alias="X-Gemini-API-Key"),
+    db: Session = Depends(get_db)
+):
+    """Stream a new outreach message as plain text while it is generated."""
+    chunks = AIOutreachService.stream_message(
+        db=db,
+        user_id=user_id,
+        template_id=data.template_id,
+        company=data.company,
+        contact_name=data.contact_name,
+        style=data.style.value if data.style else None,
+        length=data.length.value if data.length else None,
+        jd_text=data.jd_text,
+        application_id=data.application_id,
+        api_key=api_key
+    )
+    return StreamingResponse(chunks, media_type="text/plain")
+
+
+@router.post("/generate/batch", response_model=GenerateBatchResponse)
+async def generate_messages_batch(
+    data: GenerateBatchRequest,
+    user_id: UUID = Header(..., alias="X-User-ID"),
+    api_key: str = Header(..., alias="X-Gemini-API-Key"),
+    db: Session = Depends(get_db)
+):
+    """Generate outreach messages for several company/contact pairs concurrently."""
+    try:
+        results = await AIOutreachService.generate_messages_batch(
+            db=db,
+            user_id=user_id,
+            targets=[t.model_dump() for t in data.targets],
+            template_id=data.template_id,
+            style=data.style.value if data.style else None,
+            length=data.length.value if data.length else None,
+            jd_text=data.jd_text,
+            application_id=data.application_id,
+            api_key=api_key
+        )
+    except GeminiServiceError as e:
+        raise handle_gemini_error(e)
+    return {"results": results}
+
+
 @router.post("/refine", response_model=RefineMessageResponse)
-def refine_message(
+async def refine_message(
     data: RefineMessageRequest,
     api_key: str = Header(..., alias="X-Gemini-API-Key")
 ):
     """Refine an existing message with user instructions."""
-    result = AIOutreachService.refine_message(
+    result = await AIOutreachService.refine_message(
         original_message=data.original_message,
         refinement_instructions=data.refinement_instructions,
         style=data.style.value if data.style else None,
@@ -202,12 +264,12 @@ def refine_message(
 
 
 @router.post("/parse-conversation", response_model=ParseConversationResponse)
-def parse_conversation(
+async def parse_conversation(
     data: ParseConversationRequest,
     api_key: str = Header(..., alias="X-Gemini-API-Key")
 ):
     """Parse a raw conversation dump into structured messages."""
-    result = AIOutreachService.parse_conversation(
+    result = await AIOutreachService.parse_conversation(
         raw_text=data.raw_text,
         api_key=api_key
     )
@@ -215,14 +277,14 @@ def parse_conversation(
 
 
 @router.post("/generate-reply", response_model=GenerateReplyResponse)
-def generate_reply(
+async def generate_reply(
     data: GenerateReplyRequest,
     user_id: UUID = Header(..., alias="X-User-ID"),
     api_key: str = Header(..., alias="X-Gemini-API-Key"),
     db: Session = Depends(get_db)
 ):
     """Generate a reply for an ongoing thread conversation."""
-    result = AIOutreachService.generate_reply(
+    result = await AIOutreachService.generate_reply(
         db=db,
         user_id=user_id,
         thread_id=data.thread_id,
@@ -234,6 +296,26 @@ def generate_reply(
     return result
 
 
+@router.post("/generate-reply/stream")
+def stream_reply(
+    data: GenerateReplyRequest,
+    user_id: UUID = Header(..., alias="X-User-ID"),
+    api_key: str = Header(..., alias="X-Gemini-API-Key"),
+    db: Session = Depends(get_db)
+):
+    """Stream a reply for an ongoing thread as plain text while it is generated."""
+    chunks = AIOutreachService.stream_reply(
+        db=db,
+        user_id=user_id,
+        thread_id=data.thread_id,
+        instructions=data.instructions,
+        style=data.style.value if data.style else "semi_formal",
+        length=data.length.value if data.length else "long",
+        api_key=api_key
+    )
+    return StreamingResponse(chunks, media_type="text/plain")
+
+
 # ============ UTILITY ============
 
 @router.get("/applications-by-company")
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
 from typing import List
 from uuid import UUID
 
@@ -9,6 +10,8 @@ from app.schemas.resume_preset import ResumePresetCreate, ResumePresetUpdate, Re
 
 router = APIRouter()
 
+_preset_list = TypeAdapter(List[ResumePresetResponse])
+
 
 def get_current_user_id(x_user_id: str = Header(...)) -> UUID:
     return UUID(x_user_id)
@@ -25,7 +28,7 @@ def list_presets(
         .order_by(ResumePreset.updated_at.desc())
         .all()
     )
-    return [ResumePresetResponse.model_validate(p) for p in presets]
+    return _preset_list.validate_python(presets)
 
 
 @router.post("", response_model=ResumePresetResponse, status_code=201)
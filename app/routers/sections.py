@@ -1,19 +1,29 @@
 """
 Sections Router - CRUD with automatic tag generation.
-Tags are generated when Gemini API key is provided via X-Gemini-API-Key header.
+Tags are generated when Gemini API key is provided via X-Gemini-API-Key header,
+in a background task after the response is sent.
 """
 
-from fastapi import APIRouter, Depends, Header, HTTPException
+import asyncio
+import logging
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
+from datetime import datetime
 from uuid import UUID
 from typing import Optional, List
 
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.schemas.section import SectionCreate, SectionUpdate, SectionResponse
 from app.services import section_service
 from app.services.tag_generator import generate_section_tags
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Validates a whole list of ORM rows in one pydantic-core call
+_section_list = TypeAdapter(List[SectionResponse])
 
 
 def get_current_user_id(x_user_id: Optional[str] = Header(None, alias="X-User-Id")) -> UUID:
@@ -28,19 +38,26 @@ def get_gemini_api_key(x_gemini_api_key: Optional[str] = Header(None, alias="X-G
     return x_gemini_api_key
 
 
-async def generate_tags_for_content(api_key: Optional[str], content: dict, section_type: str) -> dict:
-    """Generate tags for content if API key is available."""
-    if not api_key:
-        return content
-    
+async def tag_sections_later(api_key: str, user_id: UUID, sections: List[SectionResponse]) -> None:
+    """
+    Background task: generate tags for freshly written sections and merge
+    them into their content. Runs after the response is sent, with its own
+    session, so section writes don't wait on Gemini.
+    """
+    db = SessionLocal()
     try:
-        tags = await generate_section_tags(api_key, content, section_type)
-        content['tags'] = tags
-    except Exception as e:
-        print(f"Tag generation failed: {e}")
-        content['tags'] = []
-    
-    return content
+        for i, section in enumerate(sections):
+            # Add delay between API calls to avoid rate limits (150ms = max 400/min)
+            if i > 0:
+                await asyncio.sleep(0.15)
+            try:
+                tags = await generate_section_tags(api_key, section.content, section.type)
+                section_service.set_section_tags(db, user_id, section.id, tags)
+            except Exception:
+                logger.exception("Tag generation failed")
+                db.rollback()
+    finally:
+        db.close()
 
 
 @router.get("")
@@ -50,7 +67,7 @@ def list_sections(
 ):
     """List all sections for user."""
     sections = section_service.get_all_sections(db, user_id)
-    return [SectionResponse.model_validate(s) for s in sections]
+    return _section_list.validate_python(sections)
 
 
 @router.get("/{type}")
@@ -61,7 +78,7 @@ def list_sections_by_type(
 ):
     """List sections filtered by type."""
     sections = section_service.get_sections_by_type(db, user_id, type)
-    return [SectionResponse.model_validate(s) for s in sections]
+    return _section_list.validate_python(sections)
 
 
 @router.get("/{type}/{key}/{flavor}")
@@ -69,12 +86,19 @@ def get_section_versions(
     type: str,
     key: str,
     flavor: str,
+    limit: int = Query(20, ge=1, le=100),
+    before: Optional[datetime] = Query(None),
     db: Session = Depends(get_db),
     user_id: UUID = Depends(get_current_user_id),
 ):
-    """Get all versions of a specific section."""
-    sections = section_service.get_section_versions(db, user_id, type, key, flavor)
-    return [SectionResponse.model_validate(s) for s in sections]
+    """
+    Get versions of a specific section, newest first, a page at a time.
+    Pass the last version's created_at as ?before= to get the next page.
+    """
+    sections = section_service.get_section_versions(
+        db, user_id, type, key, flavor, limit=limit, before=before
+    )
+    return _section_list.validate_python(sections)
 
 
 @router.get("/{type}/{key}/{flavor}/{version}")
@@ -96,69 +120,51 @@ def get_section_by_version(
 @router.post("", status_code=201)
 async def create_section(
     section: SectionCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user_id: UUID = Depends(get_current_user_id),
     api_key: Optional[str] = Depends(get_gemini_api_key),
 ):
-    """Create section with auto-generated tags."""
-    existing = section_service.get_current_section(
+    """Create section; tags are generated in the background."""
+    if section_service.current_section_exists(
         db, user_id, section.type, section.key, section.flavor
-    )
-    if existing:
+    ):
         raise HTTPException(
             status_code=400,
             detail="Section already exists. Use PUT to update.",
         )
     
-    content = await generate_tags_for_content(api_key, dict(section.content), section.type)
-    
-    section_with_tags = SectionCreate(
-        type=section.type,
-        key=section.key,
-        flavor=section.flavor,
-        content=content
+    new_section = SectionResponse.model_validate(
+        section_service.create_section(db, user_id, section)
     )
-    new_section = section_service.create_section(db, user_id, section_with_tags)
-    return SectionResponse.model_validate(new_section)
+    if api_key:
+        background_tasks.add_task(tag_sections_later, api_key, user_id, [new_section])
+    return new_section
 
 
 @router.post("/bulk", status_code=201)
 async def bulk_create_sections(
     sections: List[SectionCreate],
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user_id: UUID = Depends(get_current_user_id),
     api_key: Optional[str] = Depends(get_gemini_api_key),
 ):
-    """Bulk create sections with auto-generated tags."""
-    import asyncio
-    
+    """Bulk create sections; tags are generated in the background."""
     results = {"success": [], "failed": []}
     
-    for i, section in enumerate(sections):
-        # Add delay between API calls to avoid rate limits (100ms = max 600/min)
-        if i > 0 and api_key:
-            await asyncio.sleep(0.15)
-        
+    for section in sections:
         try:
-            existing = section_service.get_current_section(
+            if section_service.current_section_exists(
                 db, user_id, section.type, section.key, section.flavor
-            )
-            if existing:
+            ):
                 results["failed"].append({
                     "key": section.key,
                     "error": "Section already exists"
                 })
                 continue
             
-            content = await generate_tags_for_content(api_key, dict(section.content), section.type)
-            
-            section_with_tags = SectionCreate(
-                type=section.type,
-                key=section.key,
-                flavor=section.flavor,
-                content=content
-            )
-            new_section = section_service.create_section(db, user_id, section_with_tags)
+            new_section = section_service.create_section(db, user_id, section)
             results["success"].append(SectionResponse.model_validate(new_section))
         except Exception as e:
             results["failed"].append({
@@ -166,6 +172,8 @@ async def bulk_create_sections(
                 "error": str(e)
             })
     
+    if api_key and results["success"]:
+        background_tasks.add_task(tag_sections_later, api_key, user_id, results["success"])
     return results
 
 
@@ -175,18 +183,19 @@ async def update_section(
     key: str,
     flavor: str,
     section: SectionUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     user_id: UUID = Depends(get_current_user_id),
     api_key: Optional[str] = Depends(get_gemini_api_key),
 ):
-    """Update section with auto-generated tags."""
-    content = await generate_tags_for_content(api_key, dict(section.content), type)
-    
-    section_with_tags = SectionUpdate(content=content)
-    updated = section_service.update_section(db, user_id, type, key, flavor, section_with_tags)
+    """Update section (new version); tags are generated in the background."""
+    updated = section_service.update_section(db, user_id, type, key, flavor, section)
     if not updated:
         raise HTTPException(status_code=404, detail="Section not found")
-    return SectionResponse.model_validate(updated)
+    updated = SectionResponse.model_validate(updated)
+    if api_key:
+        background_tasks.add_task(tag_sections_later, api_key, user_id, [updated])
+    return updated
 
 
 @router.delete("/{type}/{key}/{flavor}/{version}", status_code=204)
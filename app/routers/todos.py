@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Header
 from sqlalchemy.orm import Session
+from pydantic import TypeAdapter
 from typing import List
 from uuid import UUID
 
@@ -9,6 +10,8 @@ from app.schemas.todo import TodoCreate, TodoUpdate, TodoReorder, TodoResponse
 
 router = APIRouter()
 
+_todo_list = TypeAdapter(List[TodoResponse])
+
 
 def get_current_user_id(x_user_id: str = Header(...)) -> UUID:
     return UUID(x_user_id)
@@ -25,7 +28,7 @@ def list_todos(
         .order_by(Todo.position.asc(), Todo.created_at.desc())
         .all()
     )
-    return [TodoResponse.model_validate(t) for t in todos]
+    return _todo_list.validate_python(todos)
 
 
 @router.post("", response_model=TodoResponse, status_code=201)
@@ -108,7 +111,7 @@ def reorder_todos(
         .order_by(Todo.position.asc())
         .all()
     )
-    return [TodoResponse.model_validate(t) for t in updated]
+    return _todo_list.validate_python(updated)
 
 
 @router.delete("/completed/clear", status_code=204)
@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from uuid import UUID
 from typing import Optional, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 
 class ApplicationCreate(BaseModel):
     company: str
@@ -43,5 +43,4 @@ class ApplicationResponse(BaseModel):
     referral: Optional[str] = None
     salary_range: Optional[str] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
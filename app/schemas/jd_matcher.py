@@ -1,10 +1,20 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 
 class JDAnalyzeRequest(BaseModel):
     job_description: str
     additional_instructions: Optional[str] = None
 
+class JDBatchAnalyzeRequest(BaseModel):
+    job_descriptions: List[str] = Field(..., min_length=1, max_length=10)
+    additional_instructions: Optional[str] = None
+
+class JDBatchExtractRequest(BaseModel):
+    job_descriptions: List[str] = Field(..., min_length=1, max_length=20)
+
+class JDBatchExtractResponse(BaseModel):
+    results: List[Dict[str, Any]]
+
 class SectionSuggestion(BaseModel):
     key: str
     flavor: str
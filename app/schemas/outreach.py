@@ -3,7 +3,7 @@ from uuid import UUID
 from typing import Optional, Any, List
 from enum import Enum
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ConfigDict
 
 
 # Enums
@@ -56,8 +56,7 @@ class TemplateResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class TemplateListResponse(BaseModel):
@@ -68,8 +67,7 @@ class TemplateListResponse(BaseModel):
     length: MessageLength
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 # Thread Schemas
@@ -104,8 +102,7 @@ class ThreadResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 # Message Schemas
@@ -124,8 +121,7 @@ class MessageResponse(BaseModel):
     is_raw_dump: bool
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True, use_enum_values=True)
 
 
 # ============ AI GENERATION SCHEMAS ============
@@ -147,6 +143,35 @@ class GenerateMessageResponse(BaseModel):
     message: str
 
 
+class BatchTarget(BaseModel):
+    """A single company/contact pair to generate a message for."""
+    company: str
+    contact_name: Optional[str] = None
+
+
+class GenerateBatchRequest(BaseModel):
+    """Request to generate messages for several targets with shared settings."""
+    targets: List[BatchTarget] = Field(..., min_length=1, max_length=50)
+    template_id: Optional[UUID] = None
+    style: Optional[WritingStyle] = None
+    length: Optional[MessageLength] = None
+    jd_text: Optional[str] = None
+    application_id: Optional[UUID] = None
+
+
+class BatchMessageResult(BaseModel):
+    """Generated message (or error) for one batch target."""
+    company: str
+    contact_name: Optional[str] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+
+class GenerateBatchResponse(BaseModel):
+    """Response from generating a batch of messages."""
+    results: List[BatchMessageResult]
+
+
 class RefineMessageRequest(BaseModel):
     """Request to refine an existing message."""
     original_message: str
@@ -168,8 +193,8 @@ class ParseConversationRequest(BaseModel):
 
 class ParsedMessage(BaseModel):
     """A single parsed message from a conversation."""
-    direction: MessageDirection
-    content: str
+    direction: MessageDirection = MessageDirection.SENT
+    content: str = ""
     message_at: Optional[datetime] = None
 
 
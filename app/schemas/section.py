@@ -2,7 +2,7 @@ from datetime import datetime
 from uuid import UUID
 from typing import Optional, Any
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class SectionCreate(BaseModel):
@@ -28,8 +28,7 @@ class SectionResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class SectionListResponse(BaseModel):
@@ -1,14 +1,244 @@
-import google.generativeai as genai
+import asyncio
+import re
+from functools import lru_cache
+from string import Template
+
+import orjson
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import Optional, List
+from pydantic import TypeAdapter
+from typing import AsyncIterator, Final, NamedTuple, Optional, List
 from uuid import UUID
 
 from app.models.section import Section
 from app.models.outreach_template import OutreachTemplate
 from app.models.outreach_thread import OutreachThread
 from app.models.outreach_message import OutreachMessage
+from app.models.application import Application
+from app.schemas.outreach import MessageDirection, ParsedMessage
+from app.services.gemini_service import (
+    get_cached_prefix_model,
+    get_gemini_service,
+    get_model,
+    strip_code_fences,
+    with_retries_async,
+)
+from app.services.section_service import get_section_state
 from app.config import settings
+from app.utils.cache import LRUCache, hash_key
+
+
+_SENT = MessageDirection.SENT.value
+_RECEIVED = MessageDirection.RECEIVED.value
+_HISTORY_LABELS = {_SENT: "You", _RECEIVED: "Them"}
+_MAX_HISTORY_MESSAGES = 50
+_REPLY_HISTORY_MESSAGES = 10
+_PARSED_MESSAGES = TypeAdapter(List[ParsedMessage])
+
+# Caps in-flight Gemini calls per worker so bursts stay under the API rate limit
+_GEMINI_SEMAPHORE = asyncio.Semaphore(settings.gemini_max_concurrency)
+
+# Assembled resume context per (user, section state, resume_config). The
+# state is read from the database, so a write on any worker misses here.
+_RESUME_CONTEXT_TTL_SECONDS = 600
+_resume_contexts = LRUCache(maxsize=512, ttl=_RESUME_CONTEXT_TTL_SECONDS)
+
+_STYLE_GUIDANCE: Final[dict[str, str]] = {
+    "professional": "Use formal, professional language. Be respectful and business-like.",
+    "semi_formal": "Use a friendly but professional tone. Balance warmth with professionalism.",
+    "casual": "Use a relaxed, conversational tone. Be friendly and approachable.",
+    "friend": "Write as if messaging a friend. Be warm, casual, and genuine."
+}
+
+_LENGTH_GUIDANCE: Final[dict[str, str]] = {
+    "short": "Keep the message concise, around 3-5 sentences. Get to the point quickly.",
+    "long": "Write a more detailed message, around 6-10 sentences. Include more context and personalization."
+}
+
+_STYLE_INSTRUCTIONS: Final[dict[str, str]] = {
+    "professional": "formal and polished",
+    "semi_formal": "professional but approachable",
+    "casual": "friendly and conversational",
+    "friend": "warm and familiar"
+}
+
+
+# Prompt skeletons, parsed once at import; only the slots vary per request
+_GENERATION_PREFIX: Final = Template("""You are helping craft a personalized cold outreach message.
+
+**SENDER'S BACKGROUND (use relevant details to personalize):**
+$resume_context
+
+**TEMPLATE TO FOLLOW:**
+$template_content
+
+""")
+
+_GENERATION_PROMPT: Final = Template("""**STYLE:** $style
+$style_guidance
+
+**LENGTH:** $length
+$length_guidance
+
+**TARGET:**
+- Company: $company
+- Contact: $contact_name
+
+$additional_context**INSTRUCTIONS:**
+1. Follow the template structure but personalize it based on the sender's background
+2. Make specific references to the sender's experience that would be relevant to $company
+3. Keep the tone consistent with the style setting
+4. Do not use generic phrases like "I'm excited" or "I'm passionate" - be specific
+5. Output ONLY the message text, no explanations or alternatives
+
+**GENERATE THE MESSAGE:**""")
+
+_REFINE_PROMPT: Final = Template("""You are helping refine a cold outreach message.
+
+**ORIGINAL MESSAGE:**
+$original_message
+
+**REFINEMENT INSTRUCTIONS:**
+$refinement_instructions
+
+**CONSTRAINTS:**
+- Style: $style
+- Maximum length: $char_limit characters (STRICT for short messages)
+
+**INSTRUCTIONS:**
+1. Apply the refinement instructions to improve the message
+2. Keep the core intent and personalization unless specifically asked to change it
+3. Maintain any specific details about the person's background
+4. Output ONLY the refined message text, no explanations or preamble
+
+**REFINED MESSAGE:**""")
+
+_PARSE_PROMPT: Final = Template("""Parse this conversation into individual messages. For each message, determine:
+1. Direction: "sent" (from the job seeker/user) or "received" (from the recruiter/contact)
+2. Content: the message text (clean it up, remove timestamps from the text itself)
+3. Timestamp: if visible in the conversation (format: ISO 8601, e.g., "2026-01-15T14:30:00")
+
+**CONVERSATION TO PARSE:**
+$raw_text
+
+**INSTRUCTIONS:**
+- Look for patterns like "Me:", "Them:", "SENT", "RECEIVED", timestamps, or indentation to determine direction
+- Messages marked "SENT" are from the user (direction: "sent")
+- Messages marked "RECEIVED" are from the contact (direction: "received")
+- Clean up the message content (remove leading timestamps, direction labels, etc.)
+- If no clear timestamp, set message_at to null
+
+**RESPOND IN THIS EXACT JSON FORMAT (no markdown, no code blocks):**
+{"messages": [{"direction": "sent", "content": "message text here", "message_at": "2026-01-15T14:30:00"}]}
+
+If you cannot parse the conversation at all, respond with:
+{"error": "Could not parse conversation"}""")
+
+_REPLY_INSTRUCTIONS: Final = """**INSTRUCTIONS:**
+1. Write a natural reply that responds to their last message
+2. Reference your background ONLY if relevant to what they said
+3. Be helpful and move toward your goal (getting a referral, interview, info)
+4. If they shared a job posting, express genuine interest and ask a relevant question
+5. If they asked a question, answer it directly
+6. Keep it concise and end with a clear next step or question
+7. Output ONLY the reply text, no explanations or preamble
+
+**YOUR REPLY:**"""
+
+_MESSAGE_INSTRUCTIONS: Final = """**INSTRUCTIONS:**
+1. Write a concise, personalized cold outreach message
+2. Reference specific relevant experience from the sender's background
+3. Make it clear what you're asking for (referral, coffee chat, advice, etc.)
+4. Do NOT use generic phrases like "I'm excited" or "I'm passionate"
+5. Do NOT start with "I hope this message finds you well"
+6. Be specific and genuine
+7. Output ONLY the message text, no explanations
+
+**GENERATE THE MESSAGE:**"""
+
+
+# Most useful sections first when the resume context must be trimmed
+_SECTION_PRIORITY: Final[dict[str, int]] = {
+    "heading": 0,
+    "experience": 1,
+    "project": 2,
+    "skills": 3,
+    "education": 4,
+    "coursework": 5,
+}
+
+
+# Words too common to say anything about relevance
+_STOPWORDS: Final = frozenset(
+    "a an and are as at be by for from has have in is it of on or our that the this "
+    "to we will with you your role team work experience".split()
+)
+_TERM_RE = re.compile(r"[a-z0-9][a-z0-9+#.]+")
+
+
+class _SectionText(NamedTuple):
+    type: str
+    text: str
+    terms: frozenset
+
+
+def _terms(text: str) -> frozenset:
+    """Lowercased content words, used for lexical relevance ranking."""
+    return frozenset(t for t in _TERM_RE.findall(text.lower()) if t not in _STOPWORDS)
+
+
+@lru_cache(maxsize=256)
+def _parse_resume_refs(config_json: bytes) -> tuple:
+    """
+    Split a serialized resume_config into section lookups, memoized per config.
+    
+    Returns (section_type, key, lookup, is_list) in config order. List refs are
+    "key:flavor:version" (lookup is type, key, flavor, version); string refs are
+    "key:version" (lookup is type, key, version).
+    """
+    refs_in_order = []
+    for section_type, refs in orjson.loads(config_json).items():
+        if isinstance(refs, list):
+            for ref in refs:
+                parts = ref.split(":")
+                if len(parts) >= 3:
+                    lookup = (section_type.rstrip('s'), parts[0], parts[1], parts[2])
+                    refs_in_order.append((section_type, parts[0], lookup, True))
+        elif isinstance(refs, str):
+            parts = refs.split(":")
+            if len(parts) >= 2:
+                lookup = (section_type, parts[0], parts[1])
+                refs_in_order.append((section_type, parts[0], lookup, False))
+    return tuple(refs_in_order)
+
+
+def _estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 chars per token), no API round-trip."""
+    return len(text) // 4 + 1
+
+
+def _fit_to_token_budget(parts: List[str], budget: int) -> List[str]:
+    """
+    Keep the leading parts (highest priority first) that fit within budget tokens.
+    
+    The first part is always kept so an oversized item never empties the context.
+    """
+    kept = []
+    used = 0
+    for part in parts:
+        used += _estimate_tokens(part)
+        if used > budget and kept:
+            break
+        kept.append(part)
+    return kept
+
+
+def _dump_content(content: Optional[dict]) -> str:
+    """Serialize section JSONB content as JSON for prompt context."""
+    if not content:
+        return ""
+    return orjson.dumps(content, option=orjson.OPT_INDENT_2).decode()
 
 
 class AIOutreachService:
@@ -20,73 +250,177 @@ class AIOutreachService:
         key = api_key or getattr(settings, 'gemini_api_key', None)
         if not key:
             raise HTTPException(status_code=400, detail="Gemini API key not configured")
-        genai.configure(api_key=key)
-        return genai.GenerativeModel('gemini-2.0-flash')
+        return get_model(key)
+
+    @classmethod
+    async def _generate(cls, prompt: str, api_key: Optional[str] = None, prefix: str = "") -> str:
+        """
+        Run a prompt through Gemini without blocking the event loop.
+        
+        A large, stable prefix (resume + template) is registered as Gemini
+        cached content so repeat calls only send the per-request prompt.
+        """
+        model = cls._get_gemini_client(api_key)
+        cached_model = await get_cached_prefix_model(api_key, prefix) if prefix else None
+        
+        async with _GEMINI_SEMAPHORE:
+            if cached_model is not None:
+                response = await with_retries_async(cached_model.generate_content_async, prompt)
+            else:
+                response = await with_retries_async(model.generate_content_async, prefix + prompt)
+        return response.text.strip()
+
+    @classmethod
+    async def _generate_stream(
+        cls,
+        prompt: str,
+        api_key: Optional[str] = None,
+        prefix: str = ""
+    ) -> AsyncIterator[str]:
+        """Like _generate, but yield text chunks as Gemini produces them."""
+        model = cls._get_gemini_client(api_key)
+        cached_model = await get_cached_prefix_model(api_key, prefix) if prefix else None
+        
+        async with _GEMINI_SEMAPHORE:
+            if cached_model is not None:
+                response = await with_retries_async(cached_model.generate_content_async, prompt, stream=True)
+            else:
+                response = await with_retries_async(model.generate_content_async, prefix + prompt, stream=True)
+            async for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
 
     @staticmethod
     def _fetch_resume_context(db: Session, user_id: UUID, resume_config: Optional[dict] = None) -> str:
-        """Fetch user's resume sections and format as context."""
+        """Fetch user's resume sections and format as context, cached per section state."""
+        cache_key = hash_key(
+            user_id,
+            *get_section_state(db, user_id),
+            orjson.dumps(resume_config, option=orjson.OPT_SORT_KEYS),
+        )
+        context = _resume_contexts.get(cache_key)
+        if context is None:
+            context = AIOutreachService._build_resume_context(db, user_id, resume_config)
+            _resume_contexts.set(cache_key, context)
+        return context
+
+    @staticmethod
+    def _load_current_sections(db: Session, user_id: UUID) -> List[_SectionText]:
+        """Current sections formatted for prompts, in priority order, cached per section state."""
+        cache_key = hash_key("current_sections", user_id, *get_section_state(db, user_id))
+        sections = _resume_contexts.get(cache_key)
+        if sections is None:
+            # Plain column tuples: no identity map or ORM bookkeeping needed
+            rows = db.query(Section.type, Section.key, Section.flavor, Section.content).filter(
+                Section.user_id == user_id,
+                Section.is_current == True
+            ).all()
+            rows.sort(key=lambda s: _SECTION_PRIORITY.get(s.type, len(_SECTION_PRIORITY)))
+            
+            sections = []
+            for row in rows:
+                content_str = _dump_content(row.content)
+                sections.append(_SectionText(
+                    type=row.type,
+                    text=f"**{row.type.title()}** ({row.key}/{row.flavor}):\n{content_str}",
+                    terms=_terms(f"{row.key} {row.flavor} {content_str}"),
+                ))
+            _resume_contexts.set(cache_key, sections)
+        return sections
+
+    @classmethod
+    def _fetch_relevant_resume_context(cls, db: Session, user_id: UUID, query: str) -> str:
+        """
+        Resume context limited to the sections most relevant to query (JD / role text).
+        
+        Sections are ranked by how many query terms they share; headings are
+        always kept. Without query terms this is the full current context.
+        """
+        query_terms = _terms(query)
+        if not query_terms:
+            return cls._fetch_resume_context(db, user_id)
+        
+        sections = cls._load_current_sections(db, user_id)
+        candidates = [s for s in sections if s.type != "heading"]
+        ranked = sorted(candidates, key=lambda s: len(query_terms & s.terms), reverse=True)
+        keep = {id(s) for s in ranked[:settings.outreach_relevant_sections]}
+        
+        # Preserve priority order in the prompt
+        context_parts = [s.text for s in sections if s.type == "heading" or id(s) in keep]
+        context_parts = _fit_to_token_budget(context_parts, settings.gemini_resume_context_max_tokens)
+        return "\n\n".join(context_parts) if context_parts else "No resume content available."
+
+    @staticmethod
+    def _build_resume_context(db: Session, user_id: UUID, resume_config: Optional[dict] = None) -> str:
+        """Load the user's resume sections and format them as prompt context."""
         if resume_config:
-            context_parts = []
+            # Collect every ref first so all sections load in a single query
+            refs_in_order = _parse_resume_refs(orjson.dumps(resume_config))
+            full_keys = [lookup for _, _, lookup, is_list in refs_in_order if is_list]
+            partial_keys = [lookup for _, _, lookup, is_list in refs_in_order if not is_list]
             
-            for section_type, refs in resume_config.items():
-                if isinstance(refs, list):
-                    for ref in refs:
-                        parts = ref.split(":")
-                        if len(parts) >= 3:
-                            key, flavor, version = parts[0], parts[1], parts[2]
-                            section = db.query(Section).filter(
-                                Section.user_id == user_id,
-                                Section.type == section_type.rstrip('s'),
-                                Section.key == key,
-                                Section.flavor == flavor,
-                                Section.version == version
-                            ).first()
-                            if section:
-                                context_parts.append(f"**{section_type.title()}** - {key}:\n{section.content}")
-                elif isinstance(refs, str):
-                    parts = refs.split(":")
-                    if len(parts) >= 2:
-                        key, version = parts[0], parts[1]
-                        section = db.query(Section).filter(
-                            Section.user_id == user_id,
-                            Section.type == section_type,
-                            Section.key == key,
-                            Section.version == version
-                        ).first()
-                        if section:
-                            context_parts.append(f"**{section_type.title()}**:\n{section.content}")
+            if not refs_in_order:
+                return ""
             
-            return "\n\n".join(context_parts) if context_parts else ""
-        else:
-            sections = db.query(Section).filter(
+            conditions = []
+            if full_keys:
+                conditions.append(
+                    tuple_(Section.type, Section.key, Section.flavor, Section.version).in_(full_keys)
+                )
+            if partial_keys:
+                conditions.append(
+                    tuple_(Section.type, Section.key, Section.version).in_(partial_keys)
+                )
+            
+            rows = db.query(
+                Section.type, Section.key, Section.flavor, Section.version, Section.content
+            ).filter(
                 Section.user_id == user_id,
-                Section.is_current == True
+                or_(*conditions)
             ).all()
             
+            by_full_key = {}
+            by_partial_key = {}
+            for row in rows:
+                by_full_key[(row.type, row.key, row.flavor, row.version)] = row
+                by_partial_key.setdefault((row.type, row.key, row.version), row)
+            
             context_parts = []
-            for section in sections:
-                content_str = str(section.content) if section.content else ""
-                context_parts.append(f"**{section.type.title()}** ({section.key}/{section.flavor}):\n{content_str}")
+            for section_type, key, lookup, is_list in refs_in_order:
+                if is_list:
+                    section = by_full_key.get(lookup)
+                    if section:
+                        context_parts.append(f"**{section_type.title()}** - {key}:\n{_dump_content(section.content)}")
+                else:
+                    section = by_partial_key.get(lookup)
+                    if section:
+                        context_parts.append(f"**{section_type.title()}**:\n{_dump_content(section.content)}")
             
+            # resume_config order is the user's priority order
+            context_parts = _fit_to_token_budget(context_parts, settings.gemini_resume_context_max_tokens)
+            return "\n\n".join(context_parts) if context_parts else ""
+        else:
+            context_parts = [
+                section.text for section in AIOutreachService._load_current_sections(db, user_id)
+            ]
+            context_parts = _fit_to_token_budget(context_parts, settings.gemini_resume_context_max_tokens)
             return "\n\n".join(context_parts) if context_parts else "No resume content available."
 
     @staticmethod
     def _fetch_thread_history(db: Session, thread_id: UUID) -> str:
         """Fetch conversation history for a thread."""
+        # Only the most recent messages are useful as prompt context
         messages = db.query(OutreachMessage).filter(
             OutreachMessage.thread_id == thread_id
-        ).order_by(OutreachMessage.created_at.asc()).all()
+        ).order_by(OutreachMessage.created_at.desc()).limit(_MAX_HISTORY_MESSAGES).all()
         
         if not messages:
             return ""
         
-        history_parts = []
-        for msg in messages:
-            direction_label = "You" if msg.direction == "sent" else "Them"
-            history_parts.append(f"{direction_label}: {msg.content}")
-        
-        return "\n\n".join(history_parts)
+        return "\n\n".join(
+            f"{_HISTORY_LABELS.get(msg.direction, 'Them')}: {msg.content}"
+            for msg in reversed(messages)
+        )
 
     @staticmethod
     def _build_generation_prompt(
@@ -97,60 +431,32 @@ class AIOutreachService:
         contact_name: Optional[str],
         resume_context: str,
         additional_context: Optional[str] = None
-    ) -> str:
-        """Build the prompt for message generation."""
-        
-        length_guidance = {
-            "short": "Keep the message concise, around 3-5 sentences. Get to the point quickly.",
-            "long": "Write a more detailed message, around 6-10 sentences. Include more context and personalization."
-        }
-        
-        style_guidance = {
-            "professional": "Use formal, professional language. Be respectful and business-like.",
-            "semi_formal": "Use a friendly but professional tone. Balance warmth with professionalism.",
-            "casual": "Use a relaxed, conversational tone. Be friendly and approachable.",
-            "friend": "Write as if messaging a friend. Be warm, casual, and genuine."
-        }
+    ) -> tuple[str, str]:
+        """
+        Build the prompt for message generation.
         
-        prompt = f"""You are helping craft a personalized cold outreach message.
-
-**TEMPLATE TO FOLLOW:**
-{template_content}
-
-**STYLE:** {style}
-{style_guidance.get(style, style_guidance["professional"])}
-
-**LENGTH:** {length}
-{length_guidance.get(length, length_guidance["short"])}
-
-**TARGET:**
-- Company: {company}
-- Contact: {contact_name or "Unknown"}
-
-**SENDER'S BACKGROUND (use relevant details to personalize):**
-{resume_context}
-
-"""
+        Returns (prefix, prompt): the stable resume + template block, and the
+        per-request remainder.
+        """
         
-        if additional_context:
-            prompt += f"""**ADDITIONAL CONTEXT:**
-{additional_context}
-
-"""
-        
-        prompt += """**INSTRUCTIONS:**
-1. Follow the template structure but personalize it based on the sender's background
-2. Make specific references to the sender's experience that would be relevant to {company}
-3. Keep the tone consistent with the style setting
-4. Do not use generic phrases like "I'm excited" or "I'm passionate" - be specific
-5. Output ONLY the message text, no explanations or alternatives
-
-**GENERATE THE MESSAGE:**"""
+        prefix = _GENERATION_PREFIX.substitute(
+            resume_context=resume_context,
+            template_content=template_content
+        )
+        prompt = _GENERATION_PROMPT.substitute(
+            style=style,
+            style_guidance=_STYLE_GUIDANCE.get(style) or _STYLE_GUIDANCE["professional"],
+            length=length,
+            length_guidance=_LENGTH_GUIDANCE.get(length) or _LENGTH_GUIDANCE["short"],
+            company=company,
+            contact_name=contact_name or "Unknown",
+            additional_context=f"**ADDITIONAL CONTEXT:**\n{additional_context}\n\n" if additional_context else ""
+        )
         
-        return prompt
+        return prefix, prompt
 
     @classmethod
-    def generate_initial_message(
+    async def generate_initial_message(
         cls,
         db: Session,
         user_id: UUID,
@@ -163,17 +469,19 @@ class AIOutreachService:
     ) -> str:
         """Generate an initial outreach message."""
         
-        template = db.query(OutreachTemplate).filter(
-            OutreachTemplate.id == template_id,
-            OutreachTemplate.user_id == user_id
-        ).first()
-        
-        if not template:
-            raise HTTPException(status_code=404, detail="Template not found")
+        def load():
+            template = db.query(OutreachTemplate).filter(
+                OutreachTemplate.id == template_id,
+                OutreachTemplate.user_id == user_id
+            ).first()
+            if not template:
+                raise HTTPException(status_code=404, detail="Template not found")
+            return template, cls._fetch_resume_context(db, user_id, resume_config)
         
-        resume_context = cls._fetch_resume_context(db, user_id, resume_config)
+        # The session is sync; keep its queries off the event loop
+        template, resume_context = await asyncio.to_thread(load)
         
-        prompt = cls._build_generation_prompt(
+        prefix, prompt = cls._build_generation_prompt(
             template_content=template.content,
             style=template.style,
             length=template.length,
@@ -183,13 +491,10 @@ class AIOutreachService:
             additional_context=additional_context
         )
         
-        model = cls._get_gemini_client(api_key)
-        response = model.generate_content(prompt)
-        
-        return response.text.strip()
+        return await cls._generate(prompt, api_key, prefix=prefix)
 
     @classmethod
-    def refine_message(
+    async def refine_message(
         cls,
         original_message: str,
         refinement_instructions: str,
@@ -201,29 +506,14 @@ class AIOutreachService:
         
         char_limit = 300 if length == "short" else 600
         
-        prompt = f"""You are helping refine a cold outreach message.
-
-**ORIGINAL MESSAGE:**
-{original_message}
-
-**REFINEMENT INSTRUCTIONS:**
-{refinement_instructions}
-
-**CONSTRAINTS:**
-- Style: {style or 'maintain current style'}
-- Maximum length: {char_limit} characters (STRICT for short messages)
-
-**INSTRUCTIONS:**
-1. Apply the refinement instructions to improve the message
-2. Keep the core intent and personalization unless specifically asked to change it
-3. Maintain any specific details about the person's background
-4. Output ONLY the refined message text, no explanations or preamble
-
-**REFINED MESSAGE:**"""
+        prompt = _REFINE_PROMPT.substitute(
+            original_message=original_message,
+            refinement_instructions=refinement_instructions,
+            style=style or 'maintain current style',
+            char_limit=char_limit
+        )
         
-        model = cls._get_gemini_client(api_key)
-        response = model.generate_content(prompt)
-        refined = response.text.strip()
+        refined = await cls._generate(prompt, api_key)
         
         if length == "short" and len(refined) > 300:
             refined = refined[:297] + "..."
@@ -234,47 +524,17 @@ class AIOutreachService:
         }
 
     @classmethod
-    def parse_conversation(
+    async def parse_conversation(
         cls,
         raw_text: str,
         api_key: Optional[str] = None
     ) -> dict:
         """Parse a raw conversation dump into structured messages."""
-        import json
-        
-        prompt = f"""Parse this conversation into individual messages. For each message, determine:
-1. Direction: "sent" (from the job seeker/user) or "received" (from the recruiter/contact)
-2. Content: the message text (clean it up, remove timestamps from the text itself)
-3. Timestamp: if visible in the conversation (format: ISO 8601, e.g., "2026-01-15T14:30:00")
-
-**CONVERSATION TO PARSE:**
-{raw_text}
-
-**INSTRUCTIONS:**
-- Look for patterns like "Me:", "Them:", "SENT", "RECEIVED", timestamps, or indentation to determine direction
-- Messages marked "SENT" are from the user (direction: "sent")
-- Messages marked "RECEIVED" are from the contact (direction: "received")
-- Clean up the message content (remove leading timestamps, direction labels, etc.)
-- If no clear timestamp, set message_at to null
-
-**RESPOND IN THIS EXACT JSON FORMAT (no markdown, no code blocks):**
-{{"messages": [{{"direction": "sent", "content": "message text here", "message_at": "2026-01-15T14:30:00"}}]}}
-
-If you cannot parse the conversation at all, respond with:
-{{"error": "Could not parse conversation"}}"""
+        prompt = _PARSE_PROMPT.substitute(raw_text=raw_text)
         
         try:
-            model = cls._get_gemini_client(api_key)
-            response = model.generate_content(prompt)
-            
-            response_text = response.text.strip()
-            if response_text.startswith("```"):
-                response_text = response_text.split("```")[1]
-                if response_text.startswith("json"):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
-            
-            result = json.loads(response_text)
+            response_text = strip_code_fences(await cls._generate(prompt, api_key))
+            result = orjson.loads(response_text)
             
             if "error" in result:
                 return {
@@ -283,13 +543,8 @@ If you cannot parse the conversation at all, respond with:
                     "raw_fallback": raw_text
                 }
             
-            parsed_messages = []
-            for m in result.get("messages", []):
-                parsed_messages.append({
-                    "direction": m.get("direction", "sent"),
-                    "content": m.get("content", ""),
-                    "message_at": m.get("message_at")
-                })
+            # Defaults, enum coercion and timestamp parsing all happen in pydantic-core
+            parsed_messages = _PARSED_MESSAGES.validate_python(result.get("messages", []))
             
             return {
                 "success": True,
@@ -305,22 +560,16 @@ If you cannot parse the conversation at all, respond with:
             }
 
     @classmethod
-    def generate_reply(
+    def _build_reply_prompt(
         cls,
         db,
         user_id,
         thread_id,
         instructions: Optional[str] = None,
         style: str = "semi_formal",
-        length: str = "long",
-        api_key: Optional[str] = None
-    ) -> dict:
-        """Generate a reply for an ongoing conversation thread."""
-        from app.models.outreach_thread import OutreachThread
-        from app.models.outreach_message import OutreachMessage
-        from app.models.section import Section
-        from fastapi import HTTPException
-        
+        length: str = "long"
+    ) -> str:
+        """Build the reply prompt for a thread from its recent history."""
         # Get the thread
         thread = db.query(OutreachThread).filter(
             OutreachThread.id == thread_id,
@@ -330,60 +579,63 @@ If you cannot parse the conversation at all, respond with:
         if not thread:
             raise HTTPException(status_code=404, detail="Thread not found")
         
-        # Get all messages in the thread, ordered by time
-        messages = db.query(OutreachMessage).filter(
+        # Newest first; the reverse of the thread's chronological order
+        newest_first = (
+            OutreachMessage.message_at.desc().nullslast(),
+            OutreachMessage.created_at.desc(),
+        )
+        
+        # Only the last 10 messages are used as context
+        recent_messages = db.query(OutreachMessage).filter(
             OutreachMessage.thread_id == thread_id
-        ).order_by(OutreachMessage.message_at.asc().nullsfirst(), OutreachMessage.created_at.asc()).all()
+        ).order_by(*newest_first).limit(_REPLY_HISTORY_MESSAGES).all()[::-1]
         
-        if not messages:
+        if not recent_messages:
             raise HTTPException(status_code=400, detail="Thread has no messages to reply to")
         
+        def last_with_direction(direction: str):
+            # Usually within the recent window; otherwise fetch just that one row
+            for msg in reversed(recent_messages):
+                if msg.direction == direction:
+                    return msg
+            if len(recent_messages) < _REPLY_HISTORY_MESSAGES:
+                return None
+            return db.query(OutreachMessage).filter(
+                OutreachMessage.thread_id == thread_id,
+                OutreachMessage.direction == direction
+            ).order_by(*newest_first).first()
+        
         # Find the last received message (this is what we're replying to)
-        last_received = None
-        for msg in reversed(messages):
-            if msg.direction == "received":
-                last_received = msg
-                break
+        last_received = last_with_direction(_RECEIVED)
         
         # Find the last sent message (for context on where we left off)
-        last_sent = None
-        for msg in reversed(messages):
-            if msg.direction == "sent":
-                last_sent = msg
-                break
-        
-        # Build conversation history (last 10 messages for context)
-        recent_messages = messages[-10:] if len(messages) > 10 else messages
-        history_lines = []
-        for msg in recent_messages:
-            if msg.direction == "sent":
-                direction_label = "ME (you - the job seeker)"
-            else:
-                direction_label = f"THEM ({thread.contact_name or 'contact'} at {thread.company})"
-            history_lines.append(f"[{direction_label}]: {msg.content}")
-        history = "\n\n".join(history_lines)
+        last_sent = last_with_direction(_SENT)
         
-        # Get resume context
-        sections = db.query(Section).filter(
-            Section.user_id == user_id,
-            Section.is_current == True
-        ).all()
+        # Build conversation history
+        reply_labels = {
+            _SENT: "ME (you - the job seeker)",
+            _RECEIVED: f"THEM ({thread.contact_name or 'contact'} at {thread.company})",
+        }
+        history_lines = [
+            f"[{reply_labels.get(msg.direction, reply_labels[_RECEIVED])}]: {msg.content}"
+            for msg in recent_messages
+        ]
+        # Drop the oldest messages first once over the history budget
+        history = "\n\n".join(reversed(
+            _fit_to_token_budget(history_lines[::-1], settings.gemini_reply_history_max_tokens)
+        ))
+        
+        # Get resume context (the section list is cached, so this check is free)
+        sections = cls._load_current_sections(db, user_id)
         
         resume_context = cls._fetch_resume_context(db, user_id) if sections else "No resume sections available."
         
         # Build the prompt
-        style_instructions = {
-            "professional": "formal and polished",
-            "semi_formal": "professional but approachable",
-            "casual": "friendly and conversational",
-            "friend": "warm and familiar"
-        }
-        
         char_limit = 300 if length == "short" else 600
         
         # Determine conversation state
         if last_received and last_sent:
-            if messages[-1].direction == "received":
+            if recent_messages[-1].direction == _RECEIVED:
                 conv_state = "They sent the last message. You need to reply to them."
             else:
                 conv_state = "You sent the last message. You may be following up since they haven't replied."
@@ -394,7 +646,7 @@ If you cannot parse the conversation at all, respond with:
         else:
             conv_state = "Starting a new conversation."
         
-        prompt = f"""You are helping write a reply in an ongoing job-related LinkedIn conversation.
+        parts = [f"""You are helping write a reply in an ongoing job-related LinkedIn conversation.
 
 **CONTACT:** {thread.contact_name or 'Unknown'} at {thread.company}
 
@@ -403,48 +655,54 @@ If you cannot parse the conversation at all, respond with:
 **RECENT CONVERSATION HISTORY (oldest to newest):**
 {history}
 
-"""
+"""]
         
         if last_received:
-            prompt += f"""**THE LAST MESSAGE FROM THEM (this is what you're replying to):**
+            parts.append(f"""**THE LAST MESSAGE FROM THEM (this is what you're replying to):**
 {last_received.content[:500]}{'...' if len(last_received.content) > 500 else ''}
 
-"""
+""")
         
         if last_sent:
-            prompt += f"""**YOUR LAST MESSAGE (for context):**
+            parts.append(f"""**YOUR LAST MESSAGE (for context):**
 {last_sent.content[:300]}{'...' if len(last_sent.content) > 300 else ''}
 
-"""
+""")
         
-        prompt += f"""**YOUR BACKGROUND:**
+        parts.append(f"""**YOUR BACKGROUND:**
 {resume_context}
 
-**STYLE:** {style_instructions.get(style, 'professional but approachable')}
+**STYLE:** {_STYLE_INSTRUCTIONS.get(style) or _STYLE_INSTRUCTIONS['semi_formal']}
 **MAX LENGTH:** {char_limit} characters
 
-"""
+""")
         
         if instructions:
-            prompt += f"""**SPECIFIC INSTRUCTIONS FROM USER:**
+            parts.append(f"""**SPECIFIC INSTRUCTIONS FROM USER:**
 {instructions}
 
-"""
+""")
         
-        prompt += """**INSTRUCTIONS:**
-1. Write a natural reply that responds to their last message
-2. Reference your background ONLY if relevant to what they said
-3. Be helpful and move toward your goal (getting a referral, interview, info)
-4. If they shared a job posting, express genuine interest and ask a relevant question
-5. If they asked a question, answer it directly
-6. Keep it concise and end with a clear next step or question
-7. Output ONLY the reply text, no explanations or preamble
-
-**YOUR REPLY:**"""
+        parts.append(_REPLY_INSTRUCTIONS)
         
-        model = cls._get_gemini_client(api_key)
-        response = model.generate_content(prompt)
-        reply = response.text.strip()
+        return "".join(parts)
+
+    @classmethod
+    async def generate_reply(
+        cls,
+        db,
+        user_id,
+        thread_id,
+        instructions: Optional[str] = None,
+        style: str = "semi_formal",
+        length: str = "long",
+        api_key: Optional[str] = None
+    ) -> dict:
+        """Generate a reply for an ongoing conversation thread."""
+        prompt = await asyncio.to_thread(
+            cls._build_reply_prompt, db, user_id, thread_id, instructions, style, length
+        )
+        reply = await cls._generate(prompt, api_key)
         
         if length == "short" and len(reply) > 300:
             reply = reply[:297] + "..."
@@ -455,22 +713,37 @@ If you cannot parse the conversation at all, respond with:
         }
 
     @classmethod
-    def generate_message(
+    def stream_reply(
+        cls,
+        db,
+        user_id,
+        thread_id,
+        instructions: Optional[str] = None,
+        style: str = "semi_formal",
+        length: str = "long",
+        api_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a reply for a thread as it is generated.
+        
+        The prompt (and any 404/400) is resolved up front; the short-length
+        truncation is left to the client since the text arrives in pieces.
+        """
+        prompt = cls._build_reply_prompt(db, user_id, thread_id, instructions, style, length)
+        return cls._generate_stream(prompt, api_key)
+
+    @classmethod
+    def _load_message_context(
         cls,
         db: Session,
         user_id: UUID,
-        company: str,
-        style: str = "semi_formal",
-        length: str = "short",
+        style: str,
+        length: str,
         template_id: Optional[UUID] = None,
-        contact_name: Optional[str] = None,
-        jd_text: Optional[str] = None,
         application_id: Optional[UUID] = None,
-        api_key: Optional[str] = None
+        jd_text: Optional[str] = None
     ) -> dict:
-        """Generate a cold outreach message."""
-        from app.models.application import Application
-        
+        """Load the template, application and resume context shared by cold messages."""
         template_content = ""
         if template_id:
             template = db.query(OutreachTemplate).filter(
@@ -493,69 +766,153 @@ If you cannot parse the conversation at all, respond with:
                 if app.job_url:
                     app_context += f"\nJob URL: {app.job_url}"
         
-        resume_context = cls._fetch_resume_context(db, user_id)
+        return {
+            "style": style,
+            "length": length,
+            "template_content": template_content,
+            "app_context": app_context,
+            "resume_context": cls._fetch_relevant_resume_context(
+                db, user_id, f"{jd_text or ''}\n{app_context}"
+            )
+        }
+
+    @staticmethod
+    def _build_message_prompt(
+        company: str,
+        contact_name: Optional[str],
+        jd_text: Optional[str],
+        context: dict
+    ) -> tuple[str, str]:
+        """
+        Build the prompt for a cold outreach message.
         
-        char_limit = 300 if length == "short" else 600
+        Returns (prefix, prompt): the stable resume + template block, and the
+        per-target remainder.
+        """
+        style = context["style"]
+        char_limit = 300 if context["length"] == "short" else 600
         
-        style_guidance = {
-            "professional": "Use formal, professional language. Be respectful and business-like.",
-            "semi_formal": "Use a friendly but professional tone. Balance warmth with professionalism.",
-            "casual": "Use a relaxed, conversational tone. Be friendly and approachable.",
-            "friend": "Write as if messaging a friend. Be warm, casual, and genuine."
-        }
+        prefix_parts = [f"""Generate a cold outreach message for job networking.
+
+**SENDER'S BACKGROUND:**
+{context["resume_context"]}
+
+"""]
         
-        prompt = f"""Generate a cold outreach message for job networking.
+        if context["template_content"]:
+            prefix_parts.append(f"""**TEMPLATE TO FOLLOW:**
+{context["template_content"]}
 
-**TARGET:**
+""")
+        
+        parts = [f"""**TARGET:**
 - Company: {company}
 - Contact: {contact_name or "a professional at the company"}
 
 **STYLE:** {style}
-{style_guidance.get(style, style_guidance["semi_formal"])}
+{_STYLE_GUIDANCE.get(style) or _STYLE_GUIDANCE["semi_formal"]}
 
 **LENGTH:** Maximum {char_limit} characters (this is STRICT for short messages)
 
-**SENDER'S BACKGROUND:**
-{resume_context}
-
-"""
-        
-        if template_content:
-            prompt += f"""**TEMPLATE TO FOLLOW:**
-{template_content}
-
-"""
+"""]
         
         if jd_text:
-            prompt += f"""**JOB DESCRIPTION CONTEXT:**
+            parts.append(f"""**JOB DESCRIPTION CONTEXT:**
 {jd_text[:1000]}
 
-"""
+""")
         
-        if app_context:
-            prompt += f"""**APPLICATION CONTEXT:**
-{app_context}
+        if context["app_context"]:
+            parts.append(f"""**APPLICATION CONTEXT:**
+{context["app_context"]}
 
-"""
+""")
         
-        prompt += """**INSTRUCTIONS:**
-1. Write a concise, personalized cold outreach message
-2. Reference specific relevant experience from the sender's background
-3. Make it clear what you're asking for (referral, coffee chat, advice, etc.)
-4. Do NOT use generic phrases like "I'm excited" or "I'm passionate"
-5. Do NOT start with "I hope this message finds you well"
-6. Be specific and genuine
-7. Output ONLY the message text, no explanations
+        parts.append(_MESSAGE_INSTRUCTIONS)
+        
+        return "".join(prefix_parts), "".join(parts)
 
-**GENERATE THE MESSAGE:**"""
+    @classmethod
+    async def generate_message(
+        cls,
+        db: Session,
+        user_id: UUID,
+        company: str,
+        style: str = "semi_formal",
+        length: str = "short",
+        template_id: Optional[UUID] = None,
+        contact_name: Optional[str] = None,
+        jd_text: Optional[str] = None,
+        application_id: Optional[UUID] = None,
+        api_key: Optional[str] = None
+    ) -> dict:
+        """Generate a cold outreach message."""
+        context = await asyncio.to_thread(
+            cls._load_message_context, db, user_id, style, length, template_id, application_id, jd_text
+        )
+        prefix, prompt = cls._build_message_prompt(company, contact_name, jd_text, context)
+        length = context["length"]
         
-        model = cls._get_gemini_client(api_key)
-        response = model.generate_content(prompt)
-        message = response.text.strip()
+        message = await cls._generate(prompt, api_key, prefix=prefix)
         
         if length == "short" and len(message) > 300:
             message = message[:297] + "..."
         
         return {
             "message": message
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def stream_message(
+        cls,
+        db: Session,
+        user_id: UUID,
+        company: str,
+        style: str = "semi_formal",
+        length: str = "short",
+        template_id: Optional[UUID] = None,
+        contact_name: Optional[str] = None,
+        jd_text: Optional[str] = None,
+        application_id: Optional[UUID] = None,
+        api_key: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream a cold outreach message as it is generated (no truncation)."""
+        context = cls._load_message_context(db, user_id, style, length, template_id, application_id, jd_text)
+        prefix, prompt = cls._build_message_prompt(company, contact_name, jd_text, context)
+        return cls._generate_stream(prompt, api_key, prefix=prefix)
+
+    @classmethod
+    async def generate_messages_batch(
+        cls,
+        db: Session,
+        user_id: UUID,
+        targets: List[dict],
+        style: str = "semi_formal",
+        length: str = "short",
+        template_id: Optional[UUID] = None,
+        jd_text: Optional[str] = None,
+        application_id: Optional[UUID] = None,
+        api_key: Optional[str] = None
+    ) -> List[dict]:
+        """Generate cold outreach messages for several company/contact targets at once."""
+        context = await asyncio.to_thread(
+            cls._load_message_context, db, user_id, style, length, template_id, application_id, jd_text
+        )
+        prompts = [
+            "".join(cls._build_message_prompt(t["company"], t.get("contact_name"), jd_text, context))
+            for t in targets
+        ]
+        
+        gemini = get_gemini_service(api_key)
+        outputs = await gemini.generate_batch(prompts)
+        
+        results = []
+        for target, output in zip(targets, outputs):
+            if isinstance(output, Exception):
+                results.append({**target, "message": None, "error": str(output)})
+                continue
+            if context["length"] == "short" and len(output) > 300:
+                output = output[:297] + "..."
+            results.append({**target, "message": output, "error": None})
+        
+        return results
@@ -1,5 +1,5 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy.orm import Session, defer
+from sqlalchemy import and_, delete, update
 from uuid import UUID
 from typing import Optional
 from datetime import date
@@ -8,12 +8,18 @@ from app.models.application import Application
 from app.schemas.application import ApplicationCreate, ApplicationUpdate
 
 
+# List responses never include the stored JD text, so don't ship it from Postgres
+_LIST_OPTIONS = (defer(Application.job_description, raiseload=True),)
+
+
 def get_all_applications(db: Session, user_id: UUID) -> list[Application]:
-    return db.query(Application).filter(Application.user_id == user_id).order_by(Application.applied_at.desc()).all()
+    return db.query(Application).options(*_LIST_OPTIONS).filter(
+        Application.user_id == user_id
+    ).order_by(Application.applied_at.desc()).all()
 
 
 def get_applications_by_status(db: Session, user_id: UUID, status: str) -> list[Application]:
-    return db.query(Application).filter(
+    return db.query(Application).options(*_LIST_OPTIONS).filter(
         and_(Application.user_id == user_id, Application.status == status)
     ).order_by(Application.applied_at.desc()).all()
 
@@ -47,24 +53,34 @@ def create_application(db: Session, user_id: UUID, application: ApplicationCreat
 def update_application(
     db: Session, user_id: UUID, application_id: UUID, application: ApplicationUpdate
 ) -> Optional[Application]:
-    db_application = get_application_by_id(db, user_id, application_id)
-    if not db_application:
-        return None
-
     update_data = application.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_application, field, value)
+    if not update_data:
+        return get_application_by_id(db, user_id, application_id)
+
+    # Single UPDATE ... RETURNING instead of SELECT, mutate, flush
+    stmt = (
+        update(Application)
+        .where(Application.user_id == user_id, Application.id == application_id)
+        .values(**update_data)
+        .returning(Application)
+        .execution_options(populate_existing=True)
+    )
+    db_application = db.execute(stmt).scalar_one_or_none()
+    if db_application is None:
+        return None
 
+    # Detach before commit so the RETURNING values aren't expired and re-fetched
+    db.expunge(db_application)
     db.commit()
-    db.refresh(db_application)
     return db_application
 
 
 def delete_application(db: Session, user_id: UUID, application_id: UUID) -> bool:
-    db_application = get_application_by_id(db, user_id, application_id)
-    if not db_application:
-        return False
-
-    db.delete(db_application)
+    stmt = (
+        delete(Application)
+        .where(Application.user_id == user_id, Application.id == application_id)
+        .returning(Application.id)
+    )
+    deleted_id = db.execute(stmt).scalar_one_or_none()
     db.commit()
-    return True
\ No newline at end of file
+    return deleted_id is not None
@@ -4,11 +4,26 @@ Used by: Cold Outreach, JD Matcher
 """
 
 import google.generativeai as genai
+import orjson
+from google.generativeai import caching
+from google.generativeai import client as genai_client
 from google.generativeai.types import GenerationConfig
 from fastapi import HTTPException
-from typing import Optional, Dict, List, Any
-import json
+from typing import AsyncIterator, Awaitable, Callable, Optional, Dict, List, Any, Tuple, TypeVar, Union
+from google.api_core import exceptions as core_exceptions
+import asyncio
+import hashlib
+import random
 import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from app.config import settings
+from app.utils.cache import DiskCache, LRUCache, TieredCache, hash_key
+from app.utils.json_scan import JSONStreamScanner, extract_json_object
 
 
 class GeminiServiceError(Exception):
@@ -26,11 +41,263 @@ class GeminiRateLimitError(GeminiServiceError):
     pass
 
 
+# Contents of a ```/```json fence wrapping the whole response (closing fence
+# optional); fences inside JSON string values are left alone
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*(.*?)(?:```\s*$|$)", re.S)
+
+
+def strip_code_fences(text: str) -> str:
+    """Return the body of a markdown code fence wrapping text, or text itself."""
+    match = _FENCE_RE.match(text)
+    return (match.group(1) if match else text).strip()
+
+
 # Aliases for JD Matcher compatibility
 GeminiError = GeminiServiceError
 GeminiAuthError = GeminiAPIKeyError
 
 
+def json_config(max_output_tokens: int, temperature: float = 0.1) -> GenerationConfig:
+    """
+    Config for structured calls: bare JSON output (no fences or prose), a
+    length cap, and near-deterministic sampling so repeat prompts agree and
+    cache well.
+    """
+    return GenerationConfig(
+        response_mime_type="application/json",
+        max_output_tokens=max_output_tokens,
+        temperature=temperature,
+        top_p=0.9,
+    )
+
+
+_ANALYSIS_CONFIG = json_config(1024)
+
+# Exact-match response cache shared by GeminiService and the JD helpers.
+# With GEMINI_DISK_CACHE_PATH set, entries also persist in a SQLite file
+# shared by all workers and kept across restarts.
+response_cache = TieredCache(
+    LRUCache(
+        maxsize=settings.gemini_cache_size,
+        ttl=settings.gemini_cache_ttl_seconds
+    ),
+    DiskCache(
+        settings.gemini_disk_cache_path,
+        ttl=settings.gemini_disk_cache_ttl_seconds
+    ) if settings.gemini_disk_cache_path else None
+)
+
+
+# One client manager per API key, so each key keeps its own long-lived gRPC
+# channels instead of everything sharing (and racing on) the global
+# genai.configure() state. Keys are stored only as blake2b digests.
+# Both maps are LRU-bounded so a stream of one-off keys can't grow them forever.
+_MAX_CACHED_KEYS = 128
+_client_managers: "OrderedDict[bytes, genai_client._ClientManager]" = OrderedDict()
+_models: "OrderedDict[tuple, genai.GenerativeModel]" = OrderedDict()
+# Guards inserts into the two maps only; hits are lock-free
+_models_lock = threading.Lock()
+# Held across global genai.configure() + SDK calls that use the default
+# clients (network round trips), so it must never be taken on the event loop
+_configure_lock = threading.Lock()
+
+
+def _remember(cache: OrderedDict, key, value) -> None:
+    """Insert as most recently used and evict the oldest past _MAX_CACHED_KEYS (call under the lock)."""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > _MAX_CACHED_KEYS:
+        cache.popitem(last=False)
+
+
+def _key_digest(api_key: str) -> bytes:
+    return hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+
+
+def _lookup(cache: OrderedDict, key):
+    """Lock-free hit path: single OrderedDict ops are atomic under the GIL."""
+    value = cache.get(key)
+    if value is not None:
+        try:
+            cache.move_to_end(key)
+        except KeyError:
+            pass  # evicted concurrently; still fine to use
+    return value
+
+
+def get_client_manager(api_key: str) -> genai_client._ClientManager:
+    """Return the client manager configured for this key, creating it on first use."""
+    digest = _key_digest(api_key)
+    clients = _lookup(_client_managers, digest)
+    if clients is not None:
+        return clients
+    
+    with _models_lock:
+        clients = _client_managers.get(digest)
+        if clients is None:
+            clients = genai_client._ClientManager()
+            clients.configure(api_key=api_key)
+            _remember(_client_managers, digest, clients)
+    return clients
+
+
+@contextmanager
+def configured(api_key: str):
+    """Hold the global genai config on api_key, for SDK helpers that only use the default clients."""
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        yield
+
+
+class _KeyedModel(genai.GenerativeModel):
+    """GenerativeModel that talks through one key's clients rather than the global defaults."""
+    
+    def __init__(self, model_name: str, clients: genai_client._ClientManager):
+        super().__init__(model_name)
+        self._clients = clients
+        # Open the sync channel now so the first request doesn't pay for it
+        self._client = clients.get_default_client("generative")
+    
+    async def generate_content_async(self, *args, **kwargs):
+        # aio gRPC channels attach to the loop they are created on, so the
+        # async client is opened lazily from the serving loop
+        if self._async_client is None:
+            self._async_client = self._clients.get_default_client("generative_async")
+        return await super().generate_content_async(*args, **kwargs)
+
+
+def get_model(api_key: str, model_name: str = "gemini-2.0-flash") -> genai.GenerativeModel:
+    """Return a shared GenerativeModel for this key, building it on first use."""
+    cache_key = (_key_digest(api_key), model_name)
+    model = _lookup(_models, cache_key)
+    if model is not None:
+        return model
+    
+    clients = get_client_manager(api_key)
+    with _models_lock:
+        model = _models.get(cache_key)
+        if model is None:
+            model = _KeyedModel(model_name, clients)
+            _remember(_models, cache_key, model)
+    return model
+
+
+# Explicit context caching needs a pinned model version
+_CACHEABLE_MODEL = "gemini-2.0-flash-001"
+_CONTEXT_CACHE_TTL = timedelta(hours=1)
+# Handles expire a minute before Gemini drops the cached content
+_context_caches = LRUCache(maxsize=256, ttl=_CONTEXT_CACHE_TTL.total_seconds() - 60)
+
+
+async def get_cached_prefix_model(api_key: str, prefix: str) -> Optional[genai.GenerativeModel]:
+    """
+    Return a model bound to Gemini cached content for prefix, so calls only
+    send the remainder of the prompt; None if prefix is too small to cache
+    or the cache can't be created.
+    """
+    # Rough 4-chars-per-token estimate; Gemini rejects caches below its minimum size
+    if len(prefix) // 4 < settings.gemini_context_cache_min_tokens:
+        return None
+    
+    key = hash_key(api_key, prefix)
+    cached = _context_caches.get(key)
+    if cached is None:
+        def create():
+            # CachedContent.create only uses the SDK's default clients
+            with configured(api_key):
+                return caching.CachedContent.create(
+                    model=_CACHEABLE_MODEL,
+                    contents=[prefix],
+                    ttl=_CONTEXT_CACHE_TTL
+                )
+        
+        try:
+            cached = await asyncio.to_thread(create)
+        except Exception:
+            return None
+        _context_caches.set(key, cached)
+    
+    model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+    # Bind to this key's long-lived channel; we're on the serving loop here
+    model._async_client = get_client_manager(api_key).get_default_client("generative_async")
+    return model
+
+
+# Whole words/phrases only: a bare "rate" would match "generateContent"
+_RATE_LIMIT_RE = re.compile(r"\b(?:429|resource[ _]exhausted|rate[ _-]?limit(?:ed)?|quota)\b", re.I)
+
+
+def _is_rate_limit(e: Exception) -> bool:
+    return isinstance(e, (core_exceptions.ResourceExhausted, core_exceptions.TooManyRequests)) or bool(
+        _RATE_LIMIT_RE.search(str(e))
+    )
+
+
+def _translate_error(e: Exception) -> GeminiServiceError:
+    """Map a raw SDK exception onto the typed Gemini service errors."""
+    error_msg = str(e).lower()
+    
+    if "api key" in error_msg or "invalid" in error_msg or "401" in error_msg:
+        return GeminiAPIKeyError(f"Invalid Gemini API key: {e}")
+    elif _is_rate_limit(e):
+        return GeminiRateLimitError(f"Rate limit exceeded. Please try again later: {e}")
+    else:
+        return GeminiServiceError(f"Gemini API error: {e}")
+
+
+T = TypeVar("T")
+
+# Transient failures worth retrying; everything else fails fast
+_RETRYABLE_ERRORS = (
+    core_exceptions.ResourceExhausted,
+    core_exceptions.TooManyRequests,
+    core_exceptions.ServiceUnavailable,
+    core_exceptions.DeadlineExceeded,
+    TimeoutError,
+)
+# HTTP statuses those exceptions stand for, for errors raised as a generic GoogleAPICallError
+_RETRYABLE_STATUS_CODES = (429, 503, 504)
+_RETRY_INITIAL_DELAY = 0.5
+_RETRY_MAX_DELAY = 8.0
+
+
+def _is_retryable(e: Exception) -> bool:
+    return isinstance(e, _RETRYABLE_ERRORS) or (
+        isinstance(e, core_exceptions.GoogleAPICallError) and e.code in _RETRYABLE_STATUS_CODES
+    )
+
+
+def _retry_delay(attempt: int, e: Exception) -> float:
+    """Server-suggested RetryInfo delay if present, else exponential backoff with full jitter."""
+    for detail in getattr(e, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return min(retry_delay.seconds + retry_delay.nanos / 1e9, _RETRY_MAX_DELAY)
+    return random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_INITIAL_DELAY * 2 ** attempt))
+
+
+def with_retries(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Call fn, retrying transient Gemini errors up to settings.gemini_max_retries times."""
+    for attempt in range(settings.gemini_max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == settings.gemini_max_retries or not _is_retryable(e):
+                raise
+            time.sleep(_retry_delay(attempt, e))
+
+
+async def with_retries_async(fn: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+    """Async counterpart of with_retries; waits without blocking the event loop."""
+    for attempt in range(settings.gemini_max_retries + 1):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == settings.gemini_max_retries or not _is_retryable(e):
+                raise
+            await asyncio.sleep(_retry_delay(attempt, e))
+
+
 class GeminiService:
     """
     Reusable Gemini Pro API client.
@@ -46,24 +313,48 @@ class GeminiService:
             raise GeminiAPIKeyError("Gemini API key is required")
         
         self.api_key = api_key.strip()
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(self.DEFAULT_MODEL)
+        self.model = get_model(self.api_key, self.DEFAULT_MODEL)
+    
+    def _prepare_request(
+        self,
+        prompt: str,
+        max_tokens: int,
+        temperature: float,
+        json_mode: bool
+    ) -> Tuple[str, GenerationConfig, str]:
+        """Final prompt, generation config and response-cache key for a request."""
+        generation_config = GenerationConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature,
+        )
+        
+        # Add JSON instruction if needed
+        if json_mode:
+            prompt = f"{prompt}\n\nRespond ONLY with valid JSON, no markdown formatting or extra text."
+        
+        cache_key = hash_key(self.DEFAULT_MODEL, temperature, max_tokens, prompt)
+        return prompt, generation_config, cache_key
     
     def generate_text(
         self,
         prompt: str,
         max_tokens: int = 1024,
         temperature: float = 0.7,
-        json_mode: bool = False
+        json_mode: bool = False,
+        cache: bool = True
     ) -> str:
         """
         Generate text using Gemini Pro.
         
+        Blocks for the whole request; async callers should use
+        generate_text_async instead.
+        
         Args:
             prompt: The input prompt
             max_tokens: Maximum tokens in response
             temperature: Creativity (0.0-1.0)
             json_mode: If True, instruct model to return valid JSON
+            cache: If False, skip the response cache (e.g. to regenerate)
             
         Returns:
             Generated text string
@@ -74,16 +365,51 @@ class GeminiService:
             GeminiServiceError: Other API errors
         """
         try:
-            generation_config = GenerationConfig(
-                max_output_tokens=max_tokens,
-                temperature=temperature,
+            prompt, generation_config, cache_key = self._prepare_request(prompt, max_tokens, temperature, json_mode)
+            if cache:
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            response = with_retries(
+                self.model.generate_content,
+                prompt,
+                generation_config=generation_config
             )
             
-            # Add JSON instruction if needed
-            if json_mode:
-                prompt = f"{prompt}\n\nRespond ONLY with valid JSON, no markdown formatting or extra text."
+            # Check for blocked content
+            if not response.candidates:
+                raise GeminiServiceError("Response was blocked by safety filters")
+            
+            text = response.text.strip()
+            response_cache.set(cache_key, text)
+            return text
+            
+        except Exception as e:
+            raise _translate_error(e)
+    
+    async def generate_text_async(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        temperature: float = 0.7,
+        json_mode: bool = False,
+        cache: bool = True
+    ) -> str:
+        """
+        Async counterpart of generate_text using the SDK's native async
+        client, so the event loop keeps serving other requests meanwhile.
+        Shares the response cache and error handling with generate_text.
+        """
+        try:
+            prompt, generation_config, cache_key = self._prepare_request(prompt, max_tokens, temperature, json_mode)
+            if cache:
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
-            response = self.model.generate_content(
+            response = await with_retries_async(
+                self.model.generate_content_async,
                 prompt,
                 generation_config=generation_config
             )
@@ -92,17 +418,93 @@ class GeminiService:
             if not response.candidates:
                 raise GeminiServiceError("Response was blocked by safety filters")
             
-            return response.text.strip()
+            text = response.text.strip()
+            response_cache.set(cache_key, text)
+            return text
+            
+        except Exception as e:
+            raise _translate_error(e)
+    
+    async def generate_text_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 1024,
+        temperature: float = 0.7
+    ) -> AsyncIterator[str]:
+        """
+        Stream generated text chunk by chunk as Gemini produces it.
+        
+        Streamed responses bypass the response cache.
+        
+        Args:
+            prompt: The input prompt
+            max_tokens: Maximum tokens in response
+            temperature: Creativity (0.0-1.0)
             
+        Yields:
+            Text chunks in generation order
+        """
+        generation_config = GenerationConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature,
+        )
+        
+        try:
+            # Retrying is safe until the first chunk has been read
+            response = await with_retries_async(
+                self.model.generate_content_async,
+                prompt,
+                generation_config=generation_config,
+                stream=True
+            )
+            async for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
         except Exception as e:
-            error_msg = str(e).lower()
+            raise _translate_error(e)
+    
+    async def generate_batch(
+        self,
+        prompts: List[str],
+        max_concurrency: int = 10,
+        max_tokens: int = 1024,
+        temperature: float = 0.7
+    ) -> List[Union[str, GeminiServiceError]]:
+        """
+        Generate text for several independent prompts concurrently.
+        
+        Args:
+            prompts: Input prompts, each sent as its own request
+            max_concurrency: Maximum requests in flight at once
+            max_tokens: Maximum tokens in each response
+            temperature: Creativity (0.0-1.0)
             
-            if "api key" in error_msg or "invalid" in error_msg or "401" in error_msg:
-                raise GeminiAPIKeyError(f"Invalid Gemini API key: {e}")
-            elif "rate" in error_msg or "quota" in error_msg or "429" in error_msg:
-                raise GeminiRateLimitError(f"Rate limit exceeded. Please try again later: {e}")
-            else:
-                raise GeminiServiceError(f"Gemini API error: {e}")
+        Returns:
+            One entry per prompt, in input order: the generated text, or the
+            GeminiServiceError raised for that prompt
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        generation_config = GenerationConfig(
+            max_output_tokens=max_tokens,
+            temperature=temperature,
+        )
+        
+        async def run_one(prompt: str) -> str:
+            async with semaphore:
+                try:
+                    response = await with_retries_async(
+                        self.model.generate_content_async,
+                        prompt,
+                        generation_config=generation_config
+                    )
+                except Exception as e:
+                    raise _translate_error(e)
+            
+            if not response.candidates:
+                raise GeminiServiceError("Response was blocked by safety filters")
+            return response.text.strip()
+        
+        return await asyncio.gather(*(run_one(p) for p in prompts), return_exceptions=True)
     
     def generate_json(
         self,
@@ -131,20 +533,32 @@ class GeminiService:
             json_mode=True
         )
         
-        # Clean response - remove markdown code blocks if present
-        cleaned = response.strip()
-        if cleaned.startswith("```json"):
-            cleaned = cleaned[7:]
-        if cleaned.startswith("```"):
-            cleaned = cleaned[3:]
-        if cleaned.endswith("```"):
-            cleaned = cleaned[:-3]
-        cleaned = cleaned.strip()
-        
-        try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            raise GeminiServiceError(f"Failed to parse JSON response: {e}\nResponse: {cleaned[:500]}")
+        return _parse_json_response(response)
+    
+    async def generate_json_async(
+        self,
+        prompt: str,
+        max_tokens: int = 2048,
+        temperature: float = 0.3
+    ) -> dict:
+        """Async counterpart of generate_json."""
+        response = await self.generate_text_async(
+            prompt=prompt,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            json_mode=True
+        )
+        return _parse_json_response(response)
+
+
+def _parse_json_response(response: str) -> dict:
+    # Clean response - remove markdown code blocks if present
+    cleaned = strip_code_fences(response)
+    
+    try:
+        return orjson.loads(cleaned)
+    except orjson.JSONDecodeError as e:
+        raise GeminiServiceError(f"Failed to parse JSON response: {e}\nResponse: {cleaned[:500]}")
 
 
 def get_gemini_service(api_key: str) -> GeminiService:
@@ -163,6 +577,15 @@ def get_gemini_service(api_key: str) -> GeminiService:
     return GeminiService(api_key)
 
 
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for the shared response cache."""
+    return {
+        "size": len(response_cache),
+        "hits": response_cache.hits,
+        "misses": response_cache.misses,
+    }
+
+
 def handle_gemini_error(e: Exception) -> HTTPException:
     """
     Convert Gemini exceptions to FastAPI HTTPExceptions.
@@ -205,8 +628,7 @@ async def analyze_jd_with_gemini(
     Call Gemini to analyze JD against user's sections.
     Returns suggestions and missing keywords.
     """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    model = get_model(api_key)
     
     prompt = build_analysis_prompt(
         job_description,
@@ -215,29 +637,100 @@ async def analyze_jd_with_gemini(
         pinned_sections
     )
     
+    # Repeat analyses of the same JD against the same sections are served from cache
+    cache_key = hash_key(model.model_name, prompt)
+    text = response_cache.get(cache_key)
+    
     try:
-        response = await model.generate_content_async(prompt)
+        if text is not None:
+            return parse_gemini_response(text)
+        response = await with_retries_async(model.generate_content_async, prompt, generation_config=_ANALYSIS_CONFIG)
         result = parse_gemini_response(response.text)
+        # Only remember responses that actually parsed
+        response_cache.set(cache_key, response.text)
         return result
     except Exception as e:
-        error_msg = str(e).lower()
-        if "api key" in error_msg or "authentication" in error_msg or "api_key" in error_msg:
-            raise GeminiAuthError("Invalid API key")
-        elif "quota" in error_msg or "rate" in error_msg or "resource" in error_msg:
-            raise GeminiRateLimitError("Rate limit exceeded")
-        else:
-            raise GeminiError(f"Gemini error: {str(e)}")
+        raise _translate_analysis_error(e)
 
 
-def build_analysis_prompt(
+async def analyze_jd_with_gemini_stream(
+    api_key: str,
     job_description: str,
     additional_instructions: Optional[str],
     sections: Dict[str, List],
     pinned_sections: List[Dict]
-) -> str:
-    """Build the Gemini prompt for JD analysis."""
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of analyze_jd_with_gemini.
+    
+    Yields {"type": "item", "key": ..., "value": ...} as soon as each entry of
+    a top-level array (experiences, projects, missing_keywords) closes, then
+    a final {"type": "result", "value": ...} with the validated full result.
+    
+    The stream is validated as it arrives and abandoned as soon as the
+    response can't match the schema: no JSON object opened early on, a
+    malformed array entry, or required keys missing when the object closes.
+    """
+    model = get_model(api_key)
+    
+    prompt = build_analysis_prompt(
+        job_description,
+        additional_instructions,
+        sections,
+        pinned_sections
+    )
+    
+    cache_key = hash_key(model.model_name, prompt)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        yield {"type": "result", "value": parse_gemini_response(cached)}
+        return
     
-    prompt = f"""You are a resume optimization assistant.
+    scanner = JSONStreamScanner()
+    try:
+        # Retrying is safe until the first chunk has been read
+        response = await with_retries_async(
+            model.generate_content_async, prompt, generation_config=_ANALYSIS_CONFIG, stream=True
+        )
+        async for chunk in response:
+            if not chunk.parts:
+                continue
+            for key, value in scanner.feed(chunk.text):
+                _check_analysis_item(key, value)
+                yield {"type": "item", "key": key, "value": value}
+            if not scanner.started and len(scanner.buffer) > _ANALYSIS_MAX_PREAMBLE_CHARS:
+                raise GeminiError("No JSON found in response")
+            if scanner.done:
+                # Anything after the closing brace is a fence or prose
+                missing = [k for k in _ANALYSIS_REQUIRED_KEYS if k not in scanner.keys]
+                if missing:
+                    raise GeminiError(f"Missing key in response: {missing[0]}")
+                break
+        result = parse_gemini_response(scanner.text)
+    except GeminiServiceError:
+        # Schema rejections already carry the right type; don't re-classify
+        # them by message (an entry like "accurate" would read as a rate limit)
+        raise
+    except Exception as e:
+        raise _translate_analysis_error(e)
+    
+    response_cache.set(cache_key, scanner.text)
+    yield {"type": "result", "value": result}
+
+
+def _translate_analysis_error(e: Exception) -> GeminiServiceError:
+    """Map a JD analysis failure onto the JD Matcher error types."""
+    error_msg = str(e).lower()
+    if "api key" in error_msg or "authentication" in error_msg or "api_key" in error_msg:
+        return GeminiAuthError("Invalid API key")
+    elif _is_rate_limit(e):
+        return GeminiRateLimitError("Rate limit exceeded")
+    else:
+        return GeminiError(f"Gemini error: {str(e)}")
+
+
+# Static prompt parts are built once; only placeholders are filled per request
+_ANALYSIS_HEADER = """You are a resume optimization assistant.
 I have a job description and resume sections with different "flavors" (variations).
 Analyze the JD and suggest which sections/flavors to include.
 
@@ -245,43 +738,13 @@ Analyze the JD and suggest which sections/flavors to include.
 {job_description}
 
 """
-    
-    if additional_instructions:
-        prompt += f"""**Additional Instructions:**
+
+_ANALYSIS_EXTRA = """**Additional Instructions:**
 {additional_instructions}
 
 """
-    
-    if pinned_sections:
-        prompt += "**Required Sections (must include):**\n"
-        for ps in pinned_sections:
-            prompt += f"- {ps['type'].title()}: {ps['key']} (flavor: {ps['flavor']})\n"
-        prompt += "\n"
-    
-    prompt += "**Available Sections:**\n\n"
-    
-    # Experiences
-    prompt += "EXPERIENCES:\n"
-    for exp in sections.get('experiences', []):
-        prompt += f"- Key: {exp['key']}\n"
-        for flavor_info in exp['flavors']:
-            prompt += f"  - Flavor '{flavor_info['flavor']}' (v{flavor_info['version']}):\n"
-            prompt += f"    {flavor_info['content_summary']}\n"
-    
-    # Projects
-    prompt += "\nPROJECTS:\n"
-    for proj in sections.get('projects', []):
-        prompt += f"- Key: {proj['key']}\n"
-        for flavor_info in proj['flavors']:
-            prompt += f"  - Flavor '{flavor_info['flavor']}' (v{flavor_info['version']}):\n"
-            prompt += f"    {flavor_info['content_summary']}\n"
-    
-    # Skills
-    prompt += "\nSKILLS FLAVORS:\n"
-    for skill in sections.get('skills', []):
-        prompt += f"- Flavor '{skill['flavor']}' (v{skill['version']}): {skill['content_summary']}\n"
-    
-    prompt += """
+
+_ANALYSIS_INSTRUCTIONS = """
 **Instructions:**
 1. Select 2-4 experiences that best match this JD (plus any required sections)
 2. Select 2-3 projects that best match this JD
@@ -301,28 +764,89 @@ Analyze the JD and suggest which sections/flavors to include.
   "missing_keywords": ["string", "string"]
 }
 """
+
+
+def _append_flavored_sections(parts: List[str], entries: List[Dict]) -> None:
+    for entry in entries:
+        parts.append(f"- Key: {entry['key']}\n")
+        for flavor_info in entry['flavors']:
+            parts.append(
+                f"  - Flavor '{flavor_info['flavor']}' (v{flavor_info['version']}):\n"
+                f"    {flavor_info['content_summary']}\n"
+            )
+
+
+def build_analysis_prompt(
+    job_description: str,
+    additional_instructions: Optional[str],
+    sections: Dict[str, List],
+    pinned_sections: List[Dict]
+) -> str:
+    """Build the Gemini prompt for JD analysis."""
+    
+    parts = [_ANALYSIS_HEADER.format_map({"job_description": job_description})]
+    
+    if additional_instructions:
+        parts.append(_ANALYSIS_EXTRA.format_map({"additional_instructions": additional_instructions}))
+    
+    if pinned_sections:
+        parts.append("**Required Sections (must include):**\n")
+        for ps in pinned_sections:
+            parts.append(f"- {ps['type'].title()}: {ps['key']} (flavor: {ps['flavor']})\n")
+        parts.append("\n")
     
-    return prompt
+    parts.append("**Available Sections:**\n\n")
+    
+    # Experiences
+    parts.append("EXPERIENCES:\n")
+    _append_flavored_sections(parts, sections.get('experiences', []))
+    
+    # Projects
+    parts.append("\nPROJECTS:\n")
+    _append_flavored_sections(parts, sections.get('projects', []))
+    
+    # Skills
+    parts.append("\nSKILLS FLAVORS:\n")
+    for skill in sections.get('skills', []):
+        parts.append(f"- Flavor '{skill['flavor']}' (v{skill['version']}): {skill['content_summary']}\n")
+    
+    parts.append(_ANALYSIS_INSTRUCTIONS)
+    
+    return "".join(parts)
+
+
+_ANALYSIS_REQUIRED_KEYS = ('skills_flavor', 'experiences', 'projects', 'missing_keywords')
+
+# Give up on a streamed analysis that hasn't opened its JSON object by now
+_ANALYSIS_MAX_PREAMBLE_CHARS = 200
+
+
+def _check_analysis_item(key: str, value: Any) -> None:
+    """Reject a streamed analysis item that can't fit the response schema."""
+    if key in ('experiences', 'projects'):
+        if not isinstance(value, dict) or 'key' not in value:
+            raise GeminiError(f"Malformed {key} entry in response: {value!r}")
+    elif key == 'missing_keywords' and not isinstance(value, str):
+        raise GeminiError(f"Malformed missing_keywords entry in response: {value!r}")
 
 
 def parse_gemini_response(response_text: str) -> Dict[str, Any]:
     """Parse Gemini response, extracting JSON."""
     
     # Try to find JSON in response
-    json_match = re.search(r'\{[\s\S]*\}', response_text)
+    json_text = extract_json_object(response_text)
     
-    if not json_match:
+    if not json_text:
         raise GeminiError("No JSON found in response")
     
     try:
-        result = json.loads(json_match.group())
+        result = orjson.loads(json_text)
         
         # Validate structure
-        required_keys = ['skills_flavor', 'experiences', 'projects', 'missing_keywords']
-        for key in required_keys:
+        for key in _ANALYSIS_REQUIRED_KEYS:
             if key not in result:
                 raise GeminiError(f"Missing key in response: {key}")
         
         return result
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         raise GeminiError(f"Invalid JSON in response: {str(e)}")
@@ -1,23 +1,43 @@
+import asyncio
 import os
 import shutil
-import subprocess
 import tempfile
 from uuid import UUID
-from typing import Optional
+from typing import Dict, List, Optional, TextIO, Tuple
 
+import orjson
+from sqlalchemy import and_, or_, select, tuple_
+from fastapi import BackgroundTasks
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models.section import Section
+from app.services.section_service import get_section_state
+from app.utils.cache import LRUCache, hash_key
 from app.utils.latex import (
-    generate_experience_tex,
-    generate_projects_tex,
-    generate_skills_tex,
+    write_experience_tex,
+    write_projects_tex,
+    write_skills_tex,
     generate_heading_tex,
 )
 
 
 TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "templates")
 
+# Template files never change at runtime, so build dirs link to them instead of
+# copying; only the generated .tex files are written for real
+_TEMPLATE_TOP_FILES = ("resume.tex", "custom-commands.tex")
+_TEMPLATE_SRC_FILES = tuple(sorted(os.listdir(os.path.join(TEMPLATES_DIR, "src"))))
+
+# Keep pdflatex's aux/log I/O in memory where a tmpfs is available
+_BUILD_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+# Bounds concurrent LaTeX builds so bursts queue instead of thrashing the CPU
+_PDFLATEX_SEMAPHORE = asyncio.Semaphore(settings.pdflatex_max_concurrency)
+
+# Compiled PDFs keyed by user, resume_config and the state of the user's sections
+pdf_cache = LRUCache(maxsize=settings.pdf_cache_size, ttl=settings.pdf_cache_ttl_seconds)
+
 
 def get_section_content(db: Session, user_id: UUID, section_type: str, section_ref: str) -> Optional[dict]:
     """
@@ -64,6 +84,51 @@ def get_section_content(db: Session, user_id: UUID, section_type: str, section_r
     return None
 
 
+def fetch_section_contents(db: Session, user_id: UUID, refs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+    """
+    Resolve many (section_type, section_ref) pairs in one query.
+    Refs follow the same formats as get_section_content; pairs that don't
+    resolve are left out of the returned map.
+    """
+    exact, flavored, keyed = set(), set(), set()
+    for section_type, section_ref in set(refs):
+        parts = section_ref.split(":")
+        if len(parts) == 3:
+            exact.add((section_type, *parts))
+        elif len(parts) == 2:
+            flavored.add((section_type, *parts))
+        elif len(parts) == 1:
+            keyed.add((section_type, parts[0]))
+
+    conditions = []
+    if exact:
+        conditions.append(tuple_(Section.type, Section.key, Section.flavor, Section.version).in_(exact))
+    current = []
+    if flavored:
+        current.append(tuple_(Section.type, Section.key, Section.flavor).in_(flavored))
+    if keyed:
+        current.append(tuple_(Section.type, Section.key).in_(keyed))
+    if current:
+        conditions.append(and_(Section.is_current == True, or_(*current)))
+    if not conditions:
+        return {}
+
+    rows = db.execute(
+        select(Section.type, Section.key, Section.flavor, Section.version, Section.is_current, Section.content)
+        .where(Section.user_id == user_id, or_(*conditions))
+    ).all()
+
+    # Index rows under every ref form they can satisfy
+    found: Dict[Tuple[str, str], dict] = {}
+    for row in rows:
+        found[(row.type, f"{row.key}:{row.flavor}:{row.version}")] = row.content
+        if row.is_current:
+            found.setdefault((row.type, f"{row.key}:{row.flavor}"), row.content)
+            found.setdefault((row.type, row.key), row.content)
+
+    return {pair: found[pair] for pair in refs if pair in found}
+
+
 def build_resume_content(db: Session, user_id: UUID, resume_config: dict) -> dict:
     """
     Fetch all sections based on resume_config and return structured content.
@@ -79,6 +144,24 @@ def build_resume_content(db: Session, user_id: UUID, resume_config: dict) -> dic
         "education": "default:1.0",  # optional
     }
     """
+    single_refs = {
+        "location": "location",
+        "email": "email",
+        "skills": "skills",
+        "heading": "heading",
+        "education": "education",
+    }
+    experience_refs = resume_config.get("experiences", [])
+    project_refs = resume_config.get("projects", [])
+
+    refs = [(section_type, resume_config[field]) for field, section_type in single_refs.items() if resume_config.get(field)]
+    refs += [("experience", ref) for ref in experience_refs]
+    refs += [("project", ref) for ref in project_refs]
+
+    # One round trip for every distinct referenced section; repeated refs
+    # still appear in the output once per occurrence
+    found = fetch_section_contents(db, user_id, list(dict.fromkeys(refs)))
+
     content = {
         "location": None,
         "email": None,
@@ -88,47 +171,24 @@ def build_resume_content(db: Session, user_id: UUID, resume_config: dict) -> dic
         "heading": None,
         "education": None,
     }
-    
-    # Fetch location
-    location_ref = resume_config.get("location")
-    if location_ref:
-        content["location"] = get_section_content(db, user_id, "location", location_ref)
-    
-    # Fetch email
-    email_ref = resume_config.get("email")
-    if email_ref:
-        content["email"] = get_section_content(db, user_id, "email", email_ref)
-    
-    # Fetch experiences
-    for exp_ref in resume_config.get("experiences", []):
-        exp_content = get_section_content(db, user_id, "experience", exp_ref)
-        if exp_content:
-            content["experiences"].append(exp_content)
-    
-    # Fetch projects
-    for proj_ref in resume_config.get("projects", []):
-        proj_content = get_section_content(db, user_id, "project", proj_ref)
-        if proj_content:
-            content["projects"].append(proj_content)
-    
-    # Fetch skills
-    skills_ref = resume_config.get("skills")
-    if skills_ref:
-        content["skills"] = get_section_content(db, user_id, "skills", skills_ref)
-    
-    # Fetch heading (optional)
-    heading_ref = resume_config.get("heading")
-    if heading_ref:
-        content["heading"] = get_section_content(db, user_id, "heading", heading_ref)
-    
-    # Fetch education (optional)
-    education_ref = resume_config.get("education")
-    if education_ref:
-        content["education"] = get_section_content(db, user_id, "education", education_ref)
-    
+    for field, section_type in single_refs.items():
+        ref = resume_config.get(field)
+        if ref:
+            content[field] = found.get((section_type, ref))
+
+    content["experiences"] = [found[("experience", ref)] for ref in experience_refs if found.get(("experience", ref))]
+    content["projects"] = [found[("project", ref)] for ref in project_refs if found.get(("project", ref))]
+
     return content
 
 
+def _open_tex(path: str) -> TextIO:
+    """Replace a (possibly symlinked) template file with a fresh one to write into."""
+    if os.path.lexists(path):
+        os.unlink(path)
+    return open(path, "w")
+
+
 def generate_latex_files(content: dict, build_dir: str) -> None:
     """
     Generate dynamic .tex files in the build directory.
@@ -138,21 +198,18 @@ def generate_latex_files(content: dict, build_dir: str) -> None:
     
     # Generate experience.tex
     if content["experiences"]:
-        exp_tex = generate_experience_tex(content["experiences"])
-        with open(os.path.join(src_dir, "experience.tex"), "w") as f:
-            f.write(exp_tex)
+        with _open_tex(os.path.join(src_dir, "experience.tex")) as f:
+            write_experience_tex(content["experiences"], f)
     
     # Generate projects.tex
     if content["projects"]:
-        proj_tex = generate_projects_tex(content["projects"])
-        with open(os.path.join(src_dir, "projects.tex"), "w") as f:
-            f.write(proj_tex)
+        with _open_tex(os.path.join(src_dir, "projects.tex")) as f:
+            write_projects_tex(content["projects"], f)
     
     # Generate skills.tex
     if content["skills"]:
-        skills_tex = generate_skills_tex(content["skills"])
-        with open(os.path.join(src_dir, "skills.tex"), "w") as f:
-            f.write(skills_tex)
+        with _open_tex(os.path.join(src_dir, "skills.tex")) as f:
+            write_skills_tex(content["skills"], f)
     
     # Generate heading.tex (with location/email overrides)
     location_value = None
@@ -166,33 +223,63 @@ def generate_latex_files(content: dict, build_dir: str) -> None:
     
     # Only generate heading if we have overrides or heading content
     if location_value or email_value or content["heading"]:
-        heading_tex = generate_heading_tex(
-            heading=content["heading"],
-            location=location_value,
-            email=email_value
-        )
-        with open(os.path.join(src_dir, "heading.tex"), "w") as f:
-            f.write(heading_tex)
+        with _open_tex(os.path.join(src_dir, "heading.tex")) as f:
+            f.write(generate_heading_tex(
+                heading=content["heading"],
+                location=location_value,
+                email=email_value
+            ))
 
 
-def compile_pdf(build_dir: str, timeout: int = 60) -> bytes:
+_MAX_PDFLATEX_PASSES = 2
+
+
+def _needs_rerun(log_path: str) -> bool:
+    """True if the pdflatex log asks for another pass (e.g. "Rerun to get cross-references right")."""
+    try:
+        with open(log_path, "rb") as f:
+            return b"Rerun" in f.read()
+    except OSError:
+        return False
+
+
+async def _run_pdflatex(build_dir: str, resume_tex: str, timeout: int) -> None:
+    # Output goes to DEVNULL: resume.log on disk already has everything
+    # compile_pdf reports on failure
+    proc = await asyncio.create_subprocess_exec(
+        "/Library/TeX/texbin/pdflatex", "-interaction=nonstopmode", "-output-directory", build_dir, resume_tex,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+        cwd=build_dir,
+        # Per-build TeX var/config dirs so concurrent runs don't share caches
+        env={**os.environ, "TEXMFVAR": build_dir, "TEXMFCONFIG": build_dir},
+    )
+    try:
+        await asyncio.wait_for(proc.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise Exception(f"pdflatex timed out after {timeout}s")
+
+
+async def compile_pdf(build_dir: str, timeout: int = 60) -> bytes:
     """
     Run pdflatex and return PDF bytes.
+    The subprocess is awaited, so the event loop keeps serving other
+    requests while LaTeX runs.
     """
     resume_tex = os.path.join(build_dir, "resume.tex")
+    log_path = os.path.join(build_dir, "resume.log")
     
-    # Run pdflatex twice (for references)
-    for _ in range(2):
-        result = subprocess.run(
-            ["/Library/TeX/texbin/pdflatex", "-interaction=nonstopmode", "-output-directory", build_dir, resume_tex],
-            capture_output=True,
-            timeout=timeout,
-            cwd=build_dir,
-        )
+    # A second pass is only needed when LaTeX asks for one (changed labels /
+    # references); a plain resume converges in one
+    for _ in range(_MAX_PDFLATEX_PASSES):
+        await _run_pdflatex(build_dir, resume_tex, timeout)
+        if not _needs_rerun(log_path):
+            break
     
     pdf_path = os.path.join(build_dir, "resume.pdf")
     if not os.path.exists(pdf_path):
-        log_path = os.path.join(build_dir, "resume.log")
         error_msg = "PDF compilation failed"
         if os.path.exists(log_path):
             with open(log_path, "r") as f:
@@ -206,31 +293,79 @@ def compile_pdf(build_dir: str, timeout: int = 60) -> bytes:
         return f.read()
 
 
-def generate_resume(db: Session, user_id: UUID, resume_config: dict) -> bytes:
+def _pdf_cache_key(db: Session, user_id: UUID, resume_config: dict) -> str:
+    """
+    Content-addressed key for a compiled resume.
+    Any section insert, edit or delete for the user moves MAX(updated_at) or
+    the row count, so stale PDFs are never served.
+    """
+    last_updated, section_count = get_section_state(db, user_id)
+    config_json = orjson.dumps(resume_config, option=orjson.OPT_SORT_KEYS)
+    return hash_key(user_id, config_json, last_updated, section_count)
+
+
+def pdf_cache_stats() -> Dict[str, int]:
+    """Hit/miss counters for the compiled PDF cache."""
+    return {
+        "size": len(pdf_cache),
+        "hits": pdf_cache.hits,
+        "misses": pdf_cache.misses,
+    }
+
+
+def _prepare_build_dir(db: Session, user_id: UUID, resume_config: dict, build_dir: str) -> None:
+    """Link the templates into build_dir and write the dynamic .tex files."""
+    # Symlink template files into the build directory
+    for name in _TEMPLATE_TOP_FILES:
+        os.symlink(os.path.join(TEMPLATES_DIR, name), os.path.join(build_dir, name))
+    
+    # Symlink src files (default templates); generated ones replace their link
+    src_dest = os.path.join(build_dir, "src")
+    os.makedirs(src_dest)
+    for name in _TEMPLATE_SRC_FILES:
+        os.symlink(os.path.join(TEMPLATES_DIR, "src", name), os.path.join(src_dest, name))
+    
+    # Fetch content from database
+    content = build_resume_content(db, user_id, resume_config)
+    
+    # Generate dynamic .tex files (overwrites defaults)
+    generate_latex_files(content, build_dir)
+
+
+async def generate_resume(
+    db: Session,
+    user_id: UUID,
+    resume_config: dict,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> bytes:
     """
     Main function: fetch content, generate LaTeX, compile PDF, return bytes.
+    Identical configs over unchanged sections are served from pdf_cache.
+    When background_tasks is given, the build directory is removed after the
+    response is sent instead of before.
     """
-    build_dir = tempfile.mkdtemp(prefix="resume_build_")
+    cache_key = await asyncio.to_thread(_pdf_cache_key, db, user_id, resume_config)
+    cached = pdf_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    build_dir = tempfile.mkdtemp(prefix="resume_build_", dir=_BUILD_ROOT)
     
     try:
-        # Copy template files to build directory
-        shutil.copy(os.path.join(TEMPLATES_DIR, "resume.tex"), build_dir)
-        shutil.copy(os.path.join(TEMPLATES_DIR, "custom-commands.tex"), build_dir)
-        
-        # Copy src directory (default templates)
-        src_dest = os.path.join(build_dir, "src")
-        shutil.copytree(os.path.join(TEMPLATES_DIR, "src"), src_dest)
-        
-        # Fetch content from database
-        content = build_resume_content(db, user_id, resume_config)
-        
-        # Generate dynamic .tex files (overwrites defaults)
-        generate_latex_files(content, build_dir)
+        # Database reads and template copies are blocking; keep them off the loop
+        await asyncio.to_thread(_prepare_build_dir, db, user_id, resume_config, build_dir)
         
         # Compile PDF
-        pdf_bytes = compile_pdf(build_dir)
-        
-        return pdf_bytes
+        async with _PDFLATEX_SEMAPHORE:
+            pdf_bytes = await compile_pdf(build_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    
+    if background_tasks is not None:
+        background_tasks.add_task(shutil.rmtree, build_dir, ignore_errors=True)
+    else:
+        shutil.rmtree(build_dir, ignore_errors=True)
     
-    finally:
-        shutil.rmtree(build_dir, ignore_errors=True)
\ No newline at end of file
+    pdf_cache.set(cache_key, pdf_bytes)
+    return pdf_bytes
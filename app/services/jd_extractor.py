@@ -3,29 +3,22 @@ JD Extractor - AI extracts important terms from job descriptions.
 Removes fluff, preserves critical info like sponsorship.
 """
 
-import google.generativeai as genai
-import json
+import asyncio
+import logging
 import re
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Set, Tuple
 
+import orjson
 
-async def extract_jd_terms(api_key: str, job_description: str) -> Dict[str, Any]:
-    """
-    Use AI to extract all important terms from a JD.
-    
-    Returns dict with:
-        - terms: List of important keywords
-        - sponsorship: 'yes', 'no', or 'unknown'
-        - years_experience: str or None
-        - location: str or None
-        - remote: 'remote', 'hybrid', 'onsite', or 'unknown'
-    """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    
-    prompt = f"""Extract important information from this job description.
+from app.config import settings
+from app.services.gemini_service import get_model, json_config, response_cache, with_retries_async
+from app.utils.cache import hash_key
+from app.utils.json_scan import extract_json_array, extract_json_object
 
-REMOVE: Company description, benefits, EEO statements, culture/values, "about us", "why join us"
+
+logger = logging.getLogger(__name__)
+
+_EXTRACT_INSTRUCTIONS = """REMOVE: Company description, benefits, EEO statements, culture/values, "about us", "why join us"
 
 EXTRACT:
 1. All technical skills required (languages, frameworks, tools, databases, cloud)
@@ -33,49 +26,140 @@ EXTRACT:
 3. Years of experience required
 4. Visa/sponsorship status (look for "sponsorship", "visa", "authorized to work", "citizenship")
 5. Location and remote policy
-6. Any must-have requirements
-
-Job Description:
-{job_description}
+6. Any must-have requirements"""
 
-Return ONLY this JSON format:
-{{
+_EXTRACT_FORMAT = """{
   "terms": ["python", "aws", "leadership", "5+ years", ...],
   "sponsorship": "yes" | "no" | "unknown",
   "years_experience": "5+" | null,
   "location": "Seattle, WA" | null,
   "remote": "remote" | "hybrid" | "onsite" | "unknown"
-}}
+}"""
+
+
+def _build_extract_prompt(job_description: str) -> str:
+    return f"""Extract important information from this job description.
+
+{_EXTRACT_INSTRUCTIONS}
+
+Job Description:
+{job_description}
+
+Return ONLY this JSON format:
+{_EXTRACT_FORMAT}
 
 JSON:"""
 
-    try:
-        response = await model.generate_content_async(prompt)
-        return _parse_jd_response(response.text)
-    except Exception as e:
-        print(f"JD extraction failed: {e}")
-        return {
-            "terms": [],
-            "sponsorship": "unknown",
-            "years_experience": None,
-            "location": None,
-            "remote": "unknown"
-        }
 
+_EXTRACT_MAX_TOKENS = 1024
+_BATCH_EXTRACT_MAX_TOKENS = 8192
+_EXTRACT_CONFIG = json_config(_EXTRACT_MAX_TOKENS)
 
-def _parse_jd_response(response_text: str) -> Dict[str, Any]:
-    """Parse AI response to extract JD info."""
-    json_match = re.search(r'\{[\s\S]*\}', response_text)
+_TERMS_ONLY_FORMAT = """{
+  "terms": ["python", "aws", "leadership", "5+ years", ...],
+  "location": "Seattle, WA" | null
+}"""
+
+
+def _build_terms_prompt(job_description: str) -> str:
+    """Shorter prompt for when _fast_extract already settled the structured fields."""
+    return f"""Extract the important terms and the job location from this job description.
+
+{_EXTRACT_INSTRUCTIONS}
+
+Job Description:
+{job_description}
+
+Return ONLY this JSON format:
+{_TERMS_ONLY_FORMAT}
+
+JSON:"""
+
+
+def _build_batch_extract_prompt(job_descriptions: List[str]) -> str:
+    jds = "\n\n".join(
+        f"JD {i}:\n{jd}" for i, jd in enumerate(job_descriptions, start=1)
+    )
+    return f"""Extract important information from each of the {len(job_descriptions)} job descriptions below.
+
+{_EXTRACT_INSTRUCTIONS}
+
+{jds}
+
+Return ONLY a JSON array of exactly {len(job_descriptions)} objects, where element i is the extraction for JD i, each in this format:
+{_EXTRACT_FORMAT}
+
+JSON:"""
+
+
+_SPONSOR_NO_RE = re.compile(
+    r"\b(?:no|not\s+(?:offer|provide)(?:ing)?|without|unable\s+to\s+(?:offer|provide)?)\s+(?:visa\s+)?sponsor(?:ship)?\b"
+    r"|\b(?:unable|not\s+able|cannot|can't|will\s+not|won't|do(?:es)?\s+not)\s+(?:to\s+)?sponsor\b"
+    r"|\bsponsorship\s+(?:is\s+)?not\s+(?:available|offered|provided)\b"
+    r"|\bu\.?s\.?\s+citizens(?:hip)?\s+(?:is\s+)?required\b",
+    re.I,
+)
+_SPONSOR_YES_RE = re.compile(
+    r"\b(?:will|can|able\s+to|happy\s+to)\s+sponsor\b"
+    r"|\b(?:visa\s+)?sponsorship\s+(?:is\s+)?(?:available|offered|provided)\b",
+    re.I,
+)
+_YEARS_RE = re.compile(r"\b(\d{1,2})\s*\+?\s*(?:-|to)?\s*(?:\d{1,2}\s*)?\+?\s*years?\b", re.I)
+_YEARS_WORD_RE = re.compile(r"\byears?\b", re.I)
+# Work-policy phrases only: bare "remote"/"hybrid" also show up in "hybrid
+# cloud", "remote sensing" etc. Groups are remote, hybrid, onsite.
+_ONSITE = r"(?:on-?site|in[- ]office)"
+_REMOTE_RE = re.compile(
+    r"\b(fully\s+remote|100%\s+remote|remote[- ](?:role|position|job|work|first|friendly|opportunity)"
+    r"|work(?:ing)?\s+remotely|(?:role|position|job)\s+is\s+(?:fully\s+)?remote)\b"
+    r"|\b(hybrid\s+(?:role|position|job|schedule|work|model|arrangement)|(?:role|position|job)\s+is\s+hybrid)\b"
+    rf"|\b(fully\s+{_ONSITE}|{_ONSITE}\s+(?:role|position|job|only|\d\s+days?)|\d\s+days?\s+(?:a\s+week\s+|per\s+week\s+)?{_ONSITE}"
+    rf"|(?:role|position|job)\s+is\s+{_ONSITE})\b",
+    re.I,
+)
+_REMOTE_MODES = ("remote", "hybrid", "onsite")
+# "not remote", "no hybrid option", "non-remote": leave the policy to Gemini
+_REMOTE_NEGATION_RE = re.compile(
+    rf"\b(?:not|no|non)[\s-]+(?:\w+\s+){{0,2}}?(?:remote|hybrid|{_ONSITE})\b", re.I
+)
+
+
+def _fast_extract(job_description: str) -> Optional[Dict[str, Any]]:
+    """
+    Settle sponsorship, years of experience and remote policy locally.
+    Returns None unless every field is unambiguous, in which case Gemini
+    only needs to supply terms and location.
+    """
+    no_sponsor = bool(_SPONSOR_NO_RE.search(job_description))
+    yes_sponsor = bool(_SPONSOR_YES_RE.search(job_description))
+    if no_sponsor == yes_sponsor:
+        return None
     
-    if json_match:
-        try:
-            result = json.loads(json_match.group())
-            if 'terms' in result:
-                result['terms'] = [str(t).lower().strip() for t in result['terms']]
-            return result
-        except json.JSONDecodeError:
-            pass
+    if _REMOTE_NEGATION_RE.search(job_description):
+        return None
+    remote_modes = {
+        mode
+        for groups in _REMOTE_RE.findall(job_description)
+        for mode, matched in zip(_REMOTE_MODES, groups) if matched
+    }
+    if len(remote_modes) != 1:
+        return None
     
+    years = {int(n) for n in _YEARS_RE.findall(job_description)}
+    if len(years) > 1:
+        return None
+    if not years and _YEARS_WORD_RE.search(job_description):
+        # "years" in prose we can't read ("five years", "years of experience")
+        return None
+    
+    return {
+        "sponsorship": "no" if no_sponsor else "yes",
+        "years_experience": f"{years.pop()}+" if years else None,
+        "remote": remote_modes.pop(),
+    }
+
+
+def _empty_extraction() -> Dict[str, Any]:
     return {
         "terms": [],
         "sponsorship": "unknown",
@@ -83,3 +167,192 @@ def _parse_jd_response(response_text: str) -> Dict[str, Any]:
         "location": None,
         "remote": "unknown"
     }
+
+
+async def extract_jd_terms(api_key: str, job_description: str) -> Dict[str, Any]:
+    """
+    Use AI to extract all important terms from a JD.
+    
+    Returns dict with:
+        - terms: List of important keywords
+        - sponsorship: 'yes', 'no', or 'unknown'
+        - years_experience: str or None
+        - location: str or None
+        - remote: 'remote', 'hybrid', 'onsite', or 'unknown'
+    """
+    model = get_model(api_key)
+    prompt = _build_extract_prompt(job_description)
+
+    cache_key = hash_key(model.model_name, prompt)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return _parse_jd_response(cached)
+    
+    known = _fast_extract(job_description)
+    
+    try:
+        if known is None:
+            response = await with_retries_async(model.generate_content_async, prompt, generation_config=_EXTRACT_CONFIG)
+            result = _parse_jd_response(response.text)
+            cached_text = response.text
+        else:
+            response = await with_retries_async(model.generate_content_async, _build_terms_prompt(job_description), generation_config=_EXTRACT_CONFIG)
+            partial = _parse_jd_response(response.text)
+            result = {**known, "terms": partial.get("terms", []), "location": partial.get("location")}
+            cached_text = orjson.dumps(result).decode()
+        # Only remember responses that actually parsed
+        if result.get("terms"):
+            response_cache.set(cache_key, cached_text)
+        return result
+    except Exception:
+        logger.exception("JD extraction failed")
+        return _empty_extraction()
+
+
+async def batch_extract_jd_terms(api_key: str, job_descriptions: List[str]) -> List[Dict[str, Any]]:
+    """
+    Extract several JDs with a single Gemini call.
+    
+    Results are aligned with job_descriptions. JDs already in the response
+    cache are not re-sent, and each fresh result is cached as if it came from
+    extract_jd_terms, so later single lookups hit too.
+    """
+    model = get_model(api_key)
+    cache_keys = [hash_key(model.model_name, _build_extract_prompt(jd)) for jd in job_descriptions]
+    
+    results: List[Optional[Dict[str, Any]]] = []
+    missing = []
+    for i, cache_key in enumerate(cache_keys):
+        cached = response_cache.get(cache_key)
+        results.append(_parse_jd_response(cached) if cached is not None else None)
+        if cached is None:
+            missing.append(i)
+    
+    if len(missing) == 1:
+        results[missing[0]] = await extract_jd_terms(api_key, job_descriptions[missing[0]])
+    elif missing:
+        prompt = _build_batch_extract_prompt([job_descriptions[i] for i in missing])
+        try:
+            response = await with_retries_async(
+                model.generate_content_async,
+                prompt,
+                generation_config=json_config(min(_EXTRACT_MAX_TOKENS * len(missing), _BATCH_EXTRACT_MAX_TOKENS))
+            )
+            extracted = _parse_batch_response(response.text, len(missing))
+        except Exception:
+            logger.exception("Batch JD extraction failed")
+            extracted = [_empty_extraction() for _ in missing]
+        
+        for i, result in zip(missing, extracted):
+            results[i] = result
+            if result.get("terms"):
+                response_cache.set(cache_keys[i], orjson.dumps(result).decode())
+    
+    return results
+
+
+class _ExtractionCoalescer:
+    """
+    Gathers concurrent single-JD extractions for the same API key that
+    arrive within a short window and sends them as one batched call.
+    A batch is sent early once it reaches max_size.
+    """
+    
+    def __init__(self):
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        # The loop only keeps weak references to tasks
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def extract(self, api_key: str, job_description: str, window: float, max_size: int) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = hash_key(api_key)
+        
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            self._spawn(self._flush_after(key, api_key, batch, window))
+        batch.append((job_description, future))
+        
+        if len(batch) >= max_size:
+            del self._pending[key]
+            self._spawn(self._flush(api_key, batch))
+        
+        return await future
+    
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _flush_after(self, key: str, api_key: str, batch: List[Tuple[str, asyncio.Future]], window: float) -> None:
+        await asyncio.sleep(window)
+        # Already sent if it filled up during the window
+        if self._pending.get(key) is batch:
+            del self._pending[key]
+            await self._flush(api_key, batch)
+    
+    async def _flush(self, api_key: str, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        try:
+            results = await batch_extract_jd_terms(api_key, [jd for jd, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_coalescer = _ExtractionCoalescer()
+
+
+async def extract_jd_terms_coalesced(api_key: str, job_description: str) -> Dict[str, Any]:
+    """
+    extract_jd_terms, but batched with other requests that arrive within
+    settings.jd_extract_batch_window_ms (a window of 0 disables batching),
+    up to settings.jd_extract_batch_max_size JDs per call.
+    """
+    window_ms = settings.jd_extract_batch_window_ms
+    if window_ms <= 0:
+        return await extract_jd_terms(api_key, job_description)
+    return await _coalescer.extract(api_key, job_description, window_ms / 1000, settings.jd_extract_batch_max_size)
+
+
+def _normalize_extraction(result: Dict[str, Any]) -> Dict[str, Any]:
+    if 'terms' in result:
+        result['terms'] = [str(t).lower().strip() for t in result['terms']]
+    return result
+
+
+def _parse_jd_response(response_text: str) -> Dict[str, Any]:
+    """Parse AI response to extract JD info."""
+    json_text = extract_json_object(response_text)
+    
+    if json_text:
+        try:
+            return _normalize_extraction(orjson.loads(json_text))
+        except orjson.JSONDecodeError:
+            pass
+    
+    return _empty_extraction()
+
+
+def _parse_batch_response(response_text: str, expected: int) -> List[Dict[str, Any]]:
+    """Parse a batched extraction array, padding or trimming it to the expected length."""
+    results = []
+    array_text = extract_json_array(response_text)
+    if array_text:
+        try:
+            parsed = orjson.loads(array_text)
+            if isinstance(parsed, list):
+                results = [
+                    _normalize_extraction(item) if isinstance(item, dict) else _empty_extraction()
+                    for item in parsed[:expected]
+                ]
+        except orjson.JSONDecodeError:
+            pass
+    
+    results += [_empty_extraction() for _ in range(expected - len(results))]
+    return results
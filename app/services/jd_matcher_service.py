@@ -3,10 +3,247 @@ JD Matcher Service - Matches JD terms against section tags.
 Uses pre-computed tags for efficiency.
 """
 
-import google.generativeai as genai
-import json
-import re
-from typing import Dict, List, Any
+import logging
+
+import orjson
+from typing import AsyncIterator, Dict, FrozenSet, List, Any, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.gemini_service import (
+    get_cached_prefix_model,
+    get_model,
+    json_config,
+    response_cache,
+    with_retries_async,
+)
+from app.utils.cache import LRUCache, hash_key
+from app.utils.json_scan import JSONStreamScanner
+
+
+logger = logging.getLogger(__name__)
+
+_MATCH_MODEL = 'gemini-2.0-flash'
+_MATCH_MAX_TOKENS = 512
+_BATCH_MATCH_MAX_TOKENS = 8192
+_MATCH_CONFIG = json_config(_MATCH_MAX_TOKENS)
+
+# Near-duplicate tier: per matching context, the term sets of recent JDs and
+# their parsed results, checked by Jaccard similarity on an exact-key miss
+_SIMILAR_PER_CONTEXT = 32
+_similar_matches = LRUCache(maxsize=256, ttl=settings.gemini_cache_ttl_seconds)
+
+
+# Missing keywords from the last match per (user, JD, selection), so
+# /recalculate-keywords can skip Gemini when the user keeps the suggestions
+_suggested_missing = LRUCache(maxsize=1024, ttl=settings.gemini_cache_ttl_seconds)
+
+
+def _selection_key(user_id: Any, job_description: str, selection: List[Tuple[str, str, str]]) -> str:
+    # Only what the matcher chooses between; skills are picked by flavor alone
+    picked = sorted(
+        (t, '' if t == 'skills' else k, f)
+        for t, k, f in selection if t in ('experience', 'project', 'skills')
+    )
+    return hash_key(user_id, job_description, orjson.dumps(picked))
+
+
+def remember_suggested_missing(user_id: Any, job_description: str, match_result: Dict[str, Any]) -> None:
+    """Record the matcher's missing keywords against the selection it suggested."""
+    selection = [('experience', e['key'], e['flavor']) for e in match_result.get('experiences', [])]
+    selection += [('project', p['key'], p['flavor']) for p in match_result.get('projects', [])]
+    if match_result.get('skills_flavor'):
+        selection.append(('skills', '', match_result['skills_flavor']))
+    missing = match_result.get('missing_keywords') or []
+    if missing:
+        _suggested_missing.set(_selection_key(user_id, job_description, selection), list(missing))
+
+
+def get_suggested_missing(user_id: Any, job_description: str, selection: List[Tuple[str, str, str]]) -> Optional[List[str]]:
+    """Missing keywords from a prior match whose suggestions equal this selection, if any."""
+    return _suggested_missing.get(_selection_key(user_id, job_description, selection))
+
+
+def _match_cache_keys(
+    jd_terms: List[str],
+    jd_info: Dict[str, Any],
+    sections_with_tags: Dict[str, List[Dict]],
+    pinned_sections: List[Dict]
+) -> Tuple[str, str, FrozenSet[str]]:
+    """
+    Canonical (exact key, context key, term set) for a matching request.
+    Term order and casing don't matter; the context covers everything but
+    the terms (JD info, section tag fingerprints, pinned sections).
+    """
+    terms = frozenset(t.lower().strip() for t in jd_terms[:30])
+    fingerprint = {
+        "info": [jd_info.get('years_experience'), jd_info.get('sponsorship', 'unknown'), jd_info.get('remote', 'unknown')],
+        "experiences": sorted(
+            (exp['key'], f['flavor'], sorted(f.get('tags', [])[:15]))
+            for exp in sections_with_tags.get('experiences', []) for f in exp.get('flavors', [])
+        ),
+        "projects": sorted(
+            (proj['key'], f['flavor'], sorted(f.get('tags', [])[:15]))
+            for proj in sections_with_tags.get('projects', []) for f in proj.get('flavors', [])
+        ),
+        "skills": sorted((s['flavor'], sorted(s.get('tags', [])[:15])) for s in sections_with_tags.get('skills', [])),
+        "pinned": sorted(f"{p['key']}:{p.get('flavor')}" for p in pinned_sections),
+    }
+    context_key = hash_key(_MATCH_MODEL, orjson.dumps(fingerprint))
+    return hash_key(context_key, orjson.dumps(sorted(terms))), context_key, terms
+
+
+def _find_similar_match(context_key: str, terms: FrozenSet[str]) -> Optional[str]:
+    threshold = settings.jd_match_similarity_threshold
+    if threshold >= 1 or not terms:
+        return None
+    for seen_terms, result_json in _similar_matches.get(context_key, []):
+        if len(terms & seen_terms) / len(terms | seen_terms) >= threshold:
+            return result_json
+    return None
+
+
+def _lookup_match(
+    keys: Tuple[str, str, FrozenSet[str]],
+    jd_terms: List[str],
+    sections_with_tags: Dict[str, List[Dict]]
+) -> Optional[Dict[str, Any]]:
+    """
+    Cached match for an exact key, else a near-duplicate JD's match. The
+    near-duplicate's section picks are reused, but its missing keywords
+    belong to the other JD's terms, so they're recomputed for these.
+    """
+    cache_key, context_key, terms = keys
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return orjson.loads(cached)
+    
+    similar = _find_similar_match(context_key, terms)
+    if similar is None:
+        return None
+    result = orjson.loads(similar)
+    result['missing_keywords'] = _uncovered_terms(jd_terms, result, sections_with_tags)
+    return result
+
+
+# Cheap-match fast path: an experience/project pick is decisive when its
+# flavor covers at least this many JD terms and beats the next candidate
+# by at least this margin
+_CHEAP_MIN_SCORE = 3
+_CHEAP_MIN_MARGIN = 2
+_CHEAP_PICKS = 2
+
+
+def _tag_set(flavor: Dict[str, Any]) -> FrozenSet[str]:
+    """Lowercased tag set of a flavor, computed once and kept on the flavor dict."""
+    tags = flavor.get('_tag_set')
+    if tags is None:
+        tags = frozenset(t.lower().strip() for t in flavor.get('tags', []) if isinstance(t, str))
+        flavor['_tag_set'] = tags
+    return tags
+
+
+def _rank_entries(jd_set: Set[str], entries: List[Dict]) -> List[Tuple[int, str, str, List[str]]]:
+    """(score, key, best flavor, overlapping tags) per entry, best first."""
+    ranked = []
+    for entry in entries:
+        best = None
+        for flavor in entry.get('flavors', []):
+            overlap = jd_set & _tag_set(flavor)
+            if best is None or len(overlap) > best[0]:
+                best = (len(overlap), entry['key'], flavor['flavor'], sorted(overlap))
+        if best is not None:
+            ranked.append(best)
+    ranked.sort(key=lambda r: r[0], reverse=True)
+    return ranked
+
+
+def _decisive_picks(ranked: List[Tuple[int, str, str, List[str]]]) -> Optional[List[Dict[str, str]]]:
+    picks = ranked[:_CHEAP_PICKS]
+    if any(score < _CHEAP_MIN_SCORE for score, _, _, _ in picks):
+        return None
+    runner_up = ranked[_CHEAP_PICKS][0] if len(ranked) > _CHEAP_PICKS else 0
+    if picks and picks[-1][0] - runner_up < _CHEAP_MIN_MARGIN:
+        return None
+    return [
+        {'key': key, 'flavor': flavor, 'reason': f"matches {', '.join(overlap[:5])}"}
+        for _, key, flavor, overlap in picks
+    ]
+
+
+def _cheap_match(jd_terms: List[str], sections_with_tags: Dict[str, List[Dict]]) -> Optional[Dict[str, Any]]:
+    """
+    Pick sections by plain tag overlap with the JD terms, skipping Gemini.
+    
+    Returns a match_sections_to_jd-shaped result only when the overlap is
+    decisive for both experiences and projects (see _CHEAP_MIN_SCORE and
+    _CHEAP_MIN_MARGIN); None means the call should go to the model.
+    """
+    terms = [t for t in jd_terms[:30] if isinstance(t, str)]
+    # Free-text instructions (the router's "Note: ..." term) need the model
+    if any(t.startswith('Note: ') for t in terms):
+        return None
+    jd_set = {t.lower().strip() for t in terms}
+    if not jd_set:
+        return None
+    
+    experiences = _decisive_picks(_rank_entries(jd_set, sections_with_tags.get('experiences', [])))
+    projects = _decisive_picks(_rank_entries(jd_set, sections_with_tags.get('projects', [])))
+    if experiences is None or projects is None or not (experiences or projects):
+        return None
+    
+    result = _empty_match()
+    result['experiences'] = experiences
+    result['projects'] = projects
+    
+    skills = max(sections_with_tags.get('skills', []), key=lambda s: len(jd_set & _tag_set(s)), default=None)
+    if skills is not None:
+        result['skills_flavor'] = skills['flavor']
+    
+    result['missing_keywords'] = _uncovered_terms(terms, result, sections_with_tags)
+    return result
+
+
+def _uncovered_terms(jd_terms: List[str], result: Dict[str, Any], sections_with_tags: Dict[str, List[Dict]]) -> List[str]:
+    """JD terms (up to 15, in JD order) not in the tags of the sections result picks."""
+    terms = [t for t in jd_terms[:30] if isinstance(t, str) and not t.startswith('Note: ')]
+    
+    covered: Set[str] = set()
+    skills_flavor = result.get('skills_flavor')
+    for skills in sections_with_tags.get('skills', []):
+        if skills['flavor'] == skills_flavor:
+            covered |= _tag_set(skills)
+    
+    picked = {
+        (p.get('key'), p.get('flavor'))
+        for list_key in ('experiences', 'projects') for p in result.get(list_key) or []
+    }
+    for list_key in ('experiences', 'projects'):
+        for entry in sections_with_tags.get(list_key, []):
+            for flavor in entry.get('flavors', []):
+                if (entry['key'], flavor['flavor']) in picked:
+                    covered |= _tag_set(flavor)
+    
+    return list(dict.fromkeys(
+        t for t in terms if t.lower().strip() not in covered
+    ))[:15]
+
+
+def _remember_match(cache_key: str, context_key: str, terms: FrozenSet[str], result_json: str) -> None:
+    response_cache.set(cache_key, result_json)
+    entries = [(terms, result_json)] + _similar_matches.get(context_key, [])
+    _similar_matches.set(context_key, entries[:_SIMILAR_PER_CONTEXT])
+
+
+async def _match_model(api_key: str, prefix: str, suffix: str) -> Tuple[Any, str]:
+    """
+    Model and prompt for a match call: a model bound to Gemini cached content
+    for the sections prefix and just the suffix when the prefix is big enough
+    to cache, else the plain match model and the whole prompt.
+    """
+    cached_model = await get_cached_prefix_model(api_key, prefix)
+    if cached_model is not None:
+        return cached_model, suffix
+    return get_model(api_key, _MATCH_MODEL), prefix + suffix
 
 
 async def match_sections_to_jd(
@@ -18,129 +255,271 @@ async def match_sections_to_jd(
 ) -> Dict[str, Any]:
     """
     Match section tags against JD terms.
+    
+    Parsed matches are cached by a canonical key over the terms, JD info,
+    section tags and pinned sections; a JD whose term set is close enough
+    (settings.jd_match_similarity_threshold) to a recent one in the same
+    context reuses its match too. When plain tag overlap already picks
+    the sections decisively (_cheap_match), Gemini isn't called at all.
     """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    cache_key, context_key, terms = keys = _match_cache_keys(jd_terms, jd_info, sections_with_tags, pinned_sections)
+    cached = _lookup_match(keys, jd_terms, sections_with_tags)
+    if cached is not None:
+        return _ensure_results(cached, sections_with_tags, pinned_sections)
     
-    prompt = _build_match_prompt(jd_terms, jd_info, sections_with_tags, pinned_sections)
+    cheap = _cheap_match(jd_terms, sections_with_tags)
+    if cheap is not None:
+        return _ensure_results(cheap, sections_with_tags, pinned_sections)
+    
+    prefix, suffix, section_ids = _build_match_prompt(jd_terms, jd_info, sections_with_tags, pinned_sections)
+    model, prompt = await _match_model(api_key, prefix, suffix)
     
     try:
-        response = await model.generate_content_async(prompt)
-        result = _parse_match_response(response.text)
+        response = await with_retries_async(model.generate_content_async, prompt, generation_config=_MATCH_CONFIG)
+        result = _parse_match_response(response.text, section_ids)
+        if result.get('experiences') or result.get('projects'):
+            _remember_match(cache_key, context_key, terms, orjson.dumps(result).decode())
         
         # Ensure we always return results if sections exist
         result = _ensure_results(result, sections_with_tags, pinned_sections)
         
         return result
-    except Exception as e:
-        print(f"Matching failed: {e}")
+    except Exception:
+        logger.exception("match_sections_to_jd failed")
         raise  # Re-raise for router to handle
 
 
-def _build_match_prompt(
+async def match_sections_to_jd_stream(
+    api_key: str,
     jd_terms: List[str],
     jd_info: Dict[str, Any],
     sections_with_tags: Dict[str, List[Dict]],
     pinned_sections: List[Dict]
-) -> str:
-    """Build compact matching prompt."""
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of match_sections_to_jd.
+    
+    Yields {"type": "item", "key": "experiences" | "projects", "value": pick}
+    as soon as each pick closes in the streamed response, then a final
+    {"type": "result", "value": ...} identical to match_sections_to_jd's.
+    Cached and cheap matches yield only the result.
+    """
+    cache_key, context_key, terms = keys = _match_cache_keys(jd_terms, jd_info, sections_with_tags, pinned_sections)
+    cached = _lookup_match(keys, jd_terms, sections_with_tags)
+    if cached is not None:
+        yield {"type": "result", "value": _ensure_results(cached, sections_with_tags, pinned_sections)}
+        return
+    
+    cheap = _cheap_match(jd_terms, sections_with_tags)
+    if cheap is not None:
+        yield {"type": "result", "value": _ensure_results(cheap, sections_with_tags, pinned_sections)}
+        return
+    
+    prefix, suffix, section_ids = _build_match_prompt(jd_terms, jd_info, sections_with_tags, pinned_sections)
+    model, prompt = await _match_model(api_key, prefix, suffix)
+    
+    scanner = JSONStreamScanner()
+    seen: Set[int] = set()
+    try:
+        # Retrying is safe until the first chunk has been read
+        response = await with_retries_async(
+            model.generate_content_async, prompt, generation_config=_MATCH_CONFIG, stream=True
+        )
+        async for chunk in response:
+            if not chunk.parts:
+                continue
+            for field, value in scanner.feed(chunk.text):
+                list_key = _PICK_FIELDS.get(field)
+                pick = _translate_pick(value, section_ids, list_key, seen) if list_key else None
+                if pick is not None:
+                    yield {"type": "item", "key": list_key, "value": pick}
+        result = _parse_match_response(scanner.text, section_ids)
+    except Exception:
+        logger.exception("match_sections_to_jd_stream failed")
+        raise  # Re-raise for router to handle
+    
+    if result.get('experiences') or result.get('projects'):
+        _remember_match(cache_key, context_key, terms, orjson.dumps(result).decode())
+    
+    yield {"type": "result", "value": _ensure_results(result, sections_with_tags, pinned_sections)}
+
+
+async def match_many(
+    api_key: str,
+    jobs: List[Tuple[List[str], Dict[str, Any]]],
+    sections_with_tags: Dict[str, List[Dict]],
+    pinned_sections: List[Dict]
+) -> List[Dict[str, Any]]:
+    """
+    match_sections_to_jd for several JDs against the same sections.
+    
+    jobs are (jd_terms, jd_info) pairs; results follow their order. Cached
+    and cheap matches are resolved locally, and the rest share one Gemini
+    call whose prompt lists the sections once for all of them.
+    """
+    results: List[Optional[Dict[str, Any]]] = []
+    pending: Dict[str, List[int]] = {}
+    pending_keys: List[Tuple[str, str, FrozenSet[str]]] = []
+    for jd_terms, jd_info in jobs:
+        keys = _match_cache_keys(jd_terms, jd_info, sections_with_tags, pinned_sections)
+        result = _lookup_match(keys, jd_terms, sections_with_tags) or _cheap_match(jd_terms, sections_with_tags)
+        if result is not None:
+            result = _ensure_results(result, sections_with_tags, pinned_sections)
+        elif keys[0] not in pending:
+            pending[keys[0]] = [len(results)]
+            pending_keys.append(keys)
+        else:
+            pending[keys[0]].append(len(results))
+        results.append(result)
     
-    prompt = f"""Match resume sections to job requirements.
+    if len(pending_keys) == 1:
+        index = pending[pending_keys[0][0]][0]
+        matched = await match_sections_to_jd(api_key, *jobs[index], sections_with_tags, pinned_sections)
+        batch = [matched]
+    elif pending_keys:
+        prefix, suffix, section_ids = _build_batch_match_prompt(
+            [jobs[pending[keys[0]][0]] for keys in pending_keys], sections_with_tags, pinned_sections
+        )
+        model, prompt = await _match_model(api_key, prefix, suffix)
+        try:
+            response = await with_retries_async(
+                model.generate_content_async,
+                prompt,
+                generation_config=json_config(min(_MATCH_MAX_TOKENS * len(pending_keys), _BATCH_MATCH_MAX_TOKENS))
+            )
+            batch = _parse_batch_match_response(response.text, section_ids, len(pending_keys))
+        except Exception:
+            logger.exception("match_many failed")
+            raise  # Re-raise for router to handle
+        
+        for (cache_key, context_key, terms), result in zip(pending_keys, batch):
+            if result.get('experiences') or result.get('projects'):
+                _remember_match(cache_key, context_key, terms, orjson.dumps(result).decode())
+        batch = [_ensure_results(result, sections_with_tags, pinned_sections) for result in batch]
+    else:
+        batch = []
+    
+    for keys, result in zip(pending_keys, batch):
+        indices = pending[keys[0]]
+        results[indices[0]] = result
+        for index in indices[1:]:
+            results[index] = orjson.loads(orjson.dumps(result))
+    return results
 
-JOB REQUIREMENTS:
-Terms: {', '.join(jd_terms[:30])}
-Experience: {jd_info.get('years_experience') or 'Not specified'}
-Sponsorship: {jd_info.get('sponsorship', 'unknown')}
-Remote: {jd_info.get('remote', 'unknown')}
 
-"""
+# Section ids in the match prompt map back to (list key, section key, flavor)
+_SectionIds = Dict[int, Tuple[str, Optional[str], str]]
+
+_MATCH_TASK = """
+TASK (use the numeric section ids above):
+1. Pick 2-4 experience ids (at least 2 if available, even if weak)
+2. Pick 2-3 project ids (at least 2 if available, even if weak)
+3. Pick 1 skills id
+4. List the 10-15 most important JD terms NOT covered by the picks
+5. Give each pick a short reason ("closest available" if weak)
+
+Return JSON: {"exp": [{"id": 1, "why": "..."}], "proj": [{"id": 5, "why": "..."}], "skills": 9, "missing": ["term"]}"""
+
+_MATCH_BATCH_TASK = """
+TASK, for EACH job (use the numeric section ids above):
+1. Pick 2-4 experience ids (at least 2 if available, even if weak)
+2. Pick 2-3 project ids (at least 2 if available, even if weak)
+3. Pick 1 skills id
+4. List the 10-15 most important terms of that job NOT covered by its picks
+5. Give each pick a short reason ("closest available" if weak)
+
+Return JSON: {"results": [{"job": 1, "exp": [{"id": 1, "why": "..."}], "proj": [{"id": 5, "why": "..."}], "skills": 9, "missing": ["term"]}]}"""
+
+
+def _append_section_lines(parts: List[str], ids: _SectionIds, list_key: str, entries: List[Dict]) -> None:
+    """One line per flavor as "id flavor [tags]"; tags shared by every flavor print once on the key line."""
+    for entry in entries:
+        flavors = entry.get('flavors', [])
+        tag_lists = [f.get('tags', [])[:15] for f in flavors]
+        shared = set(tag_lists[0]).intersection(*tag_lists[1:]) if len(tag_lists) > 1 else set()
+        shared_tags = [t for t in tag_lists[0] if t in shared] if shared else []
+        parts.append(f"{entry['key']} [{', '.join(shared_tags)}]\n" if shared_tags else f"{entry['key']}\n")
+        for flavor, tags in zip(flavors, tag_lists):
+            section_id = len(ids) + 1
+            ids[section_id] = (list_key, entry['key'], flavor['flavor'])
+            parts.append(f" {section_id} {flavor['flavor']} [{', '.join(t for t in tags if t not in shared)}]\n")
+
+
+def _job_lines(jd_terms: List[str], jd_info: Dict[str, Any]) -> str:
+    return (
+        f"terms: {', '.join(jd_terms[:30])}\n"
+        f"experience: {jd_info.get('years_experience') or 'not specified'}; "
+        f"sponsorship: {jd_info.get('sponsorship', 'unknown')}; remote: {jd_info.get('remote', 'unknown')}\n"
+    )
+
+
+def _append_sections_block(
+    parts: List[str],
+    sections_with_tags: Dict[str, List[Dict]],
+    pinned_sections: List[Dict]
+) -> _SectionIds:
+    """Append the numbered EXPERIENCES / PROJECTS / SKILLS listing (and pins); returns the id map."""
+    ids: _SectionIds = {}
+    parts.append("EXPERIENCES:\n")
+    _append_section_lines(parts, ids, 'experiences', sections_with_tags.get('experiences', []))
+    parts.append("\nPROJECTS:\n")
+    _append_section_lines(parts, ids, 'projects', sections_with_tags.get('projects', []))
+    
+    parts.append("\nSKILLS:\n")
+    for skill in sections_with_tags.get('skills', []):
+        section_id = len(ids) + 1
+        ids[section_id] = ('skills', None, skill['flavor'])
+        parts.append(f" {section_id} {skill['flavor']} [{', '.join(skill.get('tags', [])[:15])}]\n")
     
     if pinned_sections:
-        prompt += "MUST INCLUDE:\n"
+        must = []
         for p in pinned_sections:
-            prompt += f"- {p['key']}:{p['flavor']}\n"
-        prompt += "\n"
-    
-    prompt += "AVAILABLE SECTIONS:\n\nExperiences:\n"
-    for exp in sections_with_tags.get('experiences', []):
-        for flavor in exp.get('flavors', []):
-            tags = flavor.get('tags', [])
-            prompt += f"- {exp['key']}:{flavor['flavor']} [{', '.join(tags[:15])}]\n"
-    
-    prompt += "\nProjects:\n"
-    for proj in sections_with_tags.get('projects', []):
-        for flavor in proj.get('flavors', []):
-            tags = flavor.get('tags', [])
-            prompt += f"- {proj['key']}:{flavor['flavor']} [{', '.join(tags[:15])}]\n"
-    
-    prompt += "\nSkills Flavors:\n"
-    for skill in sections_with_tags.get('skills', []):
-        tags = skill.get('tags', [])
-        prompt += f"- {skill['flavor']} [{', '.join(tags[:15])}]\n"
-    
-    prompt += """
-TASK:
-1. Select 2-4 best matching experiences (MUST select at least 2 if available, even if match is weak)
-2. Select 2-3 best matching projects (MUST select at least 2 if available, even if match is weak)
-3. Select best skills flavor (MUST select one if available)
-4. List important JD terms NOT covered by selected sections
-5. For each selection, explain WHY it matches (or say "closest available" if weak match)
-
-IMPORTANT: 
-- Always return the closest matching sections. Never return empty arrays if sections are available.
-- The "key" and "flavor" must be SEPARATE fields, exactly as shown in AVAILABLE SECTIONS above.
-- Format: key is BEFORE the colon, flavor is AFTER the colon (e.g., "tesla:mechanical" means key="tesla", flavor="mechanical")
-
-Return ONLY this JSON (no markdown, no extra text):
-{
-  "experiences": [
-    {"key": "tesla", "flavor": "mechanical", "reason": "matches X, Y, Z"}
-  ],
-  "projects": [
-    {"key": "battery_management", "flavor": "electrical", "reason": "matches X, Y"}
-  ],
-  "skills_flavor": "systems",
-  "missing_keywords": ["term1", "term2"]
-}
-
-JSON:"""
-    
-    return prompt
-
-
-def _parse_match_response(response_text: str) -> Dict[str, Any]:
-    """Parse matching response."""
-    json_match = re.search(r'\{[\s\S]*\}', response_text)
-    
-    if json_match:
-        try:
-            result = json.loads(json_match.group())
-            
-            # Fix malformed key:flavor combinations
-            for exp in result.get('experiences', []):
-                if ':' in exp.get('key', ''):
-                    parts = exp['key'].split(':')
-                    exp['key'] = parts[0]
-                    if len(parts) > 1 and (not exp.get('flavor') or ':' in exp.get('flavor', '')):
-                        exp['flavor'] = parts[1]
-                # Clean flavor if it contains brackets or extra text
-                if exp.get('flavor'):
-                    exp['flavor'] = exp['flavor'].split('[')[0].split(':')[-1].strip()
-            
-            for proj in result.get('projects', []):
-                if ':' in proj.get('key', ''):
-                    parts = proj['key'].split(':')
-                    proj['key'] = parts[0]
-                    if len(parts) > 1 and (not proj.get('flavor') or ':' in proj.get('flavor', '')):
-                        proj['flavor'] = parts[1]
-                # Clean flavor if it contains brackets or extra text
-                if proj.get('flavor'):
-                    proj['flavor'] = proj['flavor'].split('[')[0].split(':')[-1].strip()
-            
-            return result
-        except json.JSONDecodeError:
-            pass
+            list_key = 'experiences' if p['type'] == 'experience' else 'projects'
+            options = [
+                str(i) for i, (lk, key, flavor) in ids.items()
+                if lk == list_key and key == p['key'] and (not p.get('flavor') or flavor == p['flavor'])
+            ]
+            if options:
+                must.append("/".join(options))
+        if must:
+            parts.append(f"\nMUST INCLUDE (one id of each group): {', '.join(must)}\n")
     
+    return ids
+
+
+def _build_match_prompt(
+    jd_terms: List[str],
+    jd_info: Dict[str, Any],
+    sections_with_tags: Dict[str, List[Dict]],
+    pinned_sections: List[Dict]
+) -> Tuple[str, str, _SectionIds]:
+    """
+    Build compact matching prompt.
+    Sections are listed by numeric id. Returns (prefix, suffix, ids): the
+    sections and task, which only change when the sections do (so the
+    prefix can be context-cached), the job, and the id map
+    _parse_match_response needs to translate the picks back.
+    """
+    parts = ["Match resume sections to the job at the end.\n\n"]
+    ids = _append_sections_block(parts, sections_with_tags, pinned_sections)
+    parts.append(_MATCH_TASK)
+    return "".join(parts), f"\n\nJOB: {_job_lines(jd_terms, jd_info)}", ids
+
+
+def _build_batch_match_prompt(
+    jobs: List[Tuple[List[str], Dict[str, Any]]],
+    sections_with_tags: Dict[str, List[Dict]],
+    pinned_sections: List[Dict]
+) -> Tuple[str, str, _SectionIds]:
+    """Matching prompt for several JDs: the sections and task once (prefix), then each numbered job (suffix)."""
+    parts = ["Match resume sections to each job at the end.\n\n"]
+    ids = _append_sections_block(parts, sections_with_tags, pinned_sections)
+    parts.append(_MATCH_BATCH_TASK)
+    jobs_block = [f"JOB {number}: {_job_lines(jd_terms, jd_info)}" for number, (jd_terms, jd_info) in enumerate(jobs, 1)]
+    return "".join(parts), "\n\nJOBS:\n" + "".join(jobs_block), ids
+
+
+def _empty_match() -> Dict[str, Any]:
     return {
         "experiences": [],
         "projects": [],
@@ -149,6 +528,72 @@ def _parse_match_response(response_text: str) -> Dict[str, Any]:
     }
 
 
+# Response fields holding section picks, and the result lists they fill
+_PICK_FIELDS = {'exp': 'experiences', 'proj': 'projects'}
+
+
+def _translate_pick(pick: Any, ids: _SectionIds, list_key: str, seen: Set[int]) -> Optional[Dict[str, str]]:
+    """Turn one {"id", "why"} pick into {key, flavor, reason}; None for unknown, wrong-kind or repeated ids."""
+    section_id = pick.get('id') if isinstance(pick, dict) else pick
+    section = ids.get(section_id) if isinstance(section_id, int) else None
+    if section is None or section[0] != list_key or section_id in seen:
+        return None
+    seen.add(section_id)
+    return {
+        'key': section[1],
+        'flavor': section[2],
+        'reason': str(pick.get('why', '')) if isinstance(pick, dict) else ''
+    }
+
+
+def _parse_match_response(response_text: str, ids: _SectionIds) -> Dict[str, Any]:
+    """Parse matching response (JSON mode) and translate section ids back to key/flavor."""
+    try:
+        raw = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        raw = None
+    return _translate_match(raw, ids)
+
+
+def _parse_batch_match_response(response_text: str, ids: _SectionIds, count: int) -> List[Dict[str, Any]]:
+    """Parse a batch matching response into count results, aligned by each item's "job" number."""
+    try:
+        raw = orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        raw = None
+    
+    items = raw.get('results') if isinstance(raw, dict) else raw
+    results = [_empty_match() for _ in range(count)]
+    for position, item in enumerate(items if isinstance(items, list) else []):
+        job = item.get('job') if isinstance(item, dict) else None
+        index = job - 1 if isinstance(job, int) and 1 <= job <= count else position
+        if index < count:
+            results[index] = _translate_match(item, ids)
+    return results
+
+
+def _translate_match(raw: Any, ids: _SectionIds) -> Dict[str, Any]:
+    """One {"exp", "proj", "skills", "missing"} object to a match result."""
+    if not isinstance(raw, dict):
+        return _empty_match()
+    
+    result = _empty_match()
+    seen: Set[int] = set()
+    for field, list_key in _PICK_FIELDS.items():
+        for pick in raw.get(field) or []:
+            translated = _translate_pick(pick, ids, list_key, seen)
+            if translated is not None:
+                result[list_key].append(translated)
+    
+    skills_id = raw.get('skills')
+    skills = ids.get(skills_id) if isinstance(skills_id, int) else None
+    if skills is not None and skills[0] == 'skills':
+        result['skills_flavor'] = skills[2]
+    
+    result['missing_keywords'] = [k for k in raw.get('missing') or [] if isinstance(k, str)]
+    return result
+
+
 def _ensure_results(
     result: Dict[str, Any],
     sections_with_tags: Dict[str, List[Dict]],
@@ -189,32 +634,35 @@ def _ensure_results(
         result['skills_flavor'] = skills[0]['flavor']
     
     # Ensure pinned sections are included
+    if pinned_sections:
+        default_flavors = {
+            list_key: {s['key']: s['flavors'][0]['flavor'] for s in sections_with_tags.get(list_key, []) if s.get('flavors')}
+            for list_key in ('experiences', 'projects')
+        }
+        included = {
+            list_key: {s['key'] for s in result.get(list_key, [])}
+            for list_key in ('experiences', 'projects')
+        }
+    
     for pinned in pinned_sections:
         section_type = pinned['type']
         key = pinned['key']
-        flavor = pinned.get('flavor')
         
         list_key = 'experiences' if section_type == 'experience' else 'projects'
         
-        # Check if already in results
-        already_included = any(
-            s['key'] == key for s in result.get(list_key, [])
-        )
+        if key in included[list_key]:
+            continue
         
-        if not already_included:
-            # Find the flavor from available sections
-            if not flavor:
-                for section in sections_with_tags.get(list_key, []):
-                    if section['key'] == key and section.get('flavors'):
-                        flavor = section['flavors'][0]['flavor']
-                        break
-            
-            if flavor:
-                result[list_key] = result.get(list_key, [])
-                result[list_key].insert(0, {
-                    'key': key,
-                    'flavor': flavor,
-                    'reason': 'pinned section'
-                })
+        # Fall back to the section's first flavor
+        flavor = pinned.get('flavor') or default_flavors[list_key].get(key)
+        
+        if flavor:
+            result[list_key] = result.get(list_key, [])
+            result[list_key].insert(0, {
+                'key': key,
+                'flavor': flavor,
+                'reason': 'pinned section'
+            })
+            included[list_key].add(key)
     
     return result
\ No newline at end of file
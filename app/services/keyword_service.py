@@ -1,15 +1,32 @@
-import google.generativeai as genai
-import json
 import re
-from typing import List, Set, Dict, Any
+from collections import Counter
+from typing import Iterator, List, Set, Dict, Any
+
+import orjson
+
+from app.services.gemini_service import get_model, json_config, with_retries_async
+
+
+# Same model as the matcher: faster and cheaper than 1.5 for short keyword lists
+_KEYWORD_MODEL = 'gemini-2.0-flash'
+_EXTRACT_CONFIG = json_config(512)
+_MISSING_CONFIG = json_config(256)
+_EXTRACT_AND_DIFF_CONFIG = json_config(768)
+
 
 class KeywordServiceError(Exception):
     pass
 
+
+def _parse_keyword_list(value: Any) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [k.lower().strip() for k in value if isinstance(k, str)]
+
+
 async def extract_keywords_with_ai(api_key: str, text: str) -> List[str]:
     """Use Gemini to extract technical keywords from text."""
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    model = get_model(api_key, _KEYWORD_MODEL)
     
     prompt = f"""Extract all technical keywords, skills, tools, and technologies from this text.
 Include: programming languages, frameworks, libraries, databases, cloud services, 
@@ -23,13 +40,8 @@ Return ONLY a JSON array of lowercase keywords, nothing else. Example:
 """
     
     try:
-        response = await model.generate_content_async(prompt)
-        # Parse JSON from response
-        json_match = re.search(r'\[[\s\S]*\]', response.text)
-        if json_match:
-            keywords = json.loads(json_match.group())
-            return [k.lower().strip() for k in keywords if isinstance(k, str)]
-        return []
+        response = await with_retries_async(model.generate_content_async, prompt, generation_config=_EXTRACT_CONFIG)
+        return _parse_keyword_list(orjson.loads(response.text))
     except Exception as e:
         raise KeywordServiceError(f"Failed to extract keywords: {str(e)}")
 
@@ -39,8 +51,7 @@ async def find_missing_keywords_with_ai(
     resume_content: str
 ) -> List[str]:
     """Use Gemini to find JD keywords missing from resume."""
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    model = get_model(api_key, _KEYWORD_MODEL)
     
     prompt = f"""Compare this job description with the resume content.
 Identify important technical keywords, skills, and requirements from the JD 
@@ -61,37 +72,106 @@ Example: ["kubernetes", "terraform", "ci/cd"]
 """
     
     try:
-        response = await model.generate_content_async(prompt)
-        json_match = re.search(r'\[[\s\S]*\]', response.text)
-        if json_match:
-            keywords = json.loads(json_match.group())
-            return [k.lower().strip() for k in keywords if isinstance(k, str)]
-        return []
+        response = await with_retries_async(model.generate_content_async, prompt, generation_config=_MISSING_CONFIG)
+        return _parse_keyword_list(orjson.loads(response.text))
     except Exception as e:
         raise KeywordServiceError(f"Failed to find missing keywords: {str(e)}")
 
-def content_to_text(content: Dict[str, Any]) -> str:
-    """Convert section content dict to searchable text."""
-    parts = []
+async def extract_and_diff(
+    api_key: str,
+    job_description: str,
+    resume_content: str
+) -> Dict[str, List[str]]:
+    """
+    extract_keywords_with_ai on the JD and find_missing_keywords_with_ai
+    against the resume in a single Gemini call.
+    Returns {"jd_keywords": [...], "missing": [...]}.
+    """
+    model = get_model(api_key, _KEYWORD_MODEL)
+    
+    prompt = f"""Extract all technical keywords, skills, tools, and technologies from this job description,
+then identify which of them are NOT present in the resume content.
+Include: programming languages, frameworks, libraries, databases, cloud services,
+methodologies, tools, concepts, certifications, and domain-specific terms.
+
+JOB DESCRIPTION:
+{job_description}
+
+RESUME CONTENT:
+{resume_content}
+
+Return ONLY this JSON object (lowercase keywords), nothing else.
+Limit "missing" to the 10-15 most important missing keywords.
+Example: {{"jd_keywords": ["python", "aws", "kubernetes"], "missing": ["kubernetes"]}}
+"""
     
+    try:
+        response = await with_retries_async(model.generate_content_async, prompt, generation_config=_EXTRACT_AND_DIFF_CONFIG)
+        result = orjson.loads(response.text)
+        if not isinstance(result, dict):
+            result = {}
+        return {key: _parse_keyword_list(result.get(key)) for key in ("jd_keywords", "missing")}
+    except Exception as e:
+        raise KeywordServiceError(f"Failed to extract and diff keywords: {str(e)}")
+
+# Tokens like "c++", "node.js", "ci/cd", "k8s"; trailing punctuation is stripped
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9+#./-]*")
+
+_STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could do does
+during each either etc for from has have having how if in including into is it its may more most
+must nice no not of on or other our over per plus preferred required requirements responsibilities
+role should such than that the their them then there these they this those through to team teams
+up using via we well what when where which while who will with within work working would you your
+ability able experience experienced year years strong skills knowledge understanding familiarity
+excellent good great new join help build building across based company candidate candidates
+need needs looking seeking ideal ideally opportunity position environment
+""".split())
+
+
+def _tokens(text: str) -> List[str]:
+    return [t.rstrip('.-/') for t in _TOKEN_RE.findall(text.lower())]
+
+
+def find_missing_keywords_simple(job_description: str, resume_content: str, limit: int = 15) -> List[str]:
+    """
+    Set-based fallback for find_missing_keywords_with_ai when no API key is
+    given: JD tokens (minus stopwords) absent from the resume, most frequent
+    first.
+    """
+    resume_tokens = set(_tokens(resume_content))
+    counts = Counter(
+        t for t in _tokens(job_description)
+        if len(t) > 1 and t not in _STOPWORDS and t not in resume_tokens
+    )
+    return [t for t, _ in counts.most_common(limit)]
+
+
+def _iter_text_parts(content: Dict[str, Any]) -> Iterator[str]:
+    """Yield the searchable fragments of a section content dict, in order."""
     if 'title' in content:
-        parts.append(str(content['title']))
+        yield str(content['title'])
     if 'company' in content:
-        parts.append(str(content['company']))
+        yield str(content['company'])
     if 'bullets' in content:
-        parts.extend([str(b) for b in content['bullets']])
+        for b in content['bullets']:
+            yield str(b)
     if 'skills' in content:
         if isinstance(content['skills'], list):
-            parts.extend([str(s) for s in content['skills']])
+            for s in content['skills']:
+                yield str(s)
         elif isinstance(content['skills'], dict):
             for category, skills in content['skills'].items():
-                parts.append(str(category))
+                yield str(category)
                 if isinstance(skills, list):
-                    parts.extend([str(s) for s in skills])
+                    for s in skills:
+                        yield str(s)
     if 'description' in content:
-        parts.append(str(content['description']))
-    
-    return ' '.join(parts)
+        yield str(content['description'])
+
+def content_to_text(content: Dict[str, Any]) -> str:
+    """Convert section content dict to searchable text."""
+    return ' '.join(_iter_text_parts(content))
 
 def sections_to_text(section_contents: List[Dict[str, Any]]) -> str:
     """Convert multiple section contents to combined text."""
@@ -1,7 +1,7 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, insert, select
 from fastapi import HTTPException
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
 from app.models.outreach_template import OutreachTemplate
@@ -78,40 +78,56 @@ class OutreachService:
 
     # ============ THREADS ============
 
+    @staticmethod
+    def _query_threads_with_stats(db: Session, user_id: UUID, thread_id: Optional[UUID] = None):
+        """
+        (thread, message count, last message time) rows for a user's threads,
+        with applications eager-loaded: one query plus one selectin load instead
+        of three queries per thread. Pass thread_id to fetch a single thread.
+        """
+        scope = OutreachMessage.thread_id == thread_id if thread_id else OutreachMessage.thread_id.in_(
+            select(OutreachThread.id).where(OutreachThread.user_id == user_id)
+        )
+        msgs = select(
+            OutreachMessage.thread_id,
+            func.count(OutreachMessage.id).label("cnt"),
+            func.max(OutreachMessage.created_at).label("last_at")
+        ).where(scope).group_by(OutreachMessage.thread_id).subquery()
+
+        query = db.query(OutreachThread, msgs.c.cnt, msgs.c.last_at)\
+            .outerjoin(msgs, msgs.c.thread_id == OutreachThread.id)\
+            .options(selectinload(OutreachThread.applications))\
+            .filter(OutreachThread.user_id == user_id)
+        if thread_id:
+            query = query.filter(OutreachThread.id == thread_id)
+        return query
+
+    @staticmethod
+    def _serialize_thread(thread: OutreachThread, msg_count: Optional[int] = 0, last_message_at=None) -> dict:
+        return {
+            "id": thread.id,
+            "user_id": thread.user_id,
+            "company": thread.company,
+            "contact_name": thread.contact_name,
+            "contact_method": thread.contact_method,
+            "resume_config": thread.resume_config,
+            "is_active": thread.is_active,
+            "application_ids": [a.id for a in thread.applications],
+            "message_count": msg_count or 0,
+            "last_message_at": last_message_at,
+            "created_at": thread.created_at,
+            "updated_at": thread.updated_at
+        }
+
     @staticmethod
     def list_threads(db: Session, user_id: UUID, active_only: bool = False) -> List[dict]:
-        query = db.query(OutreachThread).filter(OutreachThread.user_id == user_id)
+        query = OutreachService._query_threads_with_stats(db, user_id)
 
         if active_only:
             query = query.filter(OutreachThread.is_active == True)
 
-        threads = query.order_by(OutreachThread.updated_at.desc()).all()
-
-        result = []
-        for thread in threads:
-            msg_count = db.query(func.count(OutreachMessage.id))\
-                .filter(OutreachMessage.thread_id == thread.id).scalar()
-            last_msg = db.query(OutreachMessage)\
-                .filter(OutreachMessage.thread_id == thread.id)\
-                .order_by(OutreachMessage.created_at.desc())\
-                .first()
-
-            result.append({
-                "id": thread.id,
-                "user_id": thread.user_id,
-                "company": thread.company,
-                "contact_name": thread.contact_name,
-                "contact_method": thread.contact_method,
-                "resume_config": thread.resume_config,
-                "is_active": thread.is_active,
-                "application_ids": [a.id for a in thread.applications],
-                "message_count": msg_count,
-                "last_message_at": last_msg.created_at if last_msg else None,
-                "created_at": thread.created_at,
-                "updated_at": thread.updated_at
-            })
-
-        return result
+        rows = query.order_by(OutreachThread.updated_at.desc()).all()
+        return [OutreachService._serialize_thread(thread, msg_count, last_at) for thread, msg_count, last_at in rows]
 
     @staticmethod
     def create_thread(db: Session, user_id: UUID, data: ThreadCreate) -> dict:
@@ -133,50 +149,15 @@ class OutreachService:
         db.commit()
         db.refresh(thread)
 
-        return {
-            "id": thread.id,
-            "user_id": thread.user_id,
-            "company": thread.company,
-            "contact_name": thread.contact_name,
-            "contact_method": thread.contact_method,
-            "resume_config": thread.resume_config,
-            "is_active": thread.is_active,
-            "application_ids": [a.id for a in thread.applications],
-            "message_count": 0,
-            "last_message_at": None,
-            "created_at": thread.created_at,
-            "updated_at": thread.updated_at
-        }
+        return OutreachService._serialize_thread(thread)
 
     @staticmethod
     def get_thread(db: Session, user_id: UUID, thread_id: UUID) -> dict:
-        thread = db.query(OutreachThread)\
-            .filter(OutreachThread.id == thread_id, OutreachThread.user_id == user_id)\
-            .first()
-        if not thread:
+        row = OutreachService._query_threads_with_stats(db, user_id, thread_id).first()
+        if not row:
             raise HTTPException(status_code=404, detail="Thread not found")
 
-        msg_count = db.query(func.count(OutreachMessage.id))\
-            .filter(OutreachMessage.thread_id == thread.id).scalar()
-        last_msg = db.query(OutreachMessage)\
-            .filter(OutreachMessage.thread_id == thread.id)\
-            .order_by(OutreachMessage.created_at.desc())\
-            .first()
-
-        return {
-            "id": thread.id,
-            "user_id": thread.user_id,
-            "company": thread.company,
-            "contact_name": thread.contact_name,
-            "contact_method": thread.contact_method,
-            "resume_config": thread.resume_config,
-            "is_active": thread.is_active,
-            "application_ids": [a.id for a in thread.applications],
-            "message_count": msg_count,
-            "last_message_at": last_msg.created_at if last_msg else None,
-            "created_at": thread.created_at,
-            "updated_at": thread.updated_at
-        }
+        return OutreachService._serialize_thread(*row)
 
     @staticmethod
     def update_thread(db: Session, user_id: UUID, thread_id: UUID, data: ThreadUpdate) -> dict:
@@ -200,29 +181,8 @@ class OutreachService:
                 setattr(thread, field, value.value if hasattr(value, 'value') else value)
 
         db.commit()
-        db.refresh(thread)
 
-        msg_count = db.query(func.count(OutreachMessage.id))\
-            .filter(OutreachMessage.thread_id == thread.id).scalar()
-        last_msg = db.query(OutreachMessage)\
-            .filter(OutreachMessage.thread_id == thread.id)\
-            .order_by(OutreachMessage.created_at.desc())\
-            .first()
-
-        return {
-            "id": thread.id,
-            "user_id": thread.user_id,
-            "company": thread.company,
-            "contact_name": thread.contact_name,
-            "contact_method": thread.contact_method,
-            "resume_config": thread.resume_config,
-            "is_active": thread.is_active,
-            "application_ids": [a.id for a in thread.applications],
-            "message_count": msg_count,
-            "last_message_at": last_msg.created_at if last_msg else None,
-            "created_at": thread.created_at,
-            "updated_at": thread.updated_at
-        }
+        return OutreachService._serialize_thread(*OutreachService._query_threads_with_stats(db, user_id, thread.id).one())
 
     @staticmethod
     def delete_thread(db: Session, user_id: UUID, thread_id: UUID):
@@ -268,6 +228,33 @@ class OutreachService:
         db.refresh(message)
         return message
 
+    @staticmethod
+    def bulk_add_messages(
+        db: Session, user_id: UUID, thread_id: UUID, messages: List[MessageCreate]
+    ) -> List[OutreachMessage]:
+        """Insert several messages (e.g. a parsed conversation) in one round-trip."""
+        thread = db.query(OutreachThread)\
+            .filter(OutreachThread.id == thread_id, OutreachThread.user_id == user_id)\
+            .first()
+        if not thread:
+            raise HTTPException(status_code=404, detail="Thread not found")
+
+        if not messages:
+            return []
+
+        rows = [
+            {
+                "thread_id": thread_id,
+                "direction": m.direction.value,
+                "content": m.content,
+                "message_at": m.message_at,
+            }
+            for m in messages
+        ]
+        created = db.scalars(insert(OutreachMessage).returning(OutreachMessage), rows).all()
+        db.commit()
+        return created
+
     @staticmethod
     def delete_message(db: Session, user_id: UUID, thread_id: UUID, message_id: UUID):
         thread = db.query(OutreachThread)\
@@ -289,17 +276,11 @@ class OutreachService:
 
     @staticmethod
     def get_applications_by_company(db: Session, user_id: UUID, company: str) -> List[dict]:
-        apps = db.query(Application)\
-            .filter(Application.user_id == user_id, Application.company.ilike(f"%{company}%"))\
+        # Substring match served by the company trigram index; only the
+        # response columns are loaded
+        rows = db.query(Application)\
+            .with_entities(Application.id, Application.company, Application.role, Application.status, Application.applied_at)\
+            .filter(Application.user_id == user_id, Application.company.icontains(company, autoescape=True))\
             .all()
 
-        return [
-            {
-                "id": a.id,
-                "company": a.company,
-                "role": a.role,
-                "status": a.status,
-                "applied_at": a.applied_at
-            }
-            for a in apps
-        ]
+        return [row._asdict() for row in rows]
@@ -1,12 +1,25 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, func, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB
+from datetime import datetime
 from uuid import UUID
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
 from app.models.section import Section
 from app.schemas.section import SectionCreate, SectionUpdate
 
 
+def get_section_state(db: Session, user_id: UUID) -> Tuple[Optional[datetime], int]:
+    """
+    (MAX(updated_at), row count) of the user's sections. Any insert, edit or
+    delete moves one of them, and unlike an in-process counter it is the
+    same on every worker, so it's safe to key shared caches on.
+    """
+    return tuple(db.execute(
+        select(func.max(Section.updated_at), func.count()).where(Section.user_id == user_id)
+    ).one())
+
+
 def get_next_version(current_version: str) -> str:
     """1.0 -> 1.1, 1.9 -> 1.10"""
     major, minor = current_version.split(".")
@@ -24,16 +37,21 @@ def get_sections_by_type(db: Session, user_id: UUID, type: str) -> list[Section]
 
 
 def get_section_versions(
-    db: Session, user_id: UUID, type: str, key: str, flavor: str
+    db: Session, user_id: UUID, type: str, key: str, flavor: str,
+    limit: int = 20, before: Optional[datetime] = None,
 ) -> list[Section]:
-    return db.query(Section).filter(
+    """Newest versions first; pass the last row's created_at as before for the next page."""
+    query = db.query(Section).filter(
         and_(
             Section.user_id == user_id,
             Section.type == type,
             Section.key == key,
             Section.flavor == flavor,
         )
-    ).order_by(Section.created_at.desc()).all()
+    )
+    if before is not None:
+        query = query.filter(Section.created_at < before)
+    return query.order_by(Section.created_at.desc()).limit(limit).all()
 
 
 def get_section_by_version(
@@ -64,6 +82,36 @@ def get_current_section(
     ).first()
 
 
+def get_current_sections_bulk(
+    db: Session, user_id: UUID, keys: Iterable[tuple[str, str, str]]
+) -> dict[tuple[str, str, str], Section]:
+    """Current versions of many (type, key, flavor) sections in one query; missing ones are left out."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    sections = db.query(Section).filter(
+        Section.user_id == user_id,
+        tuple_(Section.type, Section.key, Section.flavor).in_(keys),
+        Section.is_current == True,
+    ).all()
+    return {(s.type, s.key, s.flavor): s for s in sections}
+
+
+def current_section_exists(
+    db: Session, user_id: UUID, type: str, key: str, flavor: str
+) -> bool:
+    """Whether a current version exists, without loading its content."""
+    return db.query(Section).with_entities(Section.id).filter(
+        and_(
+            Section.user_id == user_id,
+            Section.type == type,
+            Section.key == key,
+            Section.flavor == flavor,
+            Section.is_current == True,
+        )
+    ).first() is not None
+
+
 def create_section(db: Session, user_id: UUID, section: SectionCreate) -> Section:
     db_section = Section(
         user_id=user_id,
@@ -76,23 +124,31 @@ def create_section(db: Session, user_id: UUID, section: SectionCreate) -> Sectio
     )
     db.add(db_section)
     db.commit()
-    db.refresh(db_section)
     return db_section
 
 
 def update_section(
     db: Session, user_id: UUID, type: str, key: str, flavor: str, section: SectionUpdate
 ) -> Optional[Section]:
-    # Get current version
-    current = get_current_section(db, user_id, type, key, flavor)
-    if not current:
+    # Demote the current version and learn its number in one statement
+    current_version = db.execute(
+        update(Section)
+        .where(
+            Section.user_id == user_id,
+            Section.type == type,
+            Section.key == key,
+            Section.flavor == flavor,
+            Section.is_current == True,
+        )
+        .values(is_current=False)
+        .returning(Section.version)
+        .execution_options(synchronize_session=False)
+    ).scalars().first()
+    if current_version is None:
         return None
 
-    # Mark old as not current
-    current.is_current = False
-
     # Create new version
-    new_version = get_next_version(current.version)
+    new_version = get_next_version(current_version)
     new_section = Section(
         user_id=user_id,
         type=type,
@@ -104,32 +160,49 @@ def update_section(
     )
     db.add(new_section)
     db.commit()
-    db.refresh(new_section)
     return new_section
 
 
+def set_section_tags(db: Session, user_id: UUID, section_id: UUID, tags: List[str]) -> None:
+    """Merge generated tags into a section's content in place (no new version)."""
+    db.execute(
+        update(Section)
+        .where(Section.id == section_id, Section.user_id == user_id)
+        .values(content=Section.content.op("||")(literal({"tags": tags}, JSONB)))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
 def delete_section_version(
     db: Session, user_id: UUID, type: str, key: str, flavor: str, version: str
 ) -> bool:
-    section = get_section_by_version(db, user_id, type, key, flavor, version)
-    if not section:
-        return False
+    same_section = (
+        Section.user_id == user_id,
+        Section.type == type,
+        Section.key == key,
+        Section.flavor == flavor,
+    )
 
-    was_current = section.is_current
-    db.delete(section)
+    # DELETE ... RETURNING tells us whether it existed and was current
+    deleted = db.execute(
+        delete(Section)
+        .where(*same_section, Section.version == version)
+        .returning(Section.id, Section.is_current)
+    ).first()
+    if deleted is None:
+        return False
 
     # If deleted was current, make the latest remaining version current
-    if was_current:
-        latest = db.query(Section).filter(
-            and_(
-                Section.user_id == user_id,
-                Section.type == type,
-                Section.key == key,
-                Section.flavor == flavor,
-            )
-        ).order_by(Section.created_at.desc()).first()
-        if latest:
-            latest.is_current = True
+    if deleted.is_current:
+        latest_id = select(Section.id).where(*same_section)\
+            .order_by(Section.created_at.desc()).limit(1).scalar_subquery()
+        db.execute(
+            update(Section)
+            .where(Section.id == latest_id)
+            .values(is_current=True)
+            .execution_options(synchronize_session=False)
+        )
 
     db.commit()
-    return True
\ No newline at end of file
+    return True
@@ -3,22 +3,57 @@ Tag Generator - AI extracts tags from resume sections.
 Called once on section create/edit, stored in content.tags
 """
 
-import google.generativeai as genai
-import json
-import re
-from typing import Dict, List, Any
+import asyncio
+import logging
+from typing import Dict, List, Any, Tuple
+
+import orjson
+
+from app.services.gemini_service import _key_digest, get_model, json_config, response_cache, with_retries_async
+from app.utils.cache import hash_key
+from app.utils.json_scan import extract_json_array
+from app.utils.latex import join_items
+
+
+logger = logging.getLogger(__name__)
+
+_TAG_MODEL = 'gemini-2.0-flash'
+_TAG_CONFIG = json_config(512)
+
+# Tag calls in flight, by (cache key, API key digest), so concurrent saves of
+# the same content with the same key share one Gemini request. A failure
+# (bad or exhausted key) yields [], so it must never be shared across keys.
+_pending_tags: Dict[Tuple[str, bytes], "asyncio.Future[List[str]]"] = {}
 
 
 async def generate_section_tags(api_key: str, content: Dict[str, Any], section_type: str) -> List[str]:
     """
     Use AI to extract all important tags from a section.
     Tags include: tech skills, soft skills, impact keywords.
+
+    Results are cached by section type and normalized content, so the same
+    bullets saved under another flavor (or re-saved unchanged) skip Gemini.
     """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    
     content_text = _content_to_text(content)
-    
+    cache_key = hash_key("tags", _TAG_MODEL, section_type, ' '.join(content_text.lower().split()))
+
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return _parse_tags_response(cached)
+
+    pending_key = (cache_key, _key_digest(api_key))
+    pending = _pending_tags.get(pending_key)
+    if pending is None:
+        pending = asyncio.ensure_future(_request_tags(api_key, content_text, section_type, cache_key))
+        _pending_tags[pending_key] = pending
+        pending.add_done_callback(lambda _: _pending_tags.pop(pending_key, None))
+    # shield: one caller disconnecting must not cancel the shared request
+    return list(await asyncio.shield(pending))
+
+
+async def _request_tags(api_key: str, content_text: str, section_type: str, cache_key: str) -> List[str]:
+    model = get_model(api_key, _TAG_MODEL)
+
     prompt = f"""Extract ALL important keywords/tags from this resume {section_type} section.
 
 Include:
@@ -37,50 +72,63 @@ Example: ["python", "aws", "leadership", "reduced latency 40%", "microservices"]
 Tags:"""
 
     try:
-        response = await model.generate_content_async(prompt)
-        return _parse_tags_response(response.text)
-    except Exception as e:
-        print(f"Tag generation failed: {e}")
+        response = await with_retries_async(model.generate_content_async, prompt, generation_config=_TAG_CONFIG)
+        tags = _parse_tags_response(response.text)
+        # Only remember responses that actually parsed
+        if tags:
+            response_cache.set(cache_key, orjson.dumps(tags).decode())
+        return tags
+    except Exception:
+        logger.exception("Tag generation failed")
         return []
 
 
+_FIELD_FORMATS = (
+    ('title', 'Title: {}'),
+    ('role', 'Role: {}'),
+    ('company', 'Company: {}'),
+    ('name', 'Project: {}'),
+)
+
+
 def _content_to_text(content: Dict[str, Any]) -> str:
     """Convert section content to text for AI processing."""
-    parts = []
+    parts = [fmt.format(content[key]) for key, fmt in _FIELD_FORMATS if key in content]
     
-    if 'title' in content:
-        parts.append(f"Title: {content['title']}")
-    if 'role' in content:
-        parts.append(f"Role: {content['role']}")
-    if 'company' in content:
-        parts.append(f"Company: {content['company']}")
-    if 'name' in content:
-        parts.append(f"Project: {content['name']}")
     if 'bullets' in content:
         parts.append("Bullets:")
-        for bullet in content['bullets']:
-            parts.append(f"- {bullet}")
+        parts.extend(f"- {bullet}" for bullet in content['bullets'])
     if 'tech_stack' in content:
-        parts.append(f"Tech Stack: {', '.join(content['tech_stack'])}")
-    if 'skills' in content:
-        if isinstance(content['skills'], dict):
-            for category, skills in content['skills'].items():
-                parts.append(f"{category}: {', '.join(skills)}")
-        elif isinstance(content['skills'], list):
-            parts.append(f"Skills: {', '.join(content['skills'])}")
+        parts.append(f"Tech Stack: {join_items(content['tech_stack'])}")
+    skills = content.get('skills')
+    if isinstance(skills, dict):
+        parts.extend(f"{category}: {join_items(items)}" for category, items in skills.items())
+    elif isinstance(skills, list):
+        parts.append(f"Skills: {join_items(skills)}")
     
     return '\n'.join(parts)
 
 
 def _parse_tags_response(response_text: str) -> List[str]:
     """Parse AI response to extract tags array."""
-    json_match = re.search(r'\[[\s\S]*?\]', response_text)
-    
-    if json_match:
+    # JSON mode normally returns a bare array, so slice on the outer brackets
+    # first and only fall back to the string-aware scan if that doesn't parse
+    start = response_text.find('[')
+    end = response_text.rfind(']')
+    if start == -1 or end < start:
+        return []
+
+    try:
+        tags = orjson.loads(response_text[start:end + 1])
+    except orjson.JSONDecodeError:
+        array_text = extract_json_array(response_text)
+        if not array_text:
+            return []
         try:
-            tags = json.loads(json_match.group())
-            return [str(tag).lower().strip() for tag in tags if tag]
-        except json.JSONDecodeError:
-            pass
-    
-    return []
+            tags = orjson.loads(array_text)
+        except orjson.JSONDecodeError:
+            return []
+
+    if not isinstance(tags, list):
+        return []
+    return [str(tag).lower().strip() for tag in tags if tag]
@@ -1,3 +1,7 @@
+import logging
+
+from sqlalchemy import inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from uuid import UUID
 from typing import Optional
@@ -6,6 +10,29 @@ from app.models.user import User
 from app.schemas.user import UserCreate
 
 
+logger = logging.getLogger(__name__)
+
+_PROVIDER_IDENTITY = ["provider", "provider_id"]
+# Whether users has a unique constraint/index on the OAuth identity; checked
+# once per process (databases created before it was added lack it)
+_has_identity_constraint: Optional[bool] = None
+
+
+def _can_upsert(db: Session) -> bool:
+    global _has_identity_constraint
+    if _has_identity_constraint is None:
+        inspector = inspect(db.get_bind())
+        unique_column_sets = [c["column_names"] for c in inspector.get_unique_constraints("users")]
+        unique_column_sets += [i["column_names"] for i in inspector.get_indexes("users") if i.get("unique")]
+        _has_identity_constraint = any(sorted(cols) == _PROVIDER_IDENTITY for cols in unique_column_sets)
+        if not _has_identity_constraint:
+            logger.warning(
+                "users has no unique (provider, provider_id) constraint; sync_user falls back to "
+                "select-then-write. See README > Upgrading an existing database."
+            )
+    return _has_identity_constraint
+
+
 def get_user_by_id(db: Session, user_id: UUID) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
 
@@ -31,22 +58,37 @@ def create_user(db: Session, user: UserCreate) -> User:
     )
     db.add(db_user)
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 
 def sync_user(db: Session, user: UserCreate) -> User:
-    """Create user if not exists, or update if exists."""
+    """Create user if not exists, or update if exists (one INSERT ... ON CONFLICT)."""
+    if not _can_upsert(db):
+        return _sync_user_without_upsert(db, user)
+    
+    stmt = pg_insert(User).values(**user.model_dump())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=_PROVIDER_IDENTITY,
+        set_={
+            "email": stmt.excluded.email,
+            "name": stmt.excluded.name,
+            "avatar_url": stmt.excluded.avatar_url,
+        },
+    ).returning(User)
+    synced = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    db.commit()
+    return synced
+
+
+def _sync_user_without_upsert(db: Session, user: UserCreate) -> User:
+    """Pre-constraint path: look the identity up, then update or insert."""
     existing = get_user_by_provider(db, user.provider, user.provider_id)
     
     if existing:
-        # Update existing user
         existing.email = user.email
         existing.name = user.name
         existing.avatar_url = user.avatar_url
         db.commit()
-        db.refresh(existing)
         return existing
     
-    # Create new user
-    return create_user(db, user)
\ No newline at end of file
+    return create_user(db, user)
@@ -0,0 +1,234 @@
+"""
+In-process caches used to skip repeated Gemini and database work.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Hashable, Optional
+
+
+def hash_key(*parts: Any) -> str:
+    """Build a compact, stable cache key from arbitrary parts."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with an optional per-entry TTL.
+
+    Entries past their TTL are dropped lazily on read; the least recently
+    used entry is evicted once maxsize is exceeded.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class DiskCache:
+    """
+    Text cache in a SQLite file, shared by worker processes and kept across
+    restarts.
+
+    Callers run on the event loop, so only reads happen inline: they are a
+    single indexed lookup (WAL readers don't wait on writers) with a short
+    busy timeout. Writes, deletes and pruning are fire-and-forget on one
+    background thread, in submission order. Expired rows read as misses;
+    every prune_every writes, expired rows are purged and the oldest entries
+    beyond max_entries are evicted (insertion order, not recency, so reads
+    stay read-only). SQLite errors are treated as misses so a bad cache
+    file never fails a request.
+    """
+
+    _READ_TIMEOUT = 0.05
+    _WRITE_TIMEOUT = 5
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: int = 100_000, prune_every: int = 256):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _conn(self, timeout: float = _READ_TIMEOUT) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_created_at ON cache (created_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            row = self._conn().execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] is not None and row[1] < time.time():
+                row = None  # purged by the next prune
+        except sqlite3.Error:
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        self._writer.submit(self._write, key, value, expires_at, now)
+
+    def _write(self, key: str, value: str, expires_at: Optional[float], now: float) -> None:
+        try:
+            conn = self._conn(self._WRITE_TIMEOUT)
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(conn, now)
+        except sqlite3.Error:
+            pass
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            "SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key: str) -> None:
+        self._writer.submit(self._execute, "DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        self._writer.submit(self._execute, "DELETE FROM cache", ())
+
+    def _execute(self, sql: str, params: tuple) -> None:
+        try:
+            self._conn(self._WRITE_TIMEOUT).execute(sql, params)
+        except sqlite3.Error:
+            pass
+
+    def flush(self) -> None:
+        """Wait for queued writes to land (for tests and shutdown)."""
+        self._writer.submit(lambda: None).result()
+
+    def __len__(self) -> int:
+        try:
+            return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+class TieredCache:
+    """
+    LRUCache in front of an optional DiskCache.
+
+    Disk hits are promoted into memory; writes go to both tiers. hits and
+    misses count lookups as a whole, whichever tier answered.
+    """
+
+    def __init__(self, memory: LRUCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self.memory.set(key, value, ttl)
+        if self.disk is not None:
+            self.disk.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return len(self.memory)
@@ -0,0 +1,142 @@
+"""
+Single-pass JSON scanning for model output that arrives in chunks.
+"""
+
+from typing import Any, List, Optional, Tuple
+
+import orjson
+
+
+def _extract_balanced(s: str, open_char: str, close_char: str) -> Optional[str]:
+    """Return the first balanced open_char...close_char span in s, honoring JSON strings."""
+    start = s.find(open_char)
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escape = False
+    for i in range(start, len(s)):
+        ch = s[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == open_char:
+            depth += 1
+        elif ch == close_char:
+            depth -= 1
+            if depth == 0:
+                return s[start:i + 1]
+    return None
+
+
+def extract_json_object(s: str) -> Optional[str]:
+    """First complete {...} object in s (e.g. model output with prose or fences), or None."""
+    return _extract_balanced(s, "{", "}")
+
+
+def extract_json_array(s: str) -> Optional[str]:
+    """First complete [...] array in s, or None."""
+    return _extract_balanced(s, "[", "]")
+
+
+class JSONStreamScanner:
+    """
+    Incrementally scan a streamed top-level JSON object.
+
+    Feed text chunks as they arrive; each call returns the array elements
+    (objects or strings) of top-level keys that finished in that chunk, as
+    (key, value) pairs. Text before the first "{" (e.g. a ```json fence) is
+    ignored. String state and escapes are tracked, so braces inside strings
+    don't affect depth. Top-level keys are collected in .keys as they are
+    seen, so callers can check the shape before the object closes.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.done = False
+        self.keys: List[str] = []
+        self._pos = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._start = 0
+        self._end = 0
+
+    @property
+    def started(self) -> bool:
+        """True once the opening "{" of the top-level object has been seen."""
+        return self._started
+
+    @property
+    def text(self) -> str:
+        """The top-level object scanned so far (complete once done is True)."""
+        return self.buffer[self._start:self._end if self.done else len(self.buffer)]
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buffer += chunk
+        items: List[Tuple[str, Any]] = []
+        buf = self.buffer
+
+        for i in range(self._pos, len(buf)):
+            if self.done:
+                break
+            ch = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buf[self._string_start + 1:i]
+                    elif self._depth == 2 and self._array_key and self._item_start is None:
+                        items.append((self._array_key, orjson.loads(buf[self._string_start:i + 1])))
+                continue
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._start = i
+                    self._depth = 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1:
+                self._key = self._last_string
+                self.keys.append(self._key)
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 2 and ch == "[":
+                    self._array_key = self._key
+                elif self._depth == 3 and self._array_key:
+                    self._item_start = i
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._item_start is not None:
+                    items.append((self._array_key, orjson.loads(buf[self._item_start:i + 1])))
+                    self._item_start = None
+                elif self._depth == 1:
+                    self._array_key = None
+                elif self._depth == 0:
+                    self.done = True
+                    self._end = i + 1
+
+        self._pos = len(buf)
+        return items
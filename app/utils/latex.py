@@ -1,36 +1,66 @@
 import re
+from functools import lru_cache
+from io import StringIO
+from typing import Callable, Dict, TextIO
+
+
+# Characters that need escaping in LaTeX
+_LATEX_MAP = {
+    '\\': r'\textbackslash{}',
+    '&': r'\&',
+    '%': r'\%',
+    '$': r'\$',
+    '#': r'\#',
+    '_': r'\_',
+    '{': r'\{',
+    '}': r'\}',
+    '~': r'\textasciitilde{}',
+    '^': r'\textasciicircum{}',
+}
+_LATEX_RE = re.compile('[' + re.escape(''.join(_LATEX_MAP)) + ']')
+
+
+# **bold** (shortest span) or *italic*; an unpaired * stays literal
+_MARKDOWN_RE = re.compile(r'\*\*(.*?)\*\*|\*([^*]*)\*', re.S)
+
+
+def _latex_replacement(match: re.Match) -> str:
+    return _LATEX_MAP[match.group(0)]
+
+
+def join_items(items, sep: str = ", ") -> str:
+    """Join list items as text, skipping str() when they're already strings."""
+    try:
+        # join() checks the types itself, so all-str lists (the usual case) cost nothing extra
+        return sep.join(items)
+    except TypeError:
+        return sep.join(map(str, items))
 
 
 def escape_latex(text) -> str:
     """Escape special LaTeX characters."""
+    # Nearly every call passes a plain string
+    if type(text) is str:
+        return _escape_latex_str(text)
     if not text:
         return ""
     
     # Handle lists by joining them
     if isinstance(text, list):
-        text = ", ".join(str(item) for item in text)
+        text = join_items(text)
     
     # Ensure it's a string
-    text = str(text)
-    
-    # Characters that need escaping in LaTeX
-    replacements = [
-        ('\\', r'\textbackslash{}'),
-        ('&', r'\&'),
-        ('%', r'\%'),
-        ('$', r'\$'),
-        ('#', r'\#'),
-        ('_', r'\_'),
-        ('{', r'\{'),
-        ('}', r'\}'),
-        ('~', r'\textasciitilde{}'),
-        ('^', r'\textasciicircum{}'),
-    ]
-    
-    for old, new in replacements:
-        text = text.replace(old, new)
-    
-    return text
+    return _escape_latex_str(str(text))
+
+
+# Company names, locations, skills and bullets repeat across flavors and
+# versions, so escaped/processed strings are memoized per worker
+@lru_cache(maxsize=4096)
+def _escape_latex_str(text: str) -> str:
+    # Single pass; most resume text has nothing to escape
+    if not _LATEX_RE.search(text):
+        return text
+    return _LATEX_RE.sub(_latex_replacement, text)
 
 
 def process_bullet(text: str) -> str:
@@ -45,49 +75,68 @@ def process_bullet(text: str) -> str:
     if not text:
         return ""
     
-    if not isinstance(text, str):
-        text = str(text)
-    
-    # Split text into segments: markdown-formatted and plain text.
-    # We process bold first (**...**), then italic (*...*).
-    # 
-    # Strategy: find all **bold** and *italic* spans, escape the plain
-    # text between them, and wrap the formatted spans in LaTeX commands.
-    
+    return _process_bullet_str(text if isinstance(text, str) else str(text))
+
+
+@lru_cache(maxsize=4096)
+def _process_bullet_str(text: str) -> str:
+    # Bold and italic spans in one scan; plain text between them is escaped
     result = []
-    i = 0
-    
-    while i < len(text):
-        # Check for bold: **...**
-        if text[i:i+2] == '**':
-            end = text.find('**', i + 2)
-            if end != -1:
-                inner = escape_latex(text[i+2:end])
-                result.append(f'\\textbf{{{inner}}}')
-                i = end + 2
-                continue
-        
-        # Check for italic: *...*
-        if text[i] == '*':
-            end = text.find('*', i + 1)
-            if end != -1:
-                inner = escape_latex(text[i+1:end])
-                result.append(f'\\textit{{{inner}}}')
-                i = end + 1
-                continue
-        
-        # Plain text: collect until next * 
-        next_star = text.find('*', i)
-        if next_star == -1:
-            result.append(escape_latex(text[i:]))
-            break
+    last = 0
+    for match in _MARKDOWN_RE.finditer(text):
+        result.append(_escape_latex_str(text[last:match.start()]))
+        bold = match.group(1)
+        if bold is not None:
+            result.append(f'\\textbf{{{_escape_latex_str(bold)}}}')
         else:
-            result.append(escape_latex(text[i:next_star]))
-            i = next_star
+            result.append(f'\\textit{{{_escape_latex_str(match.group(2))}}}')
+        last = match.end()
+    result.append(_escape_latex_str(text[last:]))
     
     return ''.join(result)
 
 
+def latex_cache_stats() -> Dict[str, Dict[str, int]]:
+    """Hit/miss counters for the escape_latex and process_bullet memo caches."""
+    return {
+        name: {"size": info.currsize, "hits": info.hits, "misses": info.misses}
+        for name, info in (
+            ("escape_latex", _escape_latex_str.cache_info()),
+            ("process_bullet", _process_bullet_str.cache_info()),
+        )
+    }
+
+
+# Fixed scaffolding for the section generators, formatted or emitted as-is
+_EXPERIENCE_ENTRY_START = (
+    "\\resumeSubheadingExp\n"
+    "    {{\\textbf{{{title}}} $|$ \\textbf{{\\textit{{{company}}}}} $|$ \\textit{{{location}}}}}{{{dates}}}\n"
+    "\\resumeItemListStart\n"
+)
+_EXPERIENCE_START = (
+    "%-----------EXPERIENCE-----------%\n"
+    "\\section{Experience}\n"
+    "\\resumeSubHeadingListStart\n\n"
+)
+_PROJECT_ENTRY_START = (
+    "\\resumeProjectHeading\n"
+    "    {{{header}}} {{}}\n"
+    "\\resumeItemListStart\n"
+)
+_PROJECTS_START = (
+    "%-----------PROJECTS-----------%\n"
+    "\\section{Projects}\n"
+    "\\resumeSubHeadingListStart\n\n"
+)
+_SUBHEADING_LIST_END = "\\resumeSubHeadingListEnd\n"
+_SKILLS_START = (
+    "\\section{Skills}\n"
+    "\\small\n"
+    "\\begin{tabular}{ @{} p{0.15\\textwidth} p{0.80\\textwidth} @{} }\n"
+)
+_SKILLS_END = "\\end{tabular}\n"
+
+
 def generate_experience_entry(exp: dict) -> str:
     """Generate LaTeX for a single experience entry."""
     title = exp.get('title') or exp.get('role', '')
@@ -96,31 +145,40 @@ def generate_experience_entry(exp: dict) -> str:
     dates = exp.get('dates', '')
     bullets = exp.get('bullets', [])
     
-    # Build the header line
-    header = f"\\resumeSubheadingExp\n"
-    header += f"    {{\\textbf{{{escape_latex(title)}}} $|$ \\textbf{{\\textit{{{escape_latex(company)}}}}} $|$ \\textit{{{escape_latex(location)}}}}}{{{escape_latex(dates)}}}\n"
-    
-    # Build bullets
-    items = "\\resumeItemListStart\n"
+    parts = [_EXPERIENCE_ENTRY_START.format_map({
+        "title": escape_latex(title),
+        "company": escape_latex(company),
+        "location": escape_latex(location),
+        "dates": escape_latex(dates),
+    })]
     for bullet in bullets:
-        items += f"    \\resumeItem{{{process_bullet(bullet)}}}\n"
-    items += "\\resumeItemListEnd\n"
+        parts.append(f"    \\resumeItem{{{process_bullet(bullet)}}}\n")
+    parts.append("\\resumeItemListEnd\n")
     
-    return header + items
+    return ''.join(parts)
 
 
-def generate_experience_tex(experiences: list[dict]) -> str:
-    """Generate complete experience.tex content."""
-    content = "%-----------EXPERIENCE-----------%\n"
-    content += "\\section{Experience}\n"
-    content += "\\resumeSubHeadingListStart\n\n"
+def _to_str(write: Callable[..., None], data, **kwargs) -> str:
+    """Run a write_*_tex function into a buffer and return the text."""
+    buf = StringIO()
+    write(data, buf, **kwargs)
+    return buf.getvalue()
+
+
+def write_experience_tex(experiences: list[dict], out: TextIO) -> None:
+    """Write complete experience.tex content to out (a file or buffer)."""
+    out.write(_EXPERIENCE_START)
     
     for exp in experiences:
-        content += generate_experience_entry(exp)
-        content += "\n"
+        out.write(generate_experience_entry(exp))
+        out.write("\n")
     
-    content += "\\resumeSubHeadingListEnd\n"
-    return content
+    out.write(_SUBHEADING_LIST_END)
+
+
+def generate_experience_tex(experiences: list[dict]) -> str:
+    """Generate complete experience.tex content."""
+    return _to_str(write_experience_tex, experiences)
 
 
 def generate_project_entry(proj: dict) -> str:
@@ -131,45 +189,42 @@ def generate_project_entry(proj: dict) -> str:
     links = proj.get('links', {})
 
     # Build header with optional links
-    header_parts = f"\\textbf{{{escape_latex(name)}}} $|$ \\textit{{{escape_latex(tech)}}}"
+    header_parts = [f"\\textbf{{{escape_latex(name)}}} $|$ \\textit{{{escape_latex(tech)}}}"]
 
     if links.get('github'):
-        header_parts += f" $|$ \\href{{{links['github']}}}{{\\textbf{{GitHub}}}}"
+        header_parts.append(f" $|$ \\href{{{links['github']}}}{{\\textbf{{GitHub}}}}")
     if links.get('live'):
-        header_parts += f" $|$ \\href{{{links['live']}}}{{\\textbf{{Live}}}}"
+        header_parts.append(f" $|$ \\href{{{links['live']}}}{{\\textbf{{Live}}}}")
     if links.get('certificate'):
-        header_parts += f" $|$ \\href{{{links['certificate']}}}{{\\textbf{{Certificate}}}}"
-
-    header = f"\\resumeProjectHeading\n"
-    header += f"    {{{header_parts}}} {{}}\n"
+        header_parts.append(f" $|$ \\href{{{links['certificate']}}}{{\\textbf{{Certificate}}}}")
 
-    items = "\\resumeItemListStart\n"
+    parts = [_PROJECT_ENTRY_START.format_map({"header": ''.join(header_parts)})]
     for bullet in bullets:
-        items += f"    \\resumeItem{{{process_bullet(bullet)}}}\n"
-    items += "\\resumeItemListEnd\n"
+        parts.append(f"    \\resumeItem{{{process_bullet(bullet)}}}\n")
+    parts.append("\\resumeItemListEnd\n")
 
-    return header + items
+    return ''.join(parts)
 
 
-def generate_projects_tex(projects: list[dict]) -> str:
-    """Generate complete projects.tex content."""
-    content = "%-----------PROJECTS-----------%\n"
-    content += "\\section{Projects}\n"
-    content += "\\resumeSubHeadingListStart\n\n"
+def write_projects_tex(projects: list[dict], out: TextIO) -> None:
+    """Write complete projects.tex content to out (a file or buffer)."""
+    out.write(_PROJECTS_START)
     
     for proj in projects:
-        content += generate_project_entry(proj)
-        content += "\n"
+        out.write(generate_project_entry(proj))
+        out.write("\n")
     
-    content += "\\resumeSubHeadingListEnd\n"
-    return content
+    out.write(_SUBHEADING_LIST_END)
 
 
-def generate_skills_tex(skills: dict, append: str = None) -> str:
-    """Generate skills.tex content from skills dict."""
-    content = "\\section{Skills}\n"
-    content += "\\small\n"
-    content += "\\begin{tabular}{ @{} p{0.15\\textwidth} p{0.80\\textwidth} @{} }\n"
+def generate_projects_tex(projects: list[dict]) -> str:
+    """Generate complete projects.tex content."""
+    return _to_str(write_projects_tex, projects)
+
+
+def write_skills_tex(skills: dict, out: TextIO, append: str = None) -> None:
+    """Write skills.tex content from skills dict to out (a file or buffer)."""
+    out.write(_SKILLS_START)
     
     # Handle case where skills might have 'skills' key inside
     if 'skills' in skills and isinstance(skills['skills'], dict):
@@ -182,16 +237,20 @@ def generate_skills_tex(skills: dict, append: str = None) -> str:
         if category in skip_keys:
             continue
         if isinstance(items, list):
-            items_str = ", ".join(str(item) for item in items) + "."
+            items_str = join_items(items) + "."
         else:
             items_str = str(items)
-        content += f"    \\textbf{{{escape_latex(category)}:}} & {escape_latex(items_str)}\\\\\n"
+        out.write(f"    \\textbf{{{escape_latex(category)}:}} & {escape_latex(items_str)}\\\\\n")
     
     if append:
-        content += f"    & {escape_latex(append)}\\\\\n"
+        out.write(f"    & {escape_latex(append)}\\\\\n")
     
-    content += "\\end{tabular}\n"
-    return content
+    out.write(_SKILLS_END)
+
+
+def generate_skills_tex(skills: dict, append: str = None) -> str:
+    """Generate skills.tex content from skills dict."""
+    return _to_str(write_skills_tex, skills, append=append)
 
 
 # Default heading values (your static info)
@@ -206,6 +265,26 @@ DEFAULT_HEADING = {
 }
 
 
+_HEADING_TEX = (
+    "%----------HEADING----------%\n"
+    "\\begin{{center}}\n"
+    "    \\textbf{{\\huge {name}}} \\\\ \\vspace{{3pt}}\n"
+    "    \n"
+    "    \\quad\n"
+    "    {{\\seticon{{faMapMarker}} \\underline{{{location}}}}}\n"
+    "    \\quad\n"
+    "    \\href{{tel:{phone}}}{{\\seticon{{faPhone}} \\underline{{{phone_display}}}}}\n"
+    "    \\quad\n"
+    "    \\href{{mailto:{email}}}{{\\seticon{{faEnvelope}} \\underline{{{email_display}}}}}\n"
+    "    \\quad\n"
+    "    \\href{{https://www.linkedin.com/in/{linkedin}}}{{\\seticon{{faLinkedin}} \\underline{{{linkedin_display}}}}}\n"
+    "    \\quad\n"
+    "    \\href{{https://github.com/{github}}}{{\\seticon{{faGithub}} \\underline{{{github_display}}}}}\n"
+    "    \\quad\n"
+    "\\end{{center}}\n"
+)
+
+
 def generate_heading_tex(heading: dict = None, location: str = None, email: str = None) -> str:
     """
     Generate heading.tex content.
@@ -230,29 +309,20 @@ def generate_heading_tex(heading: dict = None, location: str = None, email: str
     if email:
         h["email"] = email
     
-    # Get display values
-    name = h.get("name", "")
-    loc = h.get("location", "")
     phone = h.get("phone", "")
-    phone_display = h.get("phone_display", phone)
     email_addr = h.get("email", "")
     linkedin = h.get("linkedin", "")
     github = h.get("github", "")
     
-    content = "%----------HEADING----------%\n"
-    content += "\\begin{center}\n"
-    content += f"    \\textbf{{\\huge {escape_latex(name)}}} \\\\ \\vspace{{3pt}}\n"
-    content += "    \n"
-    content += "    \\quad\n"
-    content += f"    {{\\seticon{{faMapMarker}} \\underline{{{escape_latex(loc)}}}}}\n"
-    content += "    \\quad\n"
-    content += f"    \\href{{tel:{phone}}}{{\\seticon{{faPhone}} \\underline{{{escape_latex(phone_display)}}}}}\n"
-    content += "    \\quad\n"
-    content += f"    \\href{{mailto:{email_addr}}}{{\\seticon{{faEnvelope}} \\underline{{{escape_latex(email_addr)}}}}}\n"
-    content += "    \\quad\n"
-    content += f"    \\href{{https://www.linkedin.com/in/{linkedin}}}{{\\seticon{{faLinkedin}} \\underline{{{escape_latex(linkedin)}}}}}\n"
-    content += "    \\quad\n"
-    content += f"    \\href{{https://github.com/{github}}}{{\\seticon{{faGithub}} \\underline{{{escape_latex(github)}}}}}\n"
-    content += "    \\quad\n"
-    content += "\\end{center}\n"
-    return content
\ No newline at end of file
+    return _HEADING_TEX.format_map({
+        "name": escape_latex(h.get("name", "")),
+        "location": escape_latex(h.get("location", "")),
+        "phone": phone,
+        "phone_display": escape_latex(h.get("phone_display", phone)),
+        "email": email_addr,
+        "email_display": escape_latex(email_addr),
+        "linkedin": linkedin,
+        "linkedin_display": escape_latex(linkedin),
+        "github": github,
+        "github_display": escape_latex(github),
+    })
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""
+Queue-backed logging so handler I/O happens off the event loop thread.
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def setup_queue_logging(level: int = logging.INFO) -> None:
+    """
+    Route root-logger records through a QueueHandler; a QueueListener thread
+    writes them to the handlers the root logger had (or stderr if none).
+    Safe to call more than once.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, QueueHandler) for h in root.handlers):
+        return
+
+    handlers = list(root.handlers)
+    if not handlers:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handlers = [stream]
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
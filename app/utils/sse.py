@@ -0,0 +1,18 @@
+"""
+Server-Sent Events framing for StreamingResponse bodies.
+"""
+
+from typing import Any, Optional
+
+import orjson
+
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def sse_event(data: Any, event: Optional[str] = None) -> str:
+    """Frame one SSE message with a JSON-encoded data payload."""
+    payload = orjson.dumps(data).decode()
+    if event:
+        return f"event: {event}\ndata: {payload}\n\n"
+    return f"data: {payload}\n\n"
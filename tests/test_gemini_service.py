@@ -0,0 +1,20 @@
+from app.services.gemini_service import strip_code_fences
+
+
+def test_strip_code_fences_unwraps_fenced_response():
+    assert strip_code_fences('```json\n{"a": 1}\n```') == '{"a": 1}'
+    assert strip_code_fences('  ```\n[1, 2]\n```  ') == '[1, 2]'
+
+
+def test_strip_code_fences_tolerates_missing_closing_fence():
+    assert strip_code_fences('```json\n{"a": 1}') == '{"a": 1}'
+
+
+def test_strip_code_fences_leaves_embedded_fences_alone():
+    assert strip_code_fences('{"a": "x```y"}') == '{"a": "x```y"}'
+    text = '{"messages": [{"text": "try:\\n```python\\nprint(1)\\n```"}]}'
+    assert strip_code_fences(text) == text
+
+
+def test_strip_code_fences_keeps_fences_inside_fenced_body():
+    assert strip_code_fences('```json\n{"a": "x```y"}\n```') == '{"a": "x```y"}'
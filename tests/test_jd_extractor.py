@@ -0,0 +1,22 @@
+from app.services.jd_extractor import _fast_extract
+
+
+def test_fast_extract_ignores_policy_words_outside_policy_context():
+    jd = "Build our hybrid cloud platform. 5+ years of Go. No visa sponsorship."
+    assert _fast_extract(jd) is None
+
+
+def test_fast_extract_defers_negated_policy_to_gemini():
+    jd = "This role is not remote. 3+ years required. No sponsorship."
+    assert _fast_extract(jd) is None
+
+
+def test_fast_extract_settles_unambiguous_policy():
+    jd = "This is a fully remote role. 4+ years of Python. We will sponsor visas."
+    assert _fast_extract(jd) == {"sponsorship": "yes", "years_experience": "4+", "remote": "remote"}
+
+    jd = "Hybrid schedule, 3 days onsite in Seattle. No visa sponsorship. 2+ years."
+    assert _fast_extract(jd) is None  # hybrid and onsite both stated
+
+    jd = "Onsite role in Austin. 5+ years. No visa sponsorship."
+    assert _fast_extract(jd)["remote"] == "onsite"